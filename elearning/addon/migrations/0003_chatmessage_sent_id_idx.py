@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("addon", "0002_chatmessage_room_sent_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["sent_at", "id"], name="chatmessage_sent_id_idx"
+            ),
+        ),
+    ]
@@ -12,12 +12,28 @@ class ChatRoom(models.Model):
     is_active = models.BooleanField(default=True)
     is_private = models.BooleanField(default=False)  # New field to indicate private chat
     
+    @property
+    def participant_users(self):
+        # Reads through the prefetch cache when 'participants__user' was prefetched
+        return [participant.user for participant in self.participants.all()]
+    
     def __str__(self):
         if self.is_private and self.participants.count() == 2:
             users = self.participants.values_list('user__username', flat=True)
             return f"Private Chat: {', '.join(users)}"
         return f"{self.course.title if self.course else 'No Course'} - {self.name or 'Unnamed'}"
 
+class ChatMessageQuerySet(models.QuerySet):
+    def unread_by(self, user):
+        """Messages from other users posted after the user's last_read mark in each of their rooms."""
+        # Both conditions sit in one filter() call so they share the same participant join
+        return self.filter(
+            models.Q(room__participants__last_read__isnull=True)
+            | models.Q(sent_at__gt=models.F('room__participants__last_read')),
+            room__participants__user=user,
+        ).exclude(user=user)
+
+
 class ChatMessage(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='messages')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -25,6 +41,15 @@ class ChatMessage(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
     
+    objects = ChatMessageQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'sent_at'], name='chatmessage_room_sent_idx'),
+            # Cursor pages across every room walk (sent_at, id)
+            models.Index(fields=['sent_at', 'id'], name='chatmessage_sent_id_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username}: {self.content[:20]}..."
 
@@ -2,20 +2,31 @@
 from rest_framework import serializers
 from .models import ChatRoom, ChatMessage, ChatParticipant
 from userauths.serializers import UserSerializer
+from core.dynamic_fields import DynamicFieldsMixin
 from core.serializers import CourseSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class ChatRoomSerializer(serializers.ModelSerializer):
-    course = CourseSerializer(read_only=True)
-    created_by = UserSerializer(read_only=True)
-    participants = UserSerializer(many=True, source='participants.user', read_only=True)
+class ChatRoomSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    participants = serializers.SerializerMethodField()
     course_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = ChatRoom
         fields = ['id', 'name', 'description', 'course', 'created_by', 'created_at', 'is_active', 'is_private', 'participants', 'course_id']
+        read_only_fields = ['course', 'created_by']
+        expandable_fields = {
+            'course': (CourseSerializer, {}),
+            'created_by': (UserSerializer, {}),
+            'participants': (UserSerializer, {'source': 'participant_users', 'many': True, 'prefetch': 'participants__user'}),
+        }
+        eager_fields = {
+            'participants': ['participants'],
+        }
+
+    def get_participants(self, obj):
+        return [participant.user_id for participant in obj.participants.all()]
 
     def create(self, validated_data):
         # Extract course_id if present
@@ -32,14 +43,17 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         
         return chat_room
 
-class ChatMessageSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    room = ChatRoomSerializer(read_only=True)
+class ChatMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     room_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = ChatMessage
         fields = ['id', 'room', 'user', 'content', 'sent_at', 'room_id', 'is_deleted']
+        read_only_fields = ['room', 'user']
+        expandable_fields = {
+            'room': (ChatRoomSerializer, {}),
+            'user': (UserSerializer, {}),
+        }
     
     def create(self, validated_data):
         # Get the room_id from validated_data
@@ -63,15 +77,18 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         
         return message
 
-class ChatParticipantSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    room = ChatRoomSerializer(read_only=True)
+class ChatParticipantSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_id = serializers.IntegerField(write_only=True)
     room_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = ChatParticipant
         fields = ['id', 'room', 'user', 'joined_at', 'last_read_message', 'user_id', 'room_id']
+        read_only_fields = ['room', 'user']
+        expandable_fields = {
+            'room': (ChatRoomSerializer, {}),
+            'user': (UserSerializer, {}),
+        }
     
     def create(self, validated_data):
         # Extract user_id and room_id
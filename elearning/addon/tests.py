@@ -0,0 +1,52 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.utils import timezone
+from datetime import timedelta
+
+from .models import ChatRoom, ChatMessage, ChatParticipant
+from userauths.models import User
+
+
+class UnreadCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@test.com', password='testpass123')
+        cls.bob = User.objects.create_user(username='bob', email='bob@test.com', password='testpass123')
+        
+        # Alice has read the first room up to now, but never opened the second
+        cls.read_room = ChatRoom.objects.create(name='Read', created_by=cls.alice)
+        cls.unread_room = ChatRoom.objects.create(name='Unread', created_by=cls.alice)
+        ChatParticipant.objects.create(room=cls.read_room, user=cls.alice, last_read=timezone.now())
+        ChatParticipant.objects.create(room=cls.unread_room, user=cls.alice)
+        for room in (cls.read_room, cls.unread_room):
+            ChatParticipant.objects.create(room=room, user=cls.bob)
+        
+        # Only messages from others count, and only after last_read
+        old = ChatMessage.objects.create(room=cls.read_room, user=cls.bob, content='Old')
+        ChatMessage.objects.filter(pk=old.pk).update(sent_at=timezone.now() - timedelta(hours=1))
+        ChatMessage.objects.create(room=cls.read_room, user=cls.bob, content='New')
+        ChatMessage.objects.create(room=cls.read_room, user=cls.alice, content='Mine')
+        ChatMessage.objects.create(room=cls.unread_room, user=cls.bob, content='One')
+        ChatMessage.objects.create(room=cls.unread_room, user=cls.bob, content='Two')
+        
+        # A room Alice is not in
+        other_room = ChatRoom.objects.create(name='Other', created_by=cls.bob)
+        ChatMessage.objects.create(room=other_room, user=cls.bob, content='Elsewhere')
+    
+    def test_unread_count(self):
+        client = APIClient()
+        client.force_authenticate(user=self.alice)
+        
+        response = client.get('/api/addon/messages/unread/count/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+    
+    def test_cursor_walk_across_rooms_uses_index(self):
+        # A later page without ?room=: the keyset bound is a range on the index
+        queryset = (
+            ChatMessage.objects.filter(sent_at__gt=timezone.now() - timedelta(minutes=30))
+            .order_by('sent_at', 'id')[:20]
+        )
+        self.assertIn('chatmessage_sent_id_idx', queryset.explain())
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from .models import ChatRoom, ChatMessage, ChatParticipant
 from .serializers import ChatRoomSerializer, ChatMessageSerializer, ChatParticipantSerializer
 from django.utils import timezone
+from core.dynamic_fields import EagerLoadingMixin
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -14,36 +15,9 @@ def get_unread_count(request):
     """
     print(f"Getting unread count for user: {request.user.username}")
     
-    # Get all rooms where the user is a participant
-    user_rooms = ChatRoom.objects.filter(participants__user=request.user)
-    print(f"Found {user_rooms.count()} rooms for user")
-    
-    # Count unread messages in these rooms
-    unread_count = 0
-    for room in user_rooms:
-        # Get the participant object for the current user in this room
-        try:
-            participant = ChatParticipant.objects.get(room=room, user=request.user)
-            print(f"Room {room.id}: last_read = {participant.last_read}")
-            
-            # Count messages sent after the last_read timestamp
-            if participant.last_read:
-                room_unread = ChatMessage.objects.filter(
-                    room=room,
-                    sent_at__gt=participant.last_read
-                ).exclude(user=request.user).count()
-                print(f"Room {room.id}: {room_unread} unread messages (after {participant.last_read})")
-            else:
-                # If last_read is None, count all messages not from the current user
-                room_unread = ChatMessage.objects.filter(
-                    room=room
-                ).exclude(user=request.user).count()
-                print(f"Room {room.id}: {room_unread} unread messages (no last_read timestamp)")
-                
-            unread_count += room_unread
-        except ChatParticipant.DoesNotExist:
-            print(f"User is not a participant in room {room.id}")
-            continue
+    # One aggregate over every room the user participates in, instead of a
+    # COUNT per room
+    unread_count = ChatMessage.objects.unread_by(request.user).count()
     
     print(f"Total unread count: {unread_count}")
     return Response({'count': unread_count})
@@ -101,7 +75,7 @@ def mark_messages_as_read(request):
             status=status.HTTP_404_NOT_FOUND
         )
 
-class ChatRoomViewSet(viewsets.ModelViewSet):
+class ChatRoomViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = ChatRoom.objects.all()
     serializer_class = ChatRoomSerializer
     permission_classes = [IsAuthenticated]
@@ -109,10 +83,11 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return ChatRoom.objects.filter(participants__user=self.request.user)
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+class ChatMessageViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('sent_at', 'id')
     
     def get_queryset(self):
         queryset = ChatMessage.objects.all()
@@ -128,7 +103,7 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         # Order by sent_at to show messages in chronological order
         return queryset.order_by('sent_at')
 
-class ChatParticipantViewSet(viewsets.ModelViewSet):
+class ChatParticipantViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = ChatParticipant.objects.all()
     serializer_class = ChatParticipantSerializer
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,129 @@
+"""
+Version-stamped cache keys and a read-through cache of serialized objects.
+
+A version key holds an opaque stamp that writers bump with ``touch()``.
+Anything cached under a key that embeds the stamp goes stale the moment the
+stamp changes, so invalidation is one ``set_many`` however many entries were
+derived from the object.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import models
+from rest_framework import serializers
+
+FRAGMENT_TIMEOUT = 3600
+
+
+def touch(*keys):
+    """Invalidate every cached entry built from the given version keys."""
+    stamp = time.time_ns()
+    cache.set_many({key: stamp for key in keys}, timeout=None)
+
+
+def current_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Seed unseen keys so a snapshot never records None, which an evicted
+        # key would match again
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def fragment_key(model, pk):
+    return f'fragver:{model._meta.label_lower}:{pk}'
+
+
+def invalidate_fragments(model, *pks):
+    touch(*(fragment_key(model, pk) for pk in pks))
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """List serializer fetching every child's cached fragment in two round trips."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if not self.child.use_fragment_cache():
+            return [self.child.to_representation(item) for item in iterable]
+        return self.child.cached_representations(list(iterable))
+
+
+class FragmentCacheMixin:
+    """
+    Serializer mixin caching each object's representation under its model,
+    pk and version stamp, so unchanged rows are not re-rendered on every read.
+    Pair it with ``Meta.list_serializer_class = FragmentListSerializer``.
+
+    Only flat representations of top-level or list items are cached: a
+    fragment holding an expanded relation would go stale when that relation
+    changes, and single nested objects would cost a cache round trip each.
+    The field set and the request host are part of the key because they
+    change the rendered output. Writes always render from the instance.
+
+    Fragments are shared by every reader, so fields listed in
+    ``uncached_fields`` (private or reader-specific values) are never
+    stored and are rendered again on each read.
+    """
+
+    uncached_fields = ()
+
+    def use_fragment_cache(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None or self._is_write():
+            return False
+        return not any(isinstance(field, serializers.BaseSerializer) for field in self.fields.values())
+
+    def fragment_variant(self):
+        if not hasattr(self, '_fragment_variant'):
+            request = self.context.get('request')
+            host = request.build_absolute_uri('/') if request is not None else ''
+            raw = f"{host}|{','.join(self.fields)}"
+            self._fragment_variant = hashlib.md5(raw.encode()).hexdigest()[:12]
+        return self._fragment_variant
+
+    def cached_representations(self, instances):
+        model = self.Meta.model
+        version_keys = [fragment_key(model, instance.pk) for instance in instances]
+        versions = current_versions(version_keys)
+        variant = self.fragment_variant()
+        keys = [f'fragment:{key}:{versions[key]}:{variant}' for key in version_keys]
+
+        found = cache.get_many(keys)
+        rendered = {}
+        data = []
+        for instance, key in zip(instances, keys):
+            if key not in found:
+                representation = super().to_representation(instance)
+                rendered[key] = found[key] = {
+                    name: value for name, value in representation.items() if name not in self.uncached_fields
+                }
+            data.append(self.with_uncached(found[key], instance))
+        if rendered:
+            cache.set_many(rendered, FRAGMENT_TIMEOUT)
+        return data
+
+    def with_uncached(self, fragment, instance):
+        if not self.uncached_fields:
+            return fragment
+        fields = list(self._readable_fields)
+        values = {}
+        for field in fields:
+            if field.field_name in self.uncached_fields:
+                attribute = field.get_attribute(instance)
+                values[field.field_name] = None if attribute is None else field.to_representation(attribute)
+        # Keep the serializer's field order
+        return {
+            field.field_name: values[field.field_name] if field.field_name in values else fragment[field.field_name]
+            for field in fields
+        }
+
+    def to_representation(self, instance):
+        if not self.use_fragment_cache():
+            return super().to_representation(instance)
+        return self.cached_representations([instance])[0]
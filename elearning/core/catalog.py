@@ -0,0 +1,115 @@
+"""
+Shared cache of the student course catalog.
+
+Every student sees the same active-course list, so its rendered data is
+cached once per query string under a generation stamp that any course or
+enrollment write bumps (teacher profile writes too, for pages that expand
+the teacher). When the stamp moves, one request regenerates the
+entry while the rest keep serving the previous copy.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from .caching import current_versions, touch
+from .dynamic_fields import parse_paths
+
+GENERATION_KEY = 'catalog:generation'
+TEACHER_GENERATION_KEY = 'catalog:generation:teachers'
+CACHE_TIMEOUT = 3600
+STALE_TIMEOUT = 24 * 3600
+# Longest a regeneration may hold the lock before another worker takes over
+LOCK_TIMEOUT = 30
+# With no stale copy yet, how long to wait for the worker holding the lock
+WAIT_TIMEOUT = 2.0
+WAIT_INTERVAL = 0.05
+
+OUTCOMES = ('hit', 'miss', 'stale')
+
+
+def invalidate():
+    touch(GENERATION_KEY)
+
+
+def invalidate_teachers():
+    touch(TEACHER_GENERATION_KEY)
+
+
+def generation(request):
+    keys = [GENERATION_KEY]
+    if 'teacher' in parse_paths(request.query_params.get('expand'))[0]:
+        keys.append(TEACHER_GENERATION_KEY)
+    versions = current_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def counter_key(outcome):
+    return f'catalog:count:{outcome}'
+
+
+def record(outcome):
+    key = counter_key(outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, 1, timeout=None)
+
+
+def get_counters():
+    counts = cache.get_many([counter_key(outcome) for outcome in OUTCOMES])
+    return {outcome: counts.get(counter_key(outcome), 0) for outcome in OUTCOMES}
+
+
+def reset_counters():
+    cache.delete_many([counter_key(outcome) for outcome in OUTCOMES])
+
+
+def variant(request):
+    raw = '|'.join([request.build_absolute_uri(), request.accepted_media_type or ''])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def get_catalog(request, render):
+    """
+    Return ``(entry, outcome)`` for the catalog page ``request`` asks for.
+    ``render()`` returns the dict to cache (``data`` and ``last_modified``)
+    and is called by at most one worker per generation while a stale copy
+    exists; an ``etag`` is added to it. ``outcome`` is 'hit', 'miss' or
+    'stale'.
+    """
+    name = variant(request)
+    stamp = generation(request)
+    fresh_key = f'catalog:{name}:{stamp}'
+    stale_key = f'catalog:{name}:stale'
+    lock_key = f'catalog:{name}:{stamp}:lock'
+
+    entry = cache.get(fresh_key)
+    if entry is not None:
+        return entry, 'hit'
+
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        stale = cache.get(stale_key)
+        if stale is not None:
+            return stale, 'stale'
+        # Cold start: give the lock holder a moment rather than piling on
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = cache.get(fresh_key)
+            if entry is not None:
+                return entry, 'hit'
+
+    try:
+        entry = {
+            **render(),
+            'etag': quote_etag(hashlib.md5(f'{name}:{stamp}'.encode()).hexdigest()),
+        }
+        cache.set(fresh_key, entry, CACHE_TIMEOUT)
+        cache.set(stale_key, entry, STALE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return entry, 'miss'
@@ -0,0 +1,102 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def related_model(model, path):
+    """Follow a ``__`` lookup path and return the model at the end of it."""
+    for part in path.split('__'):
+        try:
+            model = model._meta.get_field(part).related_model
+        except FieldDoesNotExist:
+            return None
+        if model is None:
+            return None
+    return model
+
+
+def has_field(model, name):
+    return any(field.name == name for field in model._meta.concrete_fields)
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin adding ``ETag`` / ``Last-Modified`` validators to ``list``
+    and ``retrieve`` and answering matching ``If-None-Match`` /
+    ``If-Modified-Since`` requests with ``304 Not Modified``.
+
+    Validators come from one aggregate query over the filtered queryset:
+    the row count plus the newest ``timestamp_field`` of the rows and of any
+    related model rendered through ``?expand=`` that carries one. The ETag
+    also covers the user and the full query string, so pages, sparse
+    fieldsets and expansions each get their own tag.
+    """
+
+    timestamp_field = 'updated_at'
+
+    def get_validator_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_timestamp_lookups(self):
+        lookups = [self.timestamp_field]
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'get_eager_loading'):
+            return lookups
+        params = self.request.query_params
+        select, prefetch = serializer_class.get_eager_loading(params.get('fields'), params.get('expand'))
+        model = self.get_queryset().model
+        for path in sorted(select | prefetch):
+            target = related_model(model, path)
+            if target is not None and has_field(target, 'updated_at'):
+                lookups.append(f'{path}__updated_at')
+        return lookups
+
+    def get_validators(self, queryset):
+        """Return ``(etag, last_modified)`` for the rows in ``queryset``."""
+        lookups = self.get_timestamp_lookups()
+        aggregates = {'count': Count('pk', distinct=True)}
+        for index, lookup in enumerate(lookups):
+            aggregates[f'ts{index}'] = Max(lookup)
+        values = queryset.aggregate(**aggregates)
+
+        timestamps = [values[f'ts{index}'] for index in range(len(lookups))]
+        known = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(known).timestamp()) if known else None
+
+        key = '|'.join([
+            str(self.request.user.pk),
+            self.request.get_full_path(),
+            self.request.accepted_media_type or '',
+            str(values['count']),
+            *(timestamp.isoformat() if timestamp else '-' for timestamp in timestamps),
+        ])
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, queryset, view, *args, **kwargs):
+        etag, last_modified = self.get_validators(queryset)
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(self.request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            response.setdefault('Cache-Control', 'private, no-cache')
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.get_validator_queryset(), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_validator_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            # A malformed pk, as get_object() would report it
+            raise Http404
+        return self.conditional_response(queryset, super().retrieve, *args, **kwargs)
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .caching import current_versions
+from .models import Announcement, Assignment, Enrollment, Grade, Submission
+from .serializers import AnnouncementSerializer, AssignmentSerializer, EnrollmentSerializer, GradeSerializer
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 90
+RECENT_GRADES = 10
+PINNED_ANNOUNCEMENTS = 10
+CACHE_TIMEOUT = 300
+
+GRADE_FIELDS = [
+    'id', 'score', 'feedback', 'graded_date',
+    'assignment.id', 'assignment.title', 'assignment.total_points',
+    'course.id', 'course.title',
+]
+
+
+def user_key(user_id):
+    return f'dashboard:user:{user_id}'
+
+
+def course_key(course_id):
+    return f'dashboard:course:{course_id}'
+
+
+def build_dashboard(user, days, context):
+    """
+    Build the cached part of a student's dashboard in four queries: active
+    enrollments, upcoming assignments with the student's submission status,
+    recent grades and pinned announcements.
+
+    Returns ``(data, course_ids)``.
+    """
+    now = timezone.now()
+    enrollments = list(
+        Enrollment.objects.filter(student=user, is_active=True)
+        .select_related('course')
+        .order_by('-enrollment_date')
+    )
+    # Reuse the ids instead of repeating the enrollment join in every query
+    course_ids = [enrollment.course_id for enrollment in enrollments]
+
+    own_submission = Submission.objects.filter(assignment=OuterRef('pk'), student=user)
+    assignments = list(
+        Assignment.objects.filter(course_id__in=course_ids, due_date__gte=now, due_date__lte=now + timedelta(days=days))
+        .annotate(
+            submission_id=Subquery(own_submission.values('pk')[:1]),
+            submission_date=Subquery(own_submission.values('submission_date')[:1]),
+            is_graded=Exists(Grade.objects.filter(assignment=OuterRef('pk'), student=user)),
+        )
+        .order_by('due_date', 'id')
+    )
+    upcoming = AssignmentSerializer(assignments, many=True, context=context, fields=[], expand=[]).data
+    for row, assignment in zip(upcoming, assignments):
+        row['submission'] = None
+        if assignment.submission_id is not None:
+            row['submission'] = {
+                'id': assignment.submission_id,
+                'submission_date': assignment.submission_date,
+                'is_graded': assignment.is_graded,
+            }
+
+    grades = (
+        Grade.objects.filter(student=user)
+        .select_related('assignment', 'course')
+        .order_by('-graded_date', '-id')[:RECENT_GRADES]
+    )
+    announcements = (
+        Announcement.objects.filter(course_id__in=course_ids, is_pinned=True)
+        .order_by('-posted_at', '-id')[:PINNED_ANNOUNCEMENTS]
+    )
+
+    data = {
+        'days': days,
+        'enrollments': EnrollmentSerializer(
+            enrollments, many=True, context=context, fields=[], expand=['course_detail']
+        ).data,
+        'upcoming_assignments': upcoming,
+        'recent_grades': GradeSerializer(
+            grades, many=True, context=context, fields=GRADE_FIELDS, expand=['assignment', 'course']
+        ).data,
+        'pinned_announcements': AnnouncementSerializer(
+            announcements, many=True, context=context, fields=[], expand=[]
+        ).data,
+    }
+    return data, course_ids
+
+
+def get_dashboard(user, days, context):
+    """
+    Return the cached dashboard for ``user``, rebuilding it when the user or
+    any of their courses has been touched since it was cached.
+    """
+    key = f'dashboard:{user.pk}:{days}'
+    cached = cache.get(key)
+    if cached is not None and current_versions(list(cached['versions'])) == cached['versions']:
+        return cached['data']
+
+    # Read the user's version before querying so a concurrent write leaves the
+    # snapshot stale rather than the cache
+    versions = current_versions([user_key(user.pk)])
+    data, course_ids = build_dashboard(user, days, context)
+    versions.update(current_versions([course_key(course_id) for course_id in course_ids]))
+    cache.set(key, {'data': data, 'versions': versions}, CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,161 @@
+from django.utils.module_loading import import_string
+from rest_framework import permissions, serializers
+
+
+def parse_paths(value):
+    """
+    Split a ``?fields=`` / ``?expand=`` value into top-level names and the
+    dotted remainders that belong to each nested serializer.
+
+    ``"id,teacher.username,teacher.email"`` -> ``({'id', 'teacher'}, {'teacher': ['username', 'email']})``
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    names, nested = set(), {}
+    for path in value or ():
+        path = path.strip()
+        if not path:
+            continue
+        name, _, rest = path.partition('.')
+        names.add(name)
+        if rest:
+            nested.setdefault(name, []).append(rest)
+    return names, nested
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin adding sparse fieldsets (``?fields=``) and on-demand
+    expansion of relations (``?expand=``).
+
+    Relations are rendered as primary keys unless expanded. Expandable fields
+    are declared on ``Meta.expandable_fields`` as
+    ``name: (serializer, options)`` where ``serializer`` is a class or dotted
+    import path and ``options`` holds the serializer kwargs (``source``,
+    ``many``) plus an optional ``select``/``prefetch`` lookup overriding the
+    one derived from ``source``. ``Meta.eager_fields`` maps a field to the
+    ``prefetch`` lookups it needs when it is rendered unexpanded.
+
+    Both parameters accept dotted paths for nested serializers, e.g.
+    ``?expand=course.teacher&fields=id,course.title``. On writes ``fields`` is
+    ignored and only read-only relations expand, so input keeps accepting
+    primary keys.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._requested_fields = kwargs.pop('fields', None)
+        self._requested_expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+    def _is_write(self):
+        request = self.context.get('request')
+        return request is not None and request.method not in permissions.SAFE_METHODS
+
+    def _query_param(self, name):
+        request = self.context.get('request')
+        if request is None:
+            return None
+        # Only the outermost serializer reads the query string; nested ones are
+        # handed their share of the paths when they are built.
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None
+        return request.query_params.get(name)
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        is_write = self._is_write()
+        requested = self._requested_fields
+        if requested is None and not is_write:
+            requested = self._query_param('fields')
+        expand = self._requested_expand
+        if expand is None:
+            expand = self._query_param('expand')
+
+        field_names, nested_fields = parse_paths(requested)
+        expand_names, nested_expand = parse_paths(expand)
+
+        for name, (serializer_class, options) in self.get_expandable_fields().items():
+            if name not in expand_names or (field_names and name not in field_names):
+                continue
+            if is_write and name in fields and not fields[name].read_only:
+                continue
+            kwargs = {key: value for key, value in options.items() if key not in ('select', 'prefetch')}
+            fields[name] = serializer_class(
+                read_only=True,
+                fields=nested_fields.get(name, []),
+                expand=nested_expand.get(name, []),
+                **kwargs
+            )
+
+        if field_names:
+            for name in list(fields):
+                if name not in field_names:
+                    fields.pop(name)
+        return fields
+
+    @classmethod
+    def get_expandable_fields(cls):
+        expandable = {}
+        for name, (serializer_class, options) in getattr(cls.Meta, 'expandable_fields', {}).items():
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            expandable[name] = (serializer_class, options)
+        return expandable
+
+    @classmethod
+    def get_eager_loading(cls, fields=None, expand=None, prefix='', prefetch_only=False):
+        """
+        Return the ``(select_related, prefetch_related)`` lookups needed to
+        render the requested fields and expansions without per-row queries.
+        """
+        field_names, nested_fields = parse_paths(fields)
+        expand_names, nested_expand = parse_paths(expand)
+        select, prefetch = set(), set()
+
+        for name, lookups in getattr(cls.Meta, 'eager_fields', {}).items():
+            if name not in expand_names and (not field_names or name in field_names):
+                prefetch.update(prefix + lookup for lookup in lookups)
+
+        for name, (serializer_class, options) in cls.get_expandable_fields().items():
+            if name not in expand_names or (field_names and name not in field_names):
+                continue
+            if 'prefetch' in options:
+                lookup, nested_prefetch_only = options['prefetch'], True
+            elif options.get('many'):
+                lookup, nested_prefetch_only = options.get('source', name), True
+            else:
+                lookup = options.get('select', options.get('source', name))
+                nested_prefetch_only = prefetch_only
+            (prefetch if nested_prefetch_only else select).add(prefix + lookup)
+
+            if hasattr(serializer_class, 'get_eager_loading'):
+                nested_select, nested_prefetch = serializer_class.get_eager_loading(
+                    nested_fields.get(name), nested_expand.get(name), f'{prefix}{lookup}__', nested_prefetch_only
+                )
+                select |= nested_select
+                prefetch |= nested_prefetch
+        return select, prefetch
+
+
+class EagerLoadingMixin:
+    """
+    ViewSet mixin that applies the serializer's eager-loading plan for the
+    requested ``?fields=`` and ``?expand=`` to the queryset.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'get_eager_loading'):
+            return queryset
+        params = self.request.query_params
+        select, prefetch = serializer_class.get_eager_loading(params.get('fields'), params.get('expand'))
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        return queryset
@@ -0,0 +1,132 @@
+import csv
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from userauths.models import User
+
+from . import caching, catalog, dashboard
+from .models import Course, Enrollment
+from .utils import chunked
+
+CHUNK_SIZE = 500
+HEADER_NAMES = {'username', 'email', 'user', 'student'}
+
+
+def read_identifiers(lines):
+    """
+    Yield the username or email from the first column of each CSV row,
+    skipping blank rows and an optional header row.
+    """
+    for number, row in enumerate(csv.reader(lines)):
+        if not row or not row[0].strip():
+            continue
+        value = row[0].strip()
+        if number == 0 and value.lower() in HEADER_NAMES:
+            continue
+        yield value
+
+
+def resolve_students(identifiers):
+    """Map each identifier to a ``(user_id, user_type)`` pair in one query."""
+    # Usernames may contain '@' too, so only emails are narrowed down
+    emails = [value for value in identifiers if '@' in value]
+    users = User.objects.filter(Q(username__in=identifiers) | Q(email__in=emails)).values_list(
+        'pk', 'username', 'email', 'user_type'
+    )
+    resolved = {}
+    for pk, username, email, user_type in users:
+        resolved[username] = (pk, user_type)
+        if email:
+            resolved.setdefault(email, (pk, user_type))
+    return resolved
+
+
+def insert_enrollments(course, student_ids):
+    """
+    Enroll ``student_ids`` in ``course`` and return the ids actually
+    inserted. When another request enrolled some of them since they were
+    looked up, rows are inserted one by one and those are left out.
+    """
+    try:
+        with transaction.atomic():
+            Enrollment.objects.bulk_create([Enrollment(course=course, student_id=pk) for pk in student_ids])
+        return list(student_ids)
+    except IntegrityError:
+        created = []
+        for pk in student_ids:
+            try:
+                with transaction.atomic():
+                    Enrollment.objects.bulk_create([Enrollment(course=course, student_id=pk)])
+            except IntegrityError:
+                continue
+            created.append(pk)
+        return created
+
+
+def import_enrollments(course, identifiers, chunk_size=CHUNK_SIZE):
+    """
+    Enroll the students named by ``identifiers`` (usernames or emails) in
+    ``course``, reading them a chunk at a time.
+
+    Each chunk costs a user lookup, an enrollment lookup, one conflict-tolerant
+    INSERT and at most one UPDATE to reactivate dropped enrollments, all in a
+    single transaction. Returns a summary of what happened to every row.
+    """
+    summary = {
+        'course': course.pk,
+        'rows': 0,
+        'created': 0,
+        'reactivated': 0,
+        'already_enrolled': 0,
+        'duplicates': 0,
+        'not_found': [],
+        'not_students': [],
+    }
+    seen = set()
+    touched = set()
+
+    with transaction.atomic():
+        for chunk in chunked(identifiers, chunk_size):
+            summary['rows'] += len(chunk)
+            resolved = resolve_students(chunk)
+
+            student_ids = []
+            for identifier in chunk:
+                if identifier not in resolved:
+                    summary['not_found'].append(identifier)
+                    continue
+                pk, user_type = resolved[identifier]
+                if user_type != 'student':
+                    summary['not_students'].append(identifier)
+                elif pk in seen:
+                    summary['duplicates'] += 1
+                else:
+                    seen.add(pk)
+                    student_ids.append(pk)
+
+            existing = dict(
+                Enrollment.objects.filter(course=course, student_id__in=student_ids)
+                .values_list('student_id', 'is_active')
+            )
+            new_ids = [pk for pk in student_ids if pk not in existing]
+            inactive_ids = [pk for pk, is_active in existing.items() if not is_active]
+
+            created = insert_enrollments(course, new_ids)
+            if inactive_ids:
+                Enrollment.objects.filter(course=course, student_id__in=inactive_ids).update(is_active=True)
+
+            summary['created'] += len(created)
+            summary['reactivated'] += len(inactive_ids)
+            # Students another request enrolled meanwhile count as already enrolled
+            summary['already_enrolled'] += len(existing) - len(inactive_ids) + len(new_ids) - len(created)
+            touched.update(created, inactive_ids)
+
+        # Bulk writes skip the Enrollment signals, so do their work once here
+        if touched:
+            Course.objects.filter(pk=course.pk).refresh_enrollment_counts()
+            caching.invalidate_fragments(Course, course.pk)
+            catalog.invalidate()
+            caching.touch(dashboard.course_key(course.pk), *(dashboard.user_key(pk) for pk in touched))
+
+    return summary
@@ -0,0 +1,194 @@
+"""
+Background removal of stored files: a durable queue fed by row deletes, and
+a garbage collector for files no FileField refers to any more.
+"""
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .images import DERIVATIVE_DIR, is_derivative_path
+from .models import MediaBlob, MediaReference, PendingFileDeletion
+from .storage import BLOB_DIR, is_blob_path
+from .utils import chunked
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+# Seconds before the first retry; doubled after each further failure
+RETRY_DELAY = 300
+CHUNK_SIZE = 1000
+# Files younger than this may belong to an upload whose row isn't saved yet
+MIN_AGE = 3600
+
+
+def file_fields():
+    """``(model, field name)`` for every FileField and ImageField in the project."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def file_names(instance):
+    return [
+        getattr(instance, field.name).name
+        for field in instance._meta.concrete_fields
+        if isinstance(field, models.FileField) and getattr(instance, field.name)
+    ]
+
+
+def queue_deletion(names):
+    PendingFileDeletion.objects.bulk_create([PendingFileDeletion(name=name) for name in names])
+
+
+def referenced_names(names):
+    """Return the subset of ``names`` that some row still stores."""
+    names = list(names)
+    found = set()
+    for model, field in file_fields():
+        found.update(model._base_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return found
+
+
+def due_for_attempt(now):
+    """Entries never tried, or whose backoff since the last failure has passed."""
+    due = Q(attempts=0)
+    for attempts in range(1, MAX_ATTEMPTS):
+        delay = timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+        due |= Q(attempts=attempts, last_attempt_at__lte=now - delay)
+    return due
+
+
+def process_queue(batch_size=BATCH_SIZE, storage=None):
+    """
+    Delete queued files a batch at a time, skipping names another row has
+    taken over. Failures are retried up to MAX_ATTEMPTS times, backing off
+    from RETRY_DELAY between attempts. Returns the number of queue entries
+    cleared.
+    """
+    storage = storage or default_storage
+    cleared = 0
+    while True:
+        now = timezone.now()
+        batch = list(PendingFileDeletion.objects.filter(due_for_attempt(now)).order_by('pk')[:batch_size])
+        if not batch:
+            return cleared
+        in_use = referenced_names({row.name for row in batch})
+        done = []
+        for row in batch:
+            if row.name not in in_use:
+                try:
+                    storage.delete(row.name)
+                except Exception as e:
+                    PendingFileDeletion.objects.filter(pk=row.pk).update(
+                        attempts=F('attempts') + 1, last_attempt_at=now, last_error=str(e)
+                    )
+                    continue
+            done.append(row.pk)
+        PendingFileDeletion.objects.filter(pk__in=done).delete()
+        cleared += len(done)
+
+
+def walk_files(root, top=None):
+    """
+    Yield ``(name, path)`` for the files under ``root`` (or its ``top``
+    subdirectory). From the root, blobs and derivatives are left out.
+    """
+    start = os.path.join(root, top) if top else root
+    for directory, subdirs, files in os.walk(start):
+        relative = os.path.relpath(directory, root).replace(os.sep, '/')
+        if relative == '.':
+            subdirs[:] = [subdir for subdir in subdirs if not (is_blob_path(subdir) or is_derivative_path(subdir))]
+            relative = ''
+        for filename in files:
+            yield (f'{relative}/{filename}' if relative else filename), os.path.join(directory, filename)
+
+
+def is_old(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(dry_run=False, min_age=MIN_AGE, storage=None):
+    """
+    Reclaim stored files that no FileField refers to, comparing names with
+    the database a chunk at a time. Four passes: MediaReference names no
+    row holds (a blob goes with its last reference), blob files without a
+    MediaBlob row, files from before deduplication that nothing holds, and
+    image derivatives whose source blob is gone (derivatives of files from
+    before deduplication go too; they are rendered again when requested).
+    Returns ``{'files': n, 'bytes': n}`` reclaimed, or reclaimable when
+    ``dry_run``.
+    """
+    storage = storage or default_storage
+    cutoff = time.time() - min_age
+    summary = {'files': 0, 'bytes': 0}
+
+    def reclaim(size, delete):
+        summary['files'] += 1
+        summary['bytes'] += size
+        if not dry_run:
+            delete()
+
+    # Orphaned references, freeing blobs whose every reference is orphaned
+    references = (
+        MediaReference.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=min_age))
+        .order_by('pk')
+        .values_list('pk', 'name', 'blob_id', 'blob__size', 'blob__refcount')
+    )
+    orphaned = defaultdict(int)
+    blobs = {}
+    last_pk = 0
+    # Keyset pages rather than one open cursor, since orphans are deleted as we go
+    while chunk := list(references.filter(pk__gt=last_pk)[:CHUNK_SIZE]):
+        last_pk = chunk[-1][0]
+        in_use = referenced_names(name for _, name, *_ in chunk)
+        for _, name, digest, size, refcount in chunk:
+            if name in in_use:
+                continue
+            orphaned[digest] += 1
+            blobs[digest] = (size, refcount)
+            if not dry_run:
+                storage.delete(name)
+    freed = {digest for digest, count in orphaned.items() if count >= blobs[digest][1]}
+    for digest in freed:
+        summary['files'] += 1
+        summary['bytes'] += blobs[digest][0]
+
+    # Blob files left behind by interrupted uploads
+    for chunk in chunked(walk_files(storage.location, BLOB_DIR), CHUNK_SIZE):
+        digests = [os.path.basename(name) for name, _ in chunk]
+        # Blobs freed above are counted already; their files go on commit
+        known = freed.union(MediaBlob.objects.filter(pk__in=digests).values_list('pk', flat=True))
+        for name, path in chunk:
+            if os.path.basename(name) not in known and is_old(path, cutoff):
+                reclaim(os.path.getsize(path), lambda path=path: os.remove(path))
+
+    # Files from before deduplication
+    for chunk in chunked(walk_files(storage.location), CHUNK_SIZE):
+        names = [name for name, _ in chunk]
+        in_use = referenced_names(names)
+        in_use.update(MediaReference.objects.filter(name__in=names).values_list('name', flat=True))
+        for name, path in chunk:
+            if name not in in_use and is_old(path, cutoff):
+                reclaim(os.path.getsize(path), lambda path=path: os.remove(path))
+
+    # Derivatives, grouped in one directory per source digest
+    for chunk in chunked(walk_files(storage.location, DERIVATIVE_DIR), CHUNK_SIZE):
+        digests = [os.path.basename(os.path.dirname(name)) for name, _ in chunk]
+        known = set(MediaBlob.objects.filter(pk__in=digests).values_list('pk', flat=True)) - freed
+        for digest, (name, path) in zip(digests, chunk):
+            if digest not in known and is_old(path, cutoff):
+                reclaim(os.path.getsize(path), lambda path=path: os.remove(path))
+
+    return summary
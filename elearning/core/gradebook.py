@@ -0,0 +1,121 @@
+import csv
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Avg, Count, Sum
+
+from .models import Assignment, Enrollment, Grade, Submission
+
+CHUNK_SIZE = 2000
+
+
+class SortedLookup:
+    """
+    Look up items of an iterator sorted by ``key`` for keys requested in
+    increasing order, so several sorted querysets can be merged in one pass.
+    """
+
+    def __init__(self, iterable, key):
+        self._iterator = iter(iterable)
+        self._key = key
+        self._head = next(self._iterator, None)
+
+    def get(self, key, default=None):
+        while self._head is not None and self._key(self._head) < key:
+            self._head = next(self._iterator, None)
+        if self._head is not None and self._key(self._head) == key:
+            return self._head
+        return default
+
+
+class Echo:
+    """File-like object whose write() hands the value back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def get_assignments(course):
+    return list(
+        Assignment.objects.filter(course=course)
+        .annotate(average=Avg('grades__score'), graded=Count('grades'))
+        .order_by('due_date', 'id')
+        .values('id', 'title', 'total_points', 'due_date', 'average', 'graded')
+    )
+
+
+def iter_student_rows(course, assignments):
+    """
+    Yield one row per actively enrolled student, ordered by id, with a cell
+    per assignment (``None`` when nothing was submitted) and the grouped
+    score totals.
+
+    The student, submission and total querysets are streamed side by side and
+    merged on student id, so memory stays flat however large the course is.
+    """
+    columns = {assignment['id']: index for index, assignment in enumerate(assignments)}
+    possible = sum(assignment['total_points'] for assignment in assignments)
+
+    students = (
+        Enrollment.objects.filter(course=course, is_active=True)
+        .order_by('student_id')
+        .values_list('student_id', 'student__username', 'student__first_name', 'student__last_name')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    submissions = SortedLookup(
+        groupby(
+            Submission.objects.filter(assignment__course=course)
+            .order_by('student_id')
+            .values_list('student_id', 'assignment_id', 'is_late', 'grade__score')
+            .iterator(chunk_size=CHUNK_SIZE),
+            key=itemgetter(0),
+        ),
+        key=itemgetter(0),
+    )
+    totals = SortedLookup(
+        Grade.objects.filter(assignment__course=course)
+        .values('student_id')
+        .annotate(total=Sum('score'), graded=Count('pk'))
+        .order_by('student_id')
+        .values_list('student_id', 'total', 'graded')
+        .iterator(chunk_size=CHUNK_SIZE),
+        key=itemgetter(0),
+    )
+
+    for student_id, username, first_name, last_name in students:
+        cells = [None] * len(assignments)
+        late = 0
+        found = submissions.get(student_id)
+        if found is not None:
+            for _, assignment_id, is_late, score in found[1]:
+                cells[columns[assignment_id]] = {'score': score, 'is_late': is_late}
+                late += is_late
+        _, total, graded = totals.get(student_id, (student_id, 0, 0))
+        yield {
+            'id': student_id,
+            'username': username,
+            'name': f'{first_name} {last_name}'.strip(),
+            'cells': cells,
+            'total': total,
+            'graded': graded,
+            'late': late,
+            'possible': possible,
+            'percentage': round(total * 100 / possible, 2) if possible else None,
+        }
+
+
+def iter_csv(course):
+    """Yield the gradebook as CSV lines, one student at a time."""
+    assignments = get_assignments(course)
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ['Student ID', 'Username', 'Name']
+        + [f"{assignment['title']} (/{assignment['total_points']})" for assignment in assignments]
+        + ['Total', 'Possible', 'Percentage', 'Late submissions']
+    )
+    for row in iter_student_rows(course, assignments):
+        yield writer.writerow(
+            [row['id'], row['username'], row['name']]
+            + ['' if cell is None or cell['score'] is None else cell['score'] for cell in row['cells']]
+            + [row['total'], row['possible'], '' if row['percentage'] is None else row['percentage'], row['late']]
+        )
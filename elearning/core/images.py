@@ -0,0 +1,161 @@
+"""
+Resized derivatives of uploaded images (course covers, video thumbnails,
+profile pictures).
+
+Each named size is rendered once per source body in every format and kept
+under ``derivatives/<aa>/<sha256 of the source>/`` in MEDIA_ROOT, so
+re-uploads of the same picture share their derivatives and a replaced
+picture never serves a stale one. They are rendered on first request by
+serve_media (``?variant=card.webp``), or ahead of time by
+generate_image_derivatives.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils._os import safe_join
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from userauths.models import User
+
+from .models import Course, VideoResource
+from .storage import hash_file, is_blob_path
+
+DERIVATIVE_DIR = 'derivatives'
+
+IMAGE_FIELDS = [(Course, 'cover_image_path'), (VideoResource, 'thumbnail_path'), (User, 'profile_picture_path')]
+
+# name: (width, height, crop); cropped sizes fill the box exactly, the
+# others fit inside it without upscaling
+SIZES = {
+    'thumb': (160, 160, True),
+    'card': (480, 270, True),
+    'full': (1280, 1280, False),
+}
+
+# name: (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+class UnknownVariant(ValueError):
+    pass
+
+
+def is_derivative_path(name):
+    return name.replace('\\', '/').lstrip('/').split('/', 1)[0] == DERIVATIVE_DIR
+
+
+def parse_variant(variant):
+    """Split ``'card.webp'`` into ``('card', 'webp')``, raising UnknownVariant otherwise."""
+    size, _, fmt = variant.partition('.')
+    if size not in SIZES or fmt not in FORMATS:
+        raise UnknownVariant(variant)
+    return size, fmt
+
+
+def locate(name, storage):
+    """
+    Return ``(path, digest)`` of the body stored under ``name``. The SHA-256
+    is free for blobs; files from before deduplication are hashed once and
+    the digest cached against their size and modification time.
+    """
+    path = storage.path(name)
+    if is_blob_path(os.path.relpath(path, storage.location)):
+        return path, os.path.basename(path)
+    stat = os.stat(path)
+    key = f'imagedigest:{hashlib.md5(path.encode()).hexdigest()}:{stat.st_size}:{stat.st_mtime_ns}'
+    digest = cache.get(key)
+    if digest is None:
+        digest = hash_file(path)[0]
+        cache.set(key, digest, timeout=None)
+    return path, digest
+
+
+def derivative_name(digest, size, fmt):
+    width, height, _ = SIZES[size]
+    # The box is part of the name, so changing SIZES re-renders
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}/{size}-{width}x{height}.{fmt}'
+
+
+def render(source, target, size, fmt):
+    width, height, crop = SIZES[size]
+    pillow_format, options = FORMATS[fmt]
+    with Image.open(source) as image:
+        # JPEG sources can be decoded straight at a fraction of their size
+        image.draft('RGB', (max(width, height),) * 2)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            # Palette and greyscale images would be resized without filtering
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        if crop:
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+        if pillow_format == 'JPEG' and image.mode == 'RGBA':
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written aside and renamed, so concurrent requests never read half a file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                image.save(fh, pillow_format, **options)
+            os.replace(temp_path, target)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+def get_derivative(name, size, fmt, storage=None):
+    """Return the filesystem path of ``name``'s derivative, rendering it if needed."""
+    storage = storage or default_storage
+    source, digest = locate(name, storage)
+    # Not storage.path(): derivatives have no logical name to resolve
+    target = safe_join(storage.location, derivative_name(digest, size, fmt))
+    if not os.path.exists(target):
+        render(source, target, size, fmt)
+    return target
+
+
+def generate_all(name, storage=None):
+    """Render every size and format of ``name``; returns how many were new."""
+    storage = storage or default_storage
+    source, digest = locate(name, storage)
+    created = 0
+    for size in SIZES:
+        for fmt in FORMATS:
+            target = safe_join(storage.location, derivative_name(digest, size, fmt))
+            if not os.path.exists(target):
+                render(source, target, size, fmt)
+                created += 1
+    return created
+
+
+def variant_url(url, size, fmt):
+    return f'{url}?variant={size}.{fmt}'
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    ``{size: {format: url}}`` for an image field, or None without an image.
+    URLs are absolute when the request is in the context, like the image
+    field itself.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = value.url
+        request = self.context.get('request')
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return {size: {fmt: variant_url(url, size, fmt) for fmt in FORMATS} for size in SIZES}
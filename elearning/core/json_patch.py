@@ -0,0 +1,111 @@
+"""
+Minimal RFC 6902 JSON Patch: add, remove, replace, move, copy and test over
+RFC 6901 JSON Pointers.
+"""
+import copy
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def parse_pointer(pointer):
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f'Invalid JSON pointer: {pointer!r}')
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def list_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f'Invalid array index: {token!r}')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f'Array index out of range: {index}')
+    return index
+
+
+def resolve(document, tokens):
+    for token in tokens:
+        if isinstance(document, list):
+            document = document[list_index(document, token)]
+        elif isinstance(document, dict) and token in document:
+            document = document[token]
+        else:
+            raise JsonPatchError(f'Path not found: /{"/".join(tokens)}')
+    return document
+
+
+def get_value(document, pointer):
+    return resolve(document, parse_pointer(pointer))
+
+
+def add_value(document, tokens, value):
+    if not tokens:
+        return value
+    parent = resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(list_index(parent, tokens[-1], allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise JsonPatchError(f'Cannot add to a scalar at /{"/".join(tokens[:-1])}')
+    return document
+
+
+def remove_value(document, tokens):
+    if not tokens:
+        raise JsonPatchError('Cannot remove the document root')
+    parent = resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        return document, parent.pop(list_index(parent, tokens[-1]))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return document, parent.pop(tokens[-1])
+    raise JsonPatchError(f'Path not found: /{"/".join(tokens)}')
+
+
+def apply_operation(document, operation):
+    if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+        raise JsonPatchError('Each operation needs "op" and "path"')
+    op, tokens = operation['op'], parse_pointer(operation['path'])
+
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JsonPatchError(f'"{op}" needs a "value"')
+    if op in ('move', 'copy') and 'from' not in operation:
+        raise JsonPatchError(f'"{op}" needs a "from"')
+
+    if op == 'add':
+        return add_value(document, tokens, copy.deepcopy(operation['value']))
+    if op == 'remove':
+        return remove_value(document, tokens)[0]
+    if op == 'replace':
+        if tokens:
+            document = remove_value(document, tokens)[0]
+        return add_value(document, tokens, copy.deepcopy(operation['value']))
+    if op == 'move':
+        source = parse_pointer(operation['from'])
+        if tokens[:len(source)] == source and tokens != source:
+            raise JsonPatchError('Cannot move a value into one of its children')
+        document, value = remove_value(document, source)
+        return add_value(document, tokens, value)
+    if op == 'copy':
+        value = copy.deepcopy(get_value(document, operation['from']))
+        return add_value(document, tokens, value)
+    if op == 'test':
+        if resolve(document, tokens) != operation['value']:
+            raise JsonPatchError(f'Test failed at {operation["path"]}')
+        return document
+    raise JsonPatchError(f'Unknown operation: {op!r}')
+
+
+def apply_patch(document, operations):
+    """Return a patched copy of ``document``; the original is left untouched."""
+    if not isinstance(operations, list):
+        raise JsonPatchError('A patch must be a list of operations')
+    document = copy.deepcopy(document)
+    for operation in operations:
+        document = apply_operation(document, operation)
+    return document
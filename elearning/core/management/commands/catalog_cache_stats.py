@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core import catalog
+
+
+class Command(BaseCommand):
+    help = 'Show the hit/miss/stale counters of the shared student course catalog cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        counters = catalog.get_counters()
+        total = sum(counters.values())
+        for outcome, count in counters.items():
+            share = f" ({count / total:.1%})" if total else ''
+            self.stdout.write(f"{outcome}: {count}{share}")
+        if options['reset']:
+            catalog.reset_counters()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand
+from core.images import is_derivative_path
+from core.models import MediaReference
+from core.storage import ContentAddressedStorage, blob_name, hash_file, is_blob_path
+
+
+class Command(BaseCommand):
+    help = 'Move files stored before content-addressed storage into deduplicated blobs, keeping their names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without moving files')
+
+    def legacy_files(self, root):
+        referenced = set(MediaReference.objects.values_list('name', flat=True))
+        for directory, subdirs, files in os.walk(root):
+            relative = os.path.relpath(directory, root).replace(os.sep, '/')
+            if relative == '.':
+                subdirs[:] = [subdir for subdir in subdirs if not (is_blob_path(subdir) or is_derivative_path(subdir))]
+                relative = ''
+            for filename in sorted(files):
+                name = f'{relative}/{filename}' if relative else filename
+                if name not in referenced:
+                    yield name
+
+    def handle(self, *args, **options):
+        storage = ContentAddressedStorage()
+        files = duplicates = reclaimed = 0
+        seen = set()
+        for name in self.legacy_files(storage.location):
+            files += 1
+            if options['dry_run']:
+                digest, size = hash_file(storage.path(name))
+                duplicate = digest in seen or storage.exists(blob_name(digest))
+                seen.add(digest)
+            else:
+                size, duplicate = storage.adopt(name)
+            if duplicate:
+                duplicates += 1
+                reclaimed += size
+
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {reclaimed} bytes from {duplicates} duplicate(s) among {files} file(s)"
+        ))
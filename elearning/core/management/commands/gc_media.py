@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.file_cleanup import MIN_AGE, collect_garbage, process_queue
+
+
+class Command(BaseCommand):
+    help = 'Drain the file deletion queue and reclaim media files that no FileField refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without deleting')
+        parser.add_argument(
+            '--min-age', type=int, default=MIN_AGE,
+            help='Leave files younger than this many seconds alone (default: %(default)s)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            cleared = process_queue()
+            self.stdout.write(f"Processed {cleared} queued deletion(s)")
+        summary = collect_garbage(dry_run=options['dry_run'], min_age=options['min_age'])
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {summary['bytes']} bytes in {summary['files']} file(s)"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core.images import IMAGE_FIELDS, generate_all
+
+
+class Command(BaseCommand):
+    help = 'Render the resized derivatives of every course cover, video thumbnail and profile picture'
+
+    def handle(self, *args, **options):
+        images = created = failed = 0
+        for model, field in IMAGE_FIELDS:
+            names = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for name in names.values_list(field, flat=True).distinct().iterator():
+                images += 1
+                try:
+                    created += generate_all(name)
+                except (OSError, Image.DecompressionBombError) as e:
+                    failed += 1
+                    self.stderr.write(f"Skipped {name}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {created} derivative(s) for {images} image(s); {failed} could not be read"
+        ))
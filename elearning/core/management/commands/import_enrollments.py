@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from core.enrollment_import import import_enrollments, read_identifiers
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Enroll the students listed in a CSV of usernames or emails in a course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('csv_path', help="CSV file with one username or email per row, or '-' for stdin")
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course_id'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course {options['course_id']} does not exist")
+
+        if options['csv_path'] == '-':
+            summary = import_enrollments(course, read_identifiers(sys.stdin))
+        else:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as lines:
+                summary = import_enrollments(course, read_identifiers(lines))
+
+        for identifier in summary['not_found']:
+            self.stderr.write(f"No such user: {identifier}")
+        for identifier in summary['not_students']:
+            self.stderr.write(f"Not a student: {identifier}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {summary['rows']} row(s) for {course.title}: {summary['created']} enrolled, "
+            f"{summary['reactivated']} reactivated, {summary['already_enrolled']} already enrolled, "
+            f"{summary['duplicates']} duplicate(s)"
+        ))
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+from core.models import CourseMaterial
+from core.video_probe import ProbeError, probe, update_video_metadata
+
+
+def probe_path(path):
+    # Runs in a worker process: file access only, no database
+    try:
+        return probe(path), None
+    except (ProbeError, OSError) as e:
+        return None, str(e)
+
+
+class Command(BaseCommand):
+    help = "Fill in video materials' duration and resolution from their container headers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Probe every video, not only those missing metadata')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        materials = CourseMaterial.objects.filter(file_type='video').exclude(file_path='').order_by('pk')
+        if not options['all']:
+            materials = materials.filter(
+                Q(video_details__isnull=True) | Q(video_details__duration=0) | Q(video_details__resolution='')
+            )
+        materials = list(materials)
+        paths = [default_storage.path(material.file_path.name) for material in materials]
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        updated = failed = 0
+        # Spawned workers import this module, and with it the models, to
+        # unpickle probe_path, so Django must be set up in them first
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            for material, (info, error) in zip(materials, pool.map(probe_path, paths, chunksize=16)):
+                if info is None:
+                    failed += 1
+                    self.stderr.write(f"Skipped material {material.pk} ({material.file_path.name}): {error}")
+                    continue
+                update_video_metadata(material, info=info)
+                updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Probed {updated} video(s); {failed} could not be read"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.models import UploadSession
+from core.uploads import discard, expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable upload sessions, and their partial files, that have not been touched for a day'
+
+    def handle(self, *args, **options):
+        sessions = list(expired_sessions(UploadSession.objects.all()))
+        for session in sessions:
+            discard(session)
+            session.delete()
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(sessions)} upload session(s)"))
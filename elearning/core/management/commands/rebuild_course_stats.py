@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.models import Course
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CourseStats and AssignmentStats rollups from the raw tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='Limit the rebuild to these courses')
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.all()
+        if options['course_ids']:
+            queryset = queryset.filter(pk__in=options['course_ids'])
+        rebuilt = rebuild_stats(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics for {rebuilt} course(s)"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from core import catalog
+from core.caching import invalidate_fragments
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized Course.active_enrollment_count column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='Limit the rebuild to these courses')
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.all()
+        if options['course_ids']:
+            queryset = queryset.filter(pk__in=options['course_ids'])
+        updated = queryset.refresh_enrollment_counts()
+        invalidate_fragments(Course, *queryset.values_list('pk', flat=True))
+        catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt enrollment counts for {updated} course(s)"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the full-text search index from courses, materials and announcements'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('The search index requires SQLite with FTS5')
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} object(s)"))
@@ -0,0 +1,298 @@
+"""
+Serving of uploaded files by their logical names, with byte ranges,
+conditional requests, enrollment checks and optional web server offload.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from userauths.models import User
+
+from . import images
+from .models import Assignment, Course, CourseMaterial, Enrollment, Submission, VideoResource
+from .storage import is_blob_path
+
+MEDIA_TOKEN_COOKIE = 'media_token'
+BLOCK_SIZE = 64 * 1024
+# More ranges than this are answered with the whole file
+MAX_RANGES = 16
+
+PUBLIC_FIELDS = [(Course, 'cover_image_path'), (User, 'profile_picture_path')]
+
+# Per protected file field: the columns of the owning row that decide access,
+# as (course_id, teacher_id, visible, student_id); None where it doesn't apply
+PROTECTED_FIELDS = {
+    (CourseMaterial, 'file_path'): ('course_id', 'course__teacher_id', 'is_visible', None),
+    (VideoResource, 'thumbnail_path'): (
+        'material__course_id', 'material__course__teacher_id', 'material__is_visible', None
+    ),
+    (Assignment, 'file_path'): ('course_id', 'course__teacher_id', None, None),
+    (Submission, 'file_path'): (None, 'assignment__course__teacher_id', None, 'student_id'),
+}
+
+
+def upload_dir(model, field):
+    return model._meta.get_field(field).upload_to.rstrip('/') + '/'
+
+
+def authenticate(request):
+    """
+    The session user, or the user of a JWT access token sent as a Bearer
+    header or in the ``media_token`` cookie the frontend sets, since <video>
+    and <img> cannot send headers. Tokens are never taken from the query
+    string, which ends up in logs, history and Referer headers.
+    """
+    if request.user.is_authenticated:
+        return request.user
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    raw = header[7:] if header.startswith('Bearer ') else None
+    raw = raw or request.COOKIES.get(MEDIA_TOKEN_COOKIE)
+    if not raw:
+        return None
+    authenticator = JWTAuthentication()
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def normalize_name(path):
+    """
+    Return ``path`` as a clean logical name, raising Http404 for absolute
+    paths and ``..``, ``.``, empty or backslashed segments, which could
+    otherwise start under a public prefix and end somewhere protected.
+    """
+    segments = path.split('/')
+    if path.startswith('/') or any(segment in ('', '.', '..') or '\\' in segment for segment in segments):
+        raise Http404
+    return posixpath.normpath(path)
+
+
+def check_access(user, name):
+    """
+    Return True when ``user`` may read file ``name``. Covers and avatars
+    are public; course files need the course's teacher or an active
+    enrollment (and a visible material); submissions need their student or
+    the teacher. Raises Http404 for names no row owns.
+    """
+    for model, field in PUBLIC_FIELDS:
+        if name.startswith(upload_dir(model, field)):
+            return True
+    for (model, field), columns in PROTECTED_FIELDS.items():
+        if not name.startswith(upload_dir(model, field)):
+            continue
+        if user is None:
+            return False
+        row = model.objects.filter(**{field: name}).values_list(*(c for c in columns if c)).first()
+        if row is None:
+            raise Http404
+        values = iter(row)
+        course_id, teacher_id, visible, student_id = (next(values) if c else None for c in columns)
+        if user.pk in (teacher_id, student_id):
+            return True
+        return (
+            course_id is not None and visible is not False
+            and Enrollment.objects.filter(student=user, course_id=course_id, is_active=True).exists()
+        )
+    raise Http404
+
+
+def parse_ranges(header, size):
+    """
+    Parse a ``Range: bytes=...`` header into ``(start, end)`` pairs with
+    inclusive ends. Returns None when the header should be ignored (not
+    bytes, malformed or too many ranges) and [] when nothing is satisfiable.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+    ranges = []
+    for part in parts:
+        match = re.fullmatch(r'\s*(\d*)-(\d*)\s*', part)
+        if match is None or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+            if last and end < start:
+                return None
+            if start >= size:
+                continue
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+            if int(last) == 0:
+                continue
+        ranges.append((start, min(end, size - 1)))
+    return ranges
+
+
+def if_range_matches(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    # A date only validates when it is exactly the file's modification time
+    return parse_http_date_safe(value) == last_modified
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of an open file from ``start``. It
+    keeps ``fileno()`` with the file positioned at ``start``, so WSGI servers
+    that sendfile() a FileResponse (up to its Content-Length) stay zero-copy.
+    """
+
+    def __init__(self, fh, start, length):
+        self.fh = fh
+        self.remaining = length
+        fh.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def multipart_body(path, ranges, size, content_type, boundary):
+    with open(path, 'rb') as fh:
+        for start, end in ranges:
+            yield (
+                f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode()
+            fh.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                block = fh.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def multipart_length(ranges, size, content_type, boundary):
+    parts = sum(
+        len(f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n') + end - start + 1
+        for start, end in ranges
+    )
+    return parts + len(f'\r\n--{boundary}--\r\n')
+
+
+def offload_response(full_path, content_type):
+    """Hand the transfer, ranges included, to the front-end web server."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        relative = os.path.relpath(full_path, default_storage.location).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.MEDIA_OFFLOAD_PREFIX.rstrip('/') + '/' + relative
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def serve_media(request, path):
+    """
+    Stream the file stored under logical name ``path`` to a user allowed to
+    read it. Supports single and multiple byte ranges, If-Range, ETag and
+    Last-Modified revalidation, and X-Accel-Redirect / X-Sendfile offload
+    (MEDIA_OFFLOAD). Deduplicated files live under content hashes, so
+    MEDIA_URL can no longer be mapped straight onto MEDIA_ROOT.
+
+    ``?variant=<size>.<format>`` serves a resized copy of an image instead
+    (see core.images), rendering it on first request.
+    """
+    path = normalize_name(path)
+    if is_blob_path(path) or images.is_derivative_path(path):
+        raise Http404
+    user = authenticate(request)
+    if not check_access(user, path):
+        if user is None:
+            return HttpResponse('Authentication required', status=401)
+        return HttpResponseForbidden('You do not have access to this file')
+
+    filename = os.path.basename(path)
+    try:
+        if 'variant' in request.GET:
+            variant, fmt = images.parse_variant(request.GET['variant'])
+            full_path = images.get_derivative(path, variant, fmt)
+            filename = f'{os.path.splitext(filename)[0]}-{variant}.{fmt}'
+        else:
+            full_path = default_storage.path(path)
+        stat = os.stat(full_path)
+    # OSError covers missing files as well as images Pillow cannot read
+    except (SuspiciousFileOperation, OSError, images.UnknownVariant, Image.DecompressionBombError):
+        raise Http404
+    size, last_modified = stat.st_size, int(stat.st_mtime)
+    if is_blob_path(os.path.relpath(full_path, default_storage.location)):
+        # Blob files are named by their SHA-256, a strong validator for free
+        etag = quote_etag(os.path.basename(full_path))
+    else:
+        etag = quote_etag(f'{last_modified:x}-{size:x}')
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response(request, filename, full_path, size, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def build_response(request, filename, full_path, size, etag, last_modified):
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if settings.MEDIA_OFFLOAD:
+        return offload_response(full_path, content_type)
+
+    ranges = None
+    if 'HTTP_RANGE' in request.META and if_range_matches(request, etag, last_modified):
+        ranges = parse_ranges(request.META['HTTP_RANGE'], size)
+    if ranges is None:
+        return FileResponse(open(full_path, 'rb'), filename=filename)
+    if not ranges:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = FileResponse(RangeFile(open(full_path, 'rb'), start, end - start + 1), status=206,
+                                filename=filename)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+        return response
+
+    boundary = uuid.uuid4().hex
+    response = StreamingHttpResponse(
+        multipart_body(full_path, ranges, size, content_type, boundary), status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = multipart_length(ranges, size, content_type, boundary)
+    return response
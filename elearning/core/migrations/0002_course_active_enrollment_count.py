@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_active_enrollment_count(apps, schema_editor):
+    Course = apps.get_model("core", "Course")
+    Enrollment = apps.get_model("core", "Enrollment")
+    active = (
+        Enrollment.objects.filter(course=models.OuterRef("pk"), is_active=True)
+        .order_by()
+        .values("course")
+        .annotate(total=models.Count("pk"))
+        .values("total")
+    )
+    Course.objects.update(
+        active_enrollment_count=Coalesce(models.Subquery(active), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="active_enrollment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_active_enrollment_count, migrations.RunPython.noop
+        ),
+    ]
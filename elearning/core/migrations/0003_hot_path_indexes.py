@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_course_active_enrollment_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="announcement",
+            index=models.Index(
+                fields=["course", "is_pinned", "posted_at"],
+                name="announcement_course_pin_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="assignment",
+            index=models.Index(
+                fields=["course", "due_date"], name="assignment_course_due_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="enrollment",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["student", "course"],
+                name="enrollment_active_student_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="enrollment",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["course", "student"],
+                name="enrollment_active_course_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentStats",
+            fields=[
+                (
+                    "assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="core.assignment",
+                    ),
+                ),
+                ("submission_count", models.PositiveIntegerField(default=0)),
+                ("late_submission_count", models.PositiveIntegerField(default=0)),
+                ("grade_count", models.PositiveIntegerField(default=0)),
+                (
+                    "score_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("grade_a", models.PositiveIntegerField(default=0)),
+                ("grade_b", models.PositiveIntegerField(default=0)),
+                ("grade_c", models.PositiveIntegerField(default=0)),
+                ("grade_d", models.PositiveIntegerField(default=0)),
+                ("grade_f", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CourseStats",
+            fields=[
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="core.course",
+                    ),
+                ),
+                ("feedback_count", models.PositiveIntegerField(default=0)),
+                ("rating_total", models.IntegerField(default=0)),
+                ("submission_count", models.PositiveIntegerField(default=0)),
+                ("late_submission_count", models.PositiveIntegerField(default=0)),
+                ("grade_count", models.PositiveIntegerField(default=0)),
+                (
+                    "score_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+            ],
+        ),
+    ]
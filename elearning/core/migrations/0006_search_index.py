@@ -0,0 +1,49 @@
+from django.db import migrations
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE core_search_index USING fts5(
+    title, body, course_tag,
+    kind UNINDEXED, object_id UNINDEXED, course_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POPULATE_SQL = [
+    """INSERT INTO core_search_index (rowid, title, body, course_tag, kind, object_id, course_id)
+       SELECT id * 3, title, description, 'c' || id, 'course', id, id FROM core_course""",
+    """INSERT INTO core_search_index (rowid, title, body, course_tag, kind, object_id, course_id)
+       SELECT id * 3 + 1, title, description,
+              'c' || course_id || CASE WHEN is_visible THEN '' ELSE ' hidden' END,
+              'material', id, course_id
+       FROM core_coursematerial""",
+    """INSERT INTO core_search_index (rowid, title, body, course_tag, kind, object_id, course_id)
+       SELECT id * 3 + 2, title, content, 'c' || course_id, 'announcement', id, course_id
+       FROM core_announcement""",
+]
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends simply have no search index
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_SQL)
+    for sql in POPULATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_course_stats"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_structure_versions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="announcement",
+            index=models.Index(
+                fields=["course", "posted_at"], name="announcement_course_time_idx"
+            ),
+        ),
+    ]
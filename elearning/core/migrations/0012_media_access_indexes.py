@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_pending_file_deletions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="assignment",
+            name="file_path",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                null=True,
+                upload_to="assignment_instructions/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="coursematerial",
+            name="file_path",
+            field=models.FileField(db_index=True, upload_to="course_materials/"),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="file_path",
+            field=models.FileField(db_index=True, upload_to="assignment_submissions/"),
+        ),
+        migrations.AlterField(
+            model_name="videoresource",
+            name="thumbnail_path",
+            field=models.ImageField(
+                blank=True, db_index=True, null=True, upload_to="video_thumbnails/"
+            ),
+        ),
+    ]
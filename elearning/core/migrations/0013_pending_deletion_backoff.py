@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_media_access_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingfiledeletion",
+            name="last_attempt_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
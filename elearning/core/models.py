@@ -1,8 +1,65 @@
 # core/models.py
+import uuid
+
 from django.db import models
+from django.db.models.functions import Coalesce, Now
 from userauths.models import User
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_enrollment_count(self):
+        """Annotate each course with its number of active enrollments."""
+        return self.annotate(
+            active_enrollments=models.Count('enrollments', filter=models.Q(enrollments__is_active=True))
+        )
+
+    def refresh_enrollment_counts(self):
+        """Recompute the denormalized active_enrollment_count column in one UPDATE."""
+        active = (
+            Enrollment.objects.filter(course=models.OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('course')
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        )
+        # Touch updated_at too: the count is part of the course representation
+        return self.update(
+            active_enrollment_count=Coalesce(models.Subquery(active), 0),
+            updated_at=Now(),
+        )
+
+    def enrolled_by(self, user):
+        """Courses the user holds an active enrollment in."""
+        return self.filter(pk__in=active_course_ids(user))
+
+    def visible_to(self, user):
+        """Courses a teacher owns, or a student is actively enrolled in."""
+        if user.user_type == 'teacher':
+            return self.filter(teacher=user)
+        return self.enrolled_by(user)
+
+
+class CourseContentQuerySet(models.QuerySet):
+    """QuerySet for models that belong to a Course through a ``course`` foreign key."""
+
+    def visible_to(self, user):
+        """
+        Rows from courses the user teaches or is actively enrolled in.
+
+        Students are matched with a semi-join against their enrollments
+        rather than a join through ``course__enrollments``, so rows are
+        never multiplied and no DISTINCT is needed.
+        """
+        if user.user_type == 'teacher':
+            return self.filter(course__teacher=user)
+        return self.filter(course_id__in=active_course_ids(user))
+
+
+def active_course_ids(user):
+    """Subquery of the ids of courses the user is actively enrolled in."""
+    return Enrollment.objects.filter(student=user, is_active=True).values('course_id')
+
+
 class Course(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -12,6 +69,11 @@ class Course(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     is_active = models.BooleanField(default=True)
+    # Maintained by core.signals; rebuild with `manage.py rebuild_enrollment_counts`
+    active_enrollment_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CourseQuerySet.as_manager()
     
     def __str__(self):
         return self.title
@@ -25,6 +87,13 @@ class Enrollment(models.Model):
     
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            # Nearly every enrollment is active, so index only those rows
+            models.Index(fields=['student', 'course'], condition=models.Q(is_active=True),
+                         name='enrollment_active_student_idx'),
+            models.Index(fields=['course', 'student'], condition=models.Q(is_active=True),
+                         name='enrollment_active_course_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} enrolled in {self.course.title}"
@@ -43,10 +112,13 @@ class CourseMaterial(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='materials')
     title = models.CharField(max_length=200)
     description = models.TextField()
-    file_path = models.FileField(upload_to='course_materials/')
+    file_path = models.FileField(upload_to='course_materials/', db_index=True)
     file_type = models.CharField(max_length=10, choices=FILE_TYPES)
     upload_date = models.DateTimeField(auto_now_add=True)
     is_visible = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CourseContentQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -55,9 +127,10 @@ class CourseMaterial(models.Model):
 class VideoResource(models.Model):
     material = models.OneToOneField(CourseMaterial, on_delete=models.CASCADE, related_name='video_details')
     duration = models.IntegerField(help_text="Duration in seconds")
-    thumbnail_path = models.ImageField(upload_to='video_thumbnails/', null=True, blank=True)
+    thumbnail_path = models.ImageField(upload_to='video_thumbnails/', null=True, blank=True, db_index=True)
     resolution = models.CharField(max_length=20, blank=True)
     streaming_url = models.URLField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Video: {self.material.title}"
@@ -67,11 +140,18 @@ class Assignment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignments')
     title = models.CharField(max_length=200)
     description = models.TextField()
-    file_path = models.FileField(upload_to='assignment_instructions/', null=True, blank=True)  # New field for assignment file
+    file_path = models.FileField(upload_to='assignment_instructions/', null=True, blank=True, db_index=True)  # New field for assignment file
     due_date = models.DateTimeField()
     total_points = models.IntegerField()
     creation_date = models.DateTimeField(auto_now_add=True)
     
+    objects = CourseContentQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'due_date'], name='assignment_course_due_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
@@ -79,7 +159,7 @@ class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions')
     submission_date = models.DateTimeField(auto_now_add=True)
-    file_path = models.FileField(upload_to='assignment_submissions/')
+    file_path = models.FileField(upload_to='assignment_submissions/', db_index=True)
     comments = models.TextField(blank=True)
     is_late = models.BooleanField(default=False)
     
@@ -133,9 +213,17 @@ class Announcement(models.Model):
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posted_announcements')
     posted_at = models.DateTimeField(auto_now_add=True)
     is_pinned = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CourseContentQuerySet.as_manager()
     
     class Meta:
         ordering = ['-is_pinned', '-posted_at']
+        indexes = [
+            models.Index(fields=['course', 'is_pinned', 'posted_at'], name='announcement_course_pin_idx'),
+            # Cross-course feed: newest rows per course without a pin filter
+            models.Index(fields=['course', 'posted_at'], name='announcement_course_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -145,7 +233,150 @@ class CourseStructure(models.Model):
     course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='structure')
     structure_data = models.JSONField(default=dict)
     last_updated = models.DateTimeField(auto_now=True)
+    # Bumped by every save_revision(); clients send it back in If-Match
+    version = models.PositiveIntegerField(default=0, editable=False)
+    
+    objects = CourseContentQuerySet.as_manager()
     
     def __str__(self):
         return f"Structure for {self.course.title}"
+    
+    def save_revision(self, operations, author=None):
+        """
+        Save the current structure_data as the next version and record the
+        patch operations that produced it. Call inside a transaction; the
+        unique (structure, version) pair makes a concurrent writer fail
+        instead of silently overwriting.
+        """
+        self.version += 1
+        self.save()
+        return self.revisions.create(version=self.version, operations=operations, author=author)
+
+
+class CourseStructureRevision(models.Model):
+    structure = models.ForeignKey(CourseStructure, on_delete=models.CASCADE, related_name='revisions')
+    version = models.PositiveIntegerField()
+    operations = models.JSONField()
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('structure', 'version')
+    
+    def __str__(self):
+        return f"{self.structure} v{self.version}"
+
+
 
+class CourseStats(models.Model):
+    """
+    Rollup of a course's feedback, submission and grade totals, kept current
+    by deltas from core.signals. Enrollment counts live on
+    Course.active_enrollment_count. Rebuild with `manage.py rebuild_course_stats`.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    feedback_count = models.PositiveIntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    submission_count = models.PositiveIntegerField(default=0)
+    late_submission_count = models.PositiveIntegerField(default=0)
+    grade_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+
+class AssignmentStats(models.Model):
+    """Per-assignment rollup with a letter-band grade distribution."""
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    submission_count = models.PositiveIntegerField(default=0)
+    late_submission_count = models.PositiveIntegerField(default=0)
+    grade_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    grade_a = models.PositiveIntegerField(default=0)
+    grade_b = models.PositiveIntegerField(default=0)
+    grade_c = models.PositiveIntegerField(default=0)
+    grade_d = models.PositiveIntegerField(default=0)
+    grade_f = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Stats for assignment {self.assignment_id}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload: numbered chunks of ``chunk_size`` bytes are written
+    into a temporary file (see core.uploads) until every chunk has arrived,
+    then the file is validated and saved into the ``target`` model.
+    """
+    TARGETS = (
+        ('material', 'Course material'),
+        ('assignment', 'Assignment'),
+        ('submission', 'Submission'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGETS)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    received_chunks = models.JSONField(default=list)
+    # Form fields for the target serializer, e.g. course and title
+    fields = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user} - {self.filename}"
+    
+    @property
+    def chunk_count(self):
+        return -(-self.total_size // self.chunk_size)
+    
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+    
+    @property
+    def is_complete(self):
+        return len(self.received_chunks) == self.chunk_count
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file body, named by the SHA-256 of its content. ``refcount``
+    counts the MediaReference rows pointing at it; the blob file is removed
+    when the last one goes (see core.storage).
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.sha256
+
+
+class MediaReference(models.Model):
+    """A logical file name, as stored in a FileField, resolved to its blob."""
+    name = models.CharField(max_length=255, unique=True)
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, related_name='references')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+
+
+class PendingFileDeletion(models.Model):
+    """
+    A stored file whose owning row is gone, queued by core.signals and
+    removed in the background by core.tasks.process_file_deletions.
+    """
+    name = models.CharField(max_length=255)
+    queued_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return self.name
@@ -0,0 +1,105 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from .caching import current_versions, touch
+from .models import Assignment, CourseMaterial
+from .serializers import AssignmentSerializer, CourseMaterialSerializer
+
+CACHE_TIMEOUT = 3600
+
+
+def version_key(course_id):
+    return f'outlinever:{course_id}'
+
+
+def cache_key(course_id, audience, stamp, host):
+    # The outline holds absolute file URLs, so each host gets its own copy
+    return f'outline:{course_id}:{audience}:{stamp}:{hashlib.md5(host.encode()).hexdigest()[:12]}'
+
+
+def invalidate(course_id):
+    touch(version_key(course_id))
+
+
+def load_sections(structure_data):
+    # Older clients saved the outline as a JSON string
+    if isinstance(structure_data, str):
+        try:
+            structure_data = json.loads(structure_data or '[]')
+        except ValueError:
+            return []
+    if isinstance(structure_data, dict):
+        structure_data = structure_data.get('sections', [])
+    if not isinstance(structure_data, list):
+        return []
+    # The structure endpoints store any JSON; sections that aren't objects
+    # can't be rendered and are left out
+    return [section for section in structure_data if isinstance(section, dict)]
+
+
+def section_items(section):
+    items = section.get('items')
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def item_id(item):
+    try:
+        return int(item.get('id'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def resolve_outline(structure, context, include_hidden=False):
+    """
+    Return the course outline with every item hydrated under ``detail``
+    (``None`` when the row is gone, hidden or belongs to another course).
+    Materials, with their video details, and assignments are fetched in
+    one query each however many sections reference them.
+    """
+    sections = load_sections(structure.structure_data)
+    material_ids, assignment_ids = set(), set()
+    for section in sections:
+        for item in section_items(section):
+            pk = item_id(item)
+            if pk is not None:
+                (assignment_ids if item.get('type') == 'assignment' else material_ids).add(pk)
+
+    materials = CourseMaterial.objects.filter(course_id=structure.course_id, pk__in=material_ids)
+    if not include_hidden:
+        materials = materials.filter(is_visible=True)
+    materials = CourseMaterialSerializer(
+        materials.select_related('video_details'), many=True, context=context, fields=[], expand=['video_details']
+    ).data
+    assignments = AssignmentSerializer(
+        Assignment.objects.filter(course_id=structure.course_id, pk__in=assignment_ids),
+        many=True, context=context, fields=[], expand=[]
+    ).data
+    details = {
+        'material': {row['id']: row for row in materials},
+        'assignment': {row['id']: row for row in assignments},
+    }
+
+    resolved = []
+    for section in sections:
+        items = []
+        for item in section_items(section):
+            kind = 'assignment' if item.get('type') == 'assignment' else 'material'
+            items.append({**item, 'detail': details[kind].get(item_id(item))})
+        resolved.append({**section, 'items': items})
+    return {'course': structure.course_id, 'version': structure.version, 'sections': resolved}
+
+
+def get_outline(structure, context, audience):
+    """Cached resolve_outline() for ``audience`` ('teacher' sees hidden materials)."""
+    request = context.get('request')
+    host = request.build_absolute_uri('/') if request is not None else ''
+    stamp = current_versions([version_key(structure.course_id)])[version_key(structure.course_id)]
+    key = cache_key(structure.course_id, audience, stamp, host)
+    cached = cache.get(key)
+    if cached is not None and cached['version'] == structure.version:
+        return cached
+    outline = resolve_outline(structure, context, include_hidden=audience == 'teacher')
+    cache.set(key, outline, CACHE_TIMEOUT)
+    return outline
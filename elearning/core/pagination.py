@@ -0,0 +1,36 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset pagination that only kicks in when the client sends ``cursor`` or
+    ``page_size``; plain list requests keep returning the whole result set.
+
+    Each page is fetched with a ``WHERE key > last_seen`` filter on the view's
+    ``cursor_ordering`` rather than an OFFSET, so deep pages cost the same as
+    the first one. The first ordering field should be indexed.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'CURSOR_PAGINATION_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+
+class FeedCursorPagination(CursorPagination):
+    """Always-on keyset pagination for timelines, newest first."""
+    ordering = ('-posted_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
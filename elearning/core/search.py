@@ -0,0 +1,134 @@
+import re
+
+from django.db import connection
+
+from .models import Announcement, Course, CourseMaterial, active_course_ids
+
+TABLE = 'core_search_index'
+
+# Each indexed object gets a fixed rowid so it can be replaced or removed
+# without scanning the index: rowid = pk * len(KINDS) + kind code.
+KINDS = {Course: 'course', CourseMaterial: 'material', Announcement: 'announcement'}
+KIND_CODES = {'course': 0, 'material': 1, 'announcement': 2}
+
+# bm25 weights for the title, body and course_tag columns
+WEIGHTS = (10.0, 1.0, 0.0)
+MAX_LIMIT = 100
+
+REBUILD_SQL = [
+    f"DELETE FROM {TABLE}",
+    f"""INSERT INTO {TABLE} (rowid, title, body, course_tag, kind, object_id, course_id)
+        SELECT id * 3, title, description, 'c' || id, 'course', id, id FROM core_course""",
+    f"""INSERT INTO {TABLE} (rowid, title, body, course_tag, kind, object_id, course_id)
+        SELECT id * 3 + 1, title, description,
+               'c' || course_id || CASE WHEN is_visible THEN '' ELSE ' hidden' END,
+               'material', id, course_id
+        FROM core_coursematerial""",
+    f"""INSERT INTO {TABLE} (rowid, title, body, course_tag, kind, object_id, course_id)
+        SELECT id * 3 + 2, title, content, 'c' || course_id, 'announcement', id, course_id
+        FROM core_announcement""",
+]
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def rowid(kind, pk):
+    return pk * len(KIND_CODES) + KIND_CODES[kind]
+
+
+def document(instance):
+    """Return ``(kind, title, body, course_tag, course_id)`` for an indexed object."""
+    if isinstance(instance, Course):
+        return 'course', instance.title, instance.description, f'c{instance.pk}', instance.pk
+    if isinstance(instance, CourseMaterial):
+        tag = f'c{instance.course_id}' if instance.is_visible else f'c{instance.course_id} hidden'
+        return 'material', instance.title, instance.description, tag, instance.course_id
+    return 'announcement', instance.title, instance.content, f'c{instance.course_id}', instance.course_id
+
+
+def index_object(instance):
+    if not is_available():
+        return
+    kind, title, body, course_tag, course_id = document(instance)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABLE} (rowid, title, body, course_tag, kind, object_id, course_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [rowid(kind, instance.pk), title, body, course_tag, kind, instance.pk, course_id],
+        )
+
+
+def remove_object(instance):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [rowid(KINDS[type(instance)], instance.pk)])
+
+
+def rebuild_index():
+    """Repopulate the whole index from the source tables. Returns the row count."""
+    with connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 query over the title and body columns.
+    Every word must match; a trailing ``*`` makes the word a prefix query.
+    Returns ``None`` when the text holds no searchable words.
+    """
+    terms = []
+    for word, star in re.findall(r'(\w+)(\*?)', query):
+        terms.append(f'"{word}"{star}')
+    if not terms:
+        return None
+    return '{title body} : (%s)' % ' '.join(terms)
+
+
+def visible_course_ids(user):
+    if user.user_type == 'teacher':
+        return list(Course.objects.filter(teacher=user).values_list('pk', flat=True))
+    return list(active_course_ids(user).values_list('course_id', flat=True))
+
+
+def search(user, query, kinds=None, limit=20):
+    """
+    Ranked matches for ``query`` among the objects of courses ``user`` can
+    see, best first, as dicts with a highlighted body snippet.
+
+    The caller's courses are matched as ``course_tag`` tokens inside the FTS
+    query itself, so the index intersects posting lists instead of ranking
+    every match in the table and filtering afterwards.
+    """
+    match = build_match(query)
+    course_ids = visible_course_ids(user)
+    if match is None or not course_ids:
+        return []
+
+    match = f"{match} AND course_tag : ({' OR '.join(f'c{pk}' for pk in course_ids)})"
+    if user.user_type != 'teacher':
+        match += ' NOT course_tag : hidden'
+    sql = (
+        f"SELECT kind, object_id, course_id, title, "
+        f"snippet({TABLE}, 1, '<mark>', '</mark>', '…', 12), bm25({TABLE}, %s, %s, %s) AS rank "
+        f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+    )
+    params = [*WEIGHTS, match]
+    if kinds:
+        sql += f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+        params.extend(kinds)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(min(limit, MAX_LIMIT))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {'type': kind, 'id': object_id, 'course': course_id, 'title': title, 'snippet': snippet, 'rank': rank}
+        for kind, object_id, course_id, title, snippet, rank in rows
+    ]
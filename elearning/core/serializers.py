@@ -1,52 +1,83 @@
 from rest_framework import serializers
 from .models import (
     Course, Enrollment, CourseMaterial, VideoResource,
-    Assignment, Submission, Grade, CourseFeedback, Announcement, CourseStructure
+    Assignment, Submission, Grade, CourseFeedback, Announcement, CourseStructure, UploadSession
 )
 from userauths.models import User  
-from userauths.serializers import UserSerializer
+from django.conf import settings
+from . import uploads
+from .caching import FragmentCacheMixin, FragmentListSerializer
+from .dynamic_fields import DynamicFieldsMixin
+from .images import ImageVariantsField
 
-class CourseSerializer(serializers.ModelSerializer):
-    teacher = UserSerializer(read_only=True)
+USER_SERIALIZER = 'userauths.serializers.UserSerializer'
+
+class CourseSerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     enrollment_count = serializers.SerializerMethodField()
+    cover_image_variants = ImageVariantsField(source='cover_image_path')
     
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'teacher', 'cover_image_path', 
+        fields = ['id', 'title', 'description', 'teacher', 'cover_image_path', 'cover_image_variants',
                   'start_date', 'end_date', 'is_active', 'enrollment_count']
+        read_only_fields = ['teacher']
+        list_serializer_class = FragmentListSerializer
+        expandable_fields = {
+            'teacher': (USER_SERIALIZER, {}),
+        }
     
     def get_enrollment_count(self, obj):
-        return obj.enrollments.filter(is_active=True).count()
+        # CourseViewSet annotates the count; nested representations fall back
+        # to the maintained counter column so they never issue a COUNT per row.
+        annotated = getattr(obj, 'active_enrollments', None)
+        if annotated is not None:
+            return annotated
+        return obj.active_enrollment_count
 
-class EnrollmentSerializer(serializers.ModelSerializer):
-    student = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), write_only=True)  
-    course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all(), write_only=True)  
-    student_detail = UserSerializer(source='student', read_only=True) 
-    course_detail = CourseSerializer(source='course', read_only=True)  
+class EnrollmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    student = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())  
+    course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())  
     
     class Meta:
         model = Enrollment
-        fields = ['id', 'student', 'course', 'student_detail', 'course_detail', 'enrollment_date', 'is_active']
+        fields = ['id', 'student', 'course', 'enrollment_date', 'is_active']
+        expandable_fields = {
+            'student_detail': (USER_SERIALIZER, {'source': 'student'}),
+            'course_detail': (CourseSerializer, {'source': 'course'}),
+        }
 
-class VideoResourceSerializer(serializers.ModelSerializer):
+class VideoResourceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    thumbnail_variants = ImageVariantsField(source='thumbnail_path')
+    
     class Meta:
         model = VideoResource
-        fields = ['id', 'material', 'duration', 'thumbnail_path', 'resolution', 'streaming_url']
+        fields = ['id', 'material', 'duration', 'thumbnail_path', 'thumbnail_variants', 'resolution',
+                  'streaming_url']
 
-class CourseMaterialSerializer(serializers.ModelSerializer):
-    video_details = VideoResourceSerializer(read_only=True)
+class CourseMaterialSerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    video_details = serializers.PrimaryKeyRelatedField(read_only=True)
     
     class Meta:
         model = CourseMaterial
         fields = ['id', 'course', 'title', 'description', 'file_path', 
                   'file_type', 'upload_date', 'is_visible', 'video_details']
+        list_serializer_class = FragmentListSerializer
+        expandable_fields = {
+            'video_details': (VideoResourceSerializer, {}),
+        }
+        eager_fields = {
+            'video_details': ['video_details'],
+        }
 
-class AssignmentSerializer(serializers.ModelSerializer):
+class AssignmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())  
     
     class Meta:
         model = Assignment
         fields = ['id', 'course', 'title', 'description', 'file_path', 'due_date', 'total_points', 'creation_date']
+        expandable_fields = {
+            'course': (CourseSerializer, {}),
+        }
     
     def validate_file_path(self, value):
         if value:
@@ -57,14 +88,17 @@ class AssignmentSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("File size must not exceed 10MB.")
         return value
     
-class SubmissionSerializer(serializers.ModelSerializer):
-    student = UserSerializer(read_only=True)
-    assignment_detail = AssignmentSerializer(source='assignment', read_only=True)  # For detailed output
-    assignment = serializers.PrimaryKeyRelatedField(queryset=Assignment.objects.all(), write_only=True)  # For input
+class SubmissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    assignment = serializers.PrimaryKeyRelatedField(queryset=Assignment.objects.all())
     
     class Meta:
         model = Submission
-        fields = ['id', 'assignment', 'assignment_detail', 'student', 'submission_date', 'file_path', 'comments', 'is_late']
+        fields = ['id', 'assignment', 'student', 'submission_date', 'file_path', 'comments', 'is_late']
+        read_only_fields = ['student']
+        expandable_fields = {
+            'assignment_detail': (AssignmentSerializer, {'source': 'assignment'}),
+            'student': (USER_SERIALIZER, {}),
+        }
     
     def validate_file_path(self, value):
      
@@ -75,28 +109,108 @@ class SubmissionSerializer(serializers.ModelSerializer):
             if value.size > 5 * 1024 * 1024:  # Example: Limit to 5MB
                 raise serializers.ValidationError("File size must not exceed 5MB.")
         return value
-    
-class GradeSerializer(serializers.ModelSerializer):
-    student = UserSerializer(read_only=True)
-    assignment = AssignmentSerializer(read_only=True)
+
+def validate_score(score, total_points):
+    if score < 0 or score > total_points:
+        raise serializers.ValidationError({'score': f'Score must be between 0 and {total_points}.'})
+
+class GradeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Grade
         fields = ['id', 'submission', 'student', 'course', 'assignment', 'score', 'feedback', 'graded_date']
+        # Derived from the submission on save
+        read_only_fields = ['student', 'course', 'assignment']
+        expandable_fields = {
+            'student': (USER_SERIALIZER, {}),
+            'course': (CourseSerializer, {}),
+            'assignment': (AssignmentSerializer, {}),
+        }
+    
+    def validate(self, attrs):
+        submission = attrs.get('submission') or getattr(self.instance, 'submission', None)
+        score = attrs.get('score')
+        if submission is not None and score is not None:
+            validate_score(score, submission.assignment.total_points)
+        return attrs
+
+class BulkGradeEntrySerializer(serializers.Serializer):
+    submission = serializers.IntegerField()
+    score = serializers.DecimalField(max_digits=5, decimal_places=2)
+    feedback = serializers.CharField(required=False, allow_blank=True, default='')
 
-class CourseFeedbackSerializer(serializers.ModelSerializer):
-    student = UserSerializer(read_only=True)
-    course = CourseSerializer(read_only=True)
+class CourseFeedbackSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CourseFeedback
         fields = ['id', 'course', 'student', 'rating', 'comments', 'submission_date', 'is_anonymous']
+        read_only_fields = ['course', 'student']
+        expandable_fields = {
+            'course': (CourseSerializer, {}),
+            'student': (USER_SERIALIZER, {}),
+        }
 
-class AnnouncementSerializer(serializers.ModelSerializer):
-    posted_by = UserSerializer(read_only=True)
+class AnnouncementSerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Announcement
         fields = ['id', 'course', 'title', 'content', 'posted_by', 'posted_at', 'is_pinned']
+        read_only_fields = ['posted_by']
+        list_serializer_class = FragmentListSerializer
+        expandable_fields = {
+            'course': (CourseSerializer, {}),
+            'posted_by': (USER_SERIALIZER, {}),
+        }
 
-class CourseStructureSerializer(serializers.ModelSerializer):
+class CourseStructureSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CourseStructure
-        fields = ['id', 'course', 'structure_data', 'last_updated']
\ No newline at end of file
+        fields = ['id', 'course', 'structure_data', 'last_updated', 'version']
+        expandable_fields = {
+            'course': (CourseSerializer, {}),
+        }
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.IntegerField(
+        min_value=uploads.MIN_CHUNK_SIZE, max_value=uploads.MAX_CHUNK_SIZE, default=uploads.DEFAULT_CHUNK_SIZE
+    )
+    chunk_count = serializers.IntegerField(read_only=True)
+    received = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'filename', 'total_size', 'chunk_size', 'chunk_count', 'received', 'fields',
+                  'created_at', 'updated_at']
+    
+    def get_received(self, obj):
+        return uploads.received_ranges(obj.received_chunks)
+    
+    def validate_target(self, value):
+        # Students upload submissions; teachers upload course content
+        user_type = self.context['request'].user.user_type
+        if (value == 'submission') != (user_type == 'student'):
+            raise serializers.ValidationError(f"A {user_type} cannot upload a {value}.")
+        return value
+    
+    def validate_filename(self, value):
+        value = value.replace('\\', '/').rsplit('/', 1)[-1]
+        if not value:
+            raise serializers.ValidationError("A file name is required.")
+        return value
+    
+    def validate_total_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Empty files cannot be uploaded.")
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError("File is too large.")
+        return value
+    
+    def validate_fields(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Expected an object of form fields.")
+        return value
+    
+    def validate(self, attrs):
+        if -(-attrs['total_size'] // attrs['chunk_size']) > uploads.MAX_CHUNKS:
+            raise serializers.ValidationError({
+                'chunk_size': f"Chunks must be large enough to send the file in at most {uploads.MAX_CHUNKS} chunks."
+            })
+        return attrs
+
@@ -0,0 +1,219 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+from userauths.models import User
+
+from . import caching, catalog, dashboard, file_cleanup, images, outline, search, stats, tasks
+from .models import (
+    Announcement, Assignment, Course, CourseFeedback, CourseMaterial, CourseStructure, Enrollment, Grade,
+    Submission, VideoResource
+)
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment_course(sender, instance, **kwargs):
+    # An update may move the enrollment to another course
+    instance._previous_course_id = None
+    if not instance._state.adding:
+        instance._previous_course_id = sender.objects.filter(pk=instance.pk).values_list(
+            'course_id', flat=True
+        ).first()
+
+
+def enrollment_course_ids(instance):
+    previous = getattr(instance, '_previous_course_id', None)
+    return {instance.course_id} if previous in (None, instance.course_id) else {instance.course_id, previous}
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def sync_course_enrollment_count(sender, instance, **kwargs):
+    # Recount rather than increment so creates, deletes and is_active toggles
+    # all converge on the same value.
+    course_ids = enrollment_course_ids(instance)
+    Course.objects.filter(pk__in=course_ids).refresh_enrollment_counts()
+    caching.invalidate_fragments(Course, *course_ids)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_enrollment_dashboards(sender, instance, **kwargs):
+    # The course's counter changed too, which every enrolled student sees
+    caching.touch(
+        dashboard.user_key(instance.student_id),
+        *(dashboard.course_key(course_id) for course_id in enrollment_course_ids(instance))
+    )
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_dashboards(sender, instance, **kwargs):
+    caching.touch(dashboard.course_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Assignment)
+@receiver([post_save, post_delete], sender=Announcement)
+def invalidate_course_content_dashboards(sender, instance, **kwargs):
+    caching.touch(dashboard.course_key(instance.course_id))
+
+
+@receiver([post_save, post_delete], sender=Submission)
+@receiver([post_save, post_delete], sender=Grade)
+def invalidate_student_dashboards(sender, instance, **kwargs):
+    caching.touch(dashboard.user_key(instance.student_id))
+
+
+# Course analytics rollups: pre_* hooks remember the row's old contribution,
+# post_* hooks swap it for the new one.
+
+def stats_contribution(instance):
+    if isinstance(instance, Grade):
+        return stats.grade_contribution(instance, instance.assignment.total_points)
+    if isinstance(instance, Submission):
+        return stats.submission_contribution(instance, instance.assignment.course_id)
+    return stats.feedback_contribution(instance)
+
+
+@receiver(pre_save, sender=Grade)
+@receiver(pre_save, sender=Submission)
+@receiver(pre_save, sender=CourseFeedback)
+def remember_stats_contribution(sender, instance, **kwargs):
+    instance._stats_removed = []
+    if not instance._state.adding:
+        old = sender.objects.filter(pk=instance.pk).first()
+        if old is not None:
+            instance._stats_removed.append(stats_contribution(old))
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_save, sender=Submission)
+@receiver(post_save, sender=CourseFeedback)
+def update_stats_on_save(sender, instance, **kwargs):
+    stats.apply_changes(removed=instance.__dict__.pop('_stats_removed', []), added=[stats_contribution(instance)])
+
+
+@receiver(pre_delete, sender=Grade)
+@receiver(pre_delete, sender=Submission)
+@receiver(pre_delete, sender=CourseFeedback)
+def remember_deleted_stats_contribution(sender, instance, **kwargs):
+    # Related rows may be gone by post_delete when this is part of a cascade
+    instance._stats_removed = [stats_contribution(instance)]
+
+
+@receiver(post_delete, sender=Grade)
+@receiver(post_delete, sender=Submission)
+@receiver(post_delete, sender=CourseFeedback)
+def update_stats_on_delete(sender, instance, **kwargs):
+    stats.apply_changes(removed=instance.__dict__.pop('_stats_removed', []))
+
+
+@receiver(post_save, sender=Assignment)
+def rebuild_assignment_stats(sender, instance, created, **kwargs):
+    # total_points may have changed, which moves grades between bands
+    if not created:
+        stats.rebuild_stats(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=CourseMaterial)
+@receiver(post_save, sender=Announcement)
+def update_search_index(sender, instance, **kwargs):
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=CourseMaterial)
+@receiver(post_delete, sender=Announcement)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver([post_save, post_delete], sender=CourseStructure)
+@receiver([post_save, post_delete], sender=CourseMaterial)
+@receiver([post_save, post_delete], sender=Assignment)
+def invalidate_outline(sender, instance, **kwargs):
+    outline.invalidate(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=VideoResource)
+def invalidate_video_outline(sender, instance, **kwargs):
+    # Gone already when the material itself is being deleted, which
+    # invalidates the outline on its own
+    course_id = CourseMaterial.objects.filter(pk=instance.material_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        outline.invalidate(course_id)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=CourseMaterial)
+@receiver([post_save, post_delete], sender=Announcement)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_fragment(sender, instance, **kwargs):
+    caching.invalidate_fragments(sender, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=VideoResource)
+def invalidate_video_material_fragment(sender, instance, **kwargs):
+    # The material renders its video's primary key
+    caching.invalidate_fragments(CourseMaterial, instance.material_id)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_catalog(sender, instance, **kwargs):
+    catalog.invalidate()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_catalog_teacher(sender, instance, update_fields=None, **kwargs):
+    # Catalog pages may expand the teacher; logins only touch last_login
+    if instance.user_type == 'teacher' and update_fields != frozenset({'last_login'}):
+        catalog.invalidate_teachers()
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=CourseMaterial)
+@receiver(post_delete, sender=VideoResource)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Submission)
+@receiver(post_delete, sender=User)
+def queue_file_deletion(sender, instance, **kwargs):
+    # Queued in the delete's own transaction, so a rollback keeps the files;
+    # cascades reach here too, unlike the viewsets' destroy handlers did
+    file_cleanup.queue_deletion(file_cleanup.file_names(instance))
+
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=VideoResource)
+@receiver(post_save, sender=User)
+def generate_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    if not settings.IMAGE_DERIVATIVES_EAGER:
+        return
+    field = dict(images.IMAGE_FIELDS)[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    name = getattr(instance, field).name
+    if name:
+        transaction.on_commit(lambda: tasks.generate_image_derivatives.delay(name))
+
+
+@receiver(pre_save, sender=CourseMaterial)
+def remember_video_file(sender, instance, update_fields=None, **kwargs):
+    # Only a new or replaced file needs probing, not every edit of the row
+    instance._probe_video = (
+        instance.file_type == 'video' and bool(instance.file_path)
+        and (update_fields is None or 'file_path' in update_fields)
+        and not sender.objects.filter(
+            pk=instance.pk, file_type='video', file_path=instance.file_path.name
+        ).exists()
+    )
+
+
+@receiver(post_save, sender=CourseMaterial)
+def probe_uploaded_video(sender, instance, **kwargs):
+    if not getattr(instance, '_probe_video', False):
+        return
+    pk = instance.pk
+    # Probing reads a few header bytes, so without a broker it runs inline
+    probe = tasks.probe_video.delay if settings.VIDEO_PROBE_ASYNC else tasks.probe_video
+    transaction.on_commit(lambda: probe(pk))
@@ -0,0 +1,170 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import Assignment, AssignmentStats, Course, CourseFeedback, CourseStats, Grade, Submission
+
+# Letter bands by lower bound, in tenths of the assignment's total_points
+BANDS = (('grade_a', 9), ('grade_b', 8), ('grade_c', 7), ('grade_d', 6))
+
+
+def grade_band(score, total_points):
+    for field, tenths in BANDS:
+        if Decimal(score) * 10 >= total_points * tenths:
+            return field
+    return 'grade_f'
+
+
+# A contribution maps (rollup model, pk) -> {field: amount} for one source row.
+# Writes subtract the row's old contribution and add its new one.
+
+def feedback_contribution(feedback):
+    return {(CourseStats, feedback.course_id): {'feedback_count': 1, 'rating_total': feedback.rating}}
+
+
+def submission_contribution(submission, course_id):
+    values = {'submission_count': 1, 'late_submission_count': int(submission.is_late)}
+    return {(CourseStats, course_id): values, (AssignmentStats, submission.assignment_id): values}
+
+
+def grade_contribution(grade, total_points):
+    score = Decimal(grade.score)
+    return {
+        (CourseStats, grade.course_id): {'grade_count': 1, 'score_total': score},
+        (AssignmentStats, grade.assignment_id): {
+            'grade_count': 1, 'score_total': score, grade_band(score, total_points): 1,
+        },
+    }
+
+
+def apply_changes(removed=(), added=()):
+    """
+    Fold contributions into net deltas and apply them with one ``F()``
+    UPDATE per rollup row. Rows that were never built are left alone; they
+    are computed from scratch on first read.
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+    for sign, contributions in ((-1, removed), (1, added)):
+        for contribution in contributions:
+            for key, values in contribution.items():
+                for field, amount in values.items():
+                    totals[key][field] += sign * amount
+    for (model, pk), values in totals.items():
+        changes = {field: F(field) + amount for field, amount in values.items() if amount}
+        if changes:
+            model.objects.filter(pk=pk).update(**changes)
+
+
+def rebuild_stats(courses):
+    """
+    Recompute the CourseStats and AssignmentStats rows of ``courses`` from
+    the raw tables with grouped aggregates. Returns the number of courses.
+    """
+    course_ids = list(courses.values_list('pk', flat=True))
+    course_rows = {pk: CourseStats(course_id=pk) for pk in course_ids}
+    assignment_rows = {
+        pk: AssignmentStats(assignment_id=pk)
+        for pk in Assignment.objects.filter(course_id__in=course_ids).values_list('pk', flat=True)
+    }
+
+    feedback = (
+        CourseFeedback.objects.filter(course_id__in=course_ids)
+        .values('course_id')
+        .annotate(count=Count('pk'), total=Sum('rating'))
+        .order_by()
+    )
+    for row in feedback:
+        stats = course_rows[row['course_id']]
+        stats.feedback_count, stats.rating_total = row['count'], row['total']
+
+    submissions = (
+        Submission.objects.filter(assignment__course_id__in=course_ids)
+        .values('assignment_id', 'assignment__course_id')
+        .annotate(count=Count('pk'), late=Count('pk', filter=Q(is_late=True)))
+        .order_by()
+    )
+    for row in submissions:
+        for stats in (course_rows[row['assignment__course_id']], assignment_rows[row['assignment_id']]):
+            stats.submission_count += row['count']
+            stats.late_submission_count += row['late']
+
+    # Cumulative "at least this band" counts, differenced into bands below
+    at_least = {
+        field: Count('pk', filter=GreaterThanOrEqual(F('score') * 10, F('assignment__total_points') * tenths))
+        for field, tenths in BANDS
+    }
+    grades = (
+        Grade.objects.filter(assignment__course_id__in=course_ids)
+        .values('assignment_id', 'course_id')
+        .annotate(count=Count('pk'), total=Sum('score'), **at_least)
+        .order_by()
+    )
+    for row in grades:
+        if row['course_id'] in course_rows:
+            stats = course_rows[row['course_id']]
+            stats.grade_count += row['count']
+            stats.score_total += row['total']
+        stats = assignment_rows[row['assignment_id']]
+        stats.grade_count += row['count']
+        stats.score_total += row['total']
+        previous = 0
+        for field, _ in BANDS:
+            setattr(stats, field, getattr(stats, field) + row[field] - previous)
+            previous = row[field]
+        stats.grade_f += row['count'] - previous
+
+    with transaction.atomic():
+        CourseStats.objects.filter(course_id__in=course_ids).delete()
+        AssignmentStats.objects.filter(assignment__course_id__in=course_ids).delete()
+        CourseStats.objects.bulk_create(course_rows.values(), batch_size=500)
+        AssignmentStats.objects.bulk_create(assignment_rows.values(), batch_size=500)
+    return len(course_ids)
+
+
+def average(total, count):
+    return round(Decimal(total) / count, 2) if count else None
+
+
+def rate(count, total):
+    return round(count / total, 4) if total else None
+
+
+def get_course_stats(course):
+    """Read a course's analytics from its rollup rows, building them on first use."""
+    assignments = list(Assignment.objects.filter(course=course).select_related('stats').order_by('due_date', 'id'))
+    course_row = CourseStats.objects.filter(course=course).first()
+    if course_row is None or not all(hasattr(assignment, 'stats') for assignment in assignments):
+        rebuild_stats(Course.objects.filter(pk=course.pk))
+        return get_course_stats(course)
+
+    enrolled = course.active_enrollment_count
+    return {
+        'course': course.pk,
+        'active_enrollments': enrolled,
+        'feedback_count': course_row.feedback_count,
+        'average_rating': average(course_row.rating_total, course_row.feedback_count),
+        'submission_count': course_row.submission_count,
+        'submission_rate': rate(course_row.submission_count, enrolled * len(assignments)),
+        'late_rate': rate(course_row.late_submission_count, course_row.submission_count),
+        'grade_count': course_row.grade_count,
+        'average_score': average(course_row.score_total, course_row.grade_count),
+        'assignments': [
+            {
+                'id': assignment.pk,
+                'title': assignment.title,
+                'total_points': assignment.total_points,
+                'submission_count': assignment.stats.submission_count,
+                'submission_rate': rate(assignment.stats.submission_count, enrolled),
+                'late_rate': rate(assignment.stats.late_submission_count, assignment.stats.submission_count),
+                'grade_count': assignment.stats.grade_count,
+                'average_score': average(assignment.stats.score_total, assignment.stats.grade_count),
+                'distribution': {
+                    band: getattr(assignment.stats, f'grade_{band.lower()}') for band in 'ABCDF'
+                },
+            }
+            for assignment in assignments
+        ],
+    }
@@ -0,0 +1,171 @@
+"""
+Deduplicating file storage.
+
+Uploaded bodies are stored once under ``blobs/<aa>/<bb>/<sha256>`` in
+MEDIA_ROOT, hashed while they are streamed to disk. The name a FileField
+stores is a logical name (``course_materials/notes.pdf``) mapped to its blob
+by a MediaReference row, and MediaBlob.refcount tracks how many names share
+a body, so identical re-uploads cost no disk and deleting one name never
+removes a body another name still uses.
+
+Files written before this backend was enabled have no reference and are
+still read from their original path.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .models import MediaBlob, MediaReference
+
+BLOB_DIR = 'blobs'
+
+
+def blob_name(digest):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def is_blob_path(name):
+    return name.replace('\\', '/').lstrip('/').split('/', 1)[0] == BLOB_DIR
+
+
+def hash_file(path):
+    """Return ``(sha256 hex digest, size)`` of the file at ``path``."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        while block := fh.read(1024 * 1024):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def resolve(self, name):
+        """Return the stored name behind logical ``name``: its blob, or the name itself."""
+        digest = MediaReference.objects.filter(name=name).values_list('blob_id', flat=True).first()
+        return blob_name(digest) if digest else name
+
+    def path(self, name):
+        return super().path(self.resolve(name))
+
+    def _spool(self, content):
+        """
+        Hash ``content`` and get it into a file next to the blobs. Returns
+        ``(digest, size, temp_path)``; the caller owns ``temp_path``.
+        """
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large or chunked uploads): hash it in place
+            return (*hash_file(content.temporary_file_path()), content.temporary_file_path())
+
+        digest = hashlib.sha256()
+        size = 0
+        spool_dir = super().path(f'{BLOB_DIR}/tmp')
+        os.makedirs(spool_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=spool_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    fh.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return digest.hexdigest(), size, temp_path
+
+    def _save(self, name, content):
+        digest, size, source = self._spool(content)
+        try:
+            self.store(name, digest, size, source)
+        finally:
+            # Only our own spool file; files already on disk belong to the caller
+            if not hasattr(content, 'temporary_file_path'):
+                os.remove(source)
+        return name
+
+    def place(self, source, target):
+        """Put a copy of ``source`` at ``target``: a hard link when possible, never a partial file."""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            # Another filesystem: copy aside, then rename into place
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            os.close(fd)
+            try:
+                shutil.copyfile(source, temp_path)
+                os.replace(temp_path, target)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        if self.file_permissions_mode is not None:
+            os.chmod(target, self.file_permissions_mode)
+
+    def store(self, name, digest, size, source):
+        """
+        Point ``name`` at blob ``digest``, placing a copy of ``source`` when
+        the blob is new. ``source`` itself is left alone, so the caller
+        still has it if the transaction fails. Returns True when the body
+        was already stored.
+        """
+        target = super().path(blob_name(digest))
+        placed = False
+        try:
+            with transaction.atomic():
+                blob, _ = MediaBlob.objects.select_for_update().get_or_create(sha256=digest, defaults={'size': size})
+                existed = os.path.exists(target)
+                if not existed:
+                    self.place(source, target)
+                    placed = True
+                MediaReference.objects.create(name=name, blob=blob)
+                MediaBlob.objects.filter(pk=digest).update(refcount=F('refcount') + 1)
+        except BaseException:
+            # The blob row was rolled back with it
+            if placed:
+                os.remove(target)
+            raise
+        return existed
+
+    def adopt(self, name):
+        """
+        Move a file written before this backend into blob storage under its
+        existing name. Returns ``(size, duplicate)``.
+        """
+        source = super().path(name)
+        digest, size = hash_file(source)
+        duplicate = self.store(name, digest, size, source)
+
+        def remove_original():
+            if os.path.exists(source):
+                os.remove(source)
+
+        # The original is the only copy until the reference has committed
+        transaction.on_commit(remove_original)
+        return size, duplicate
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        with transaction.atomic():
+            reference = MediaReference.objects.select_for_update().filter(name=name).first()
+            if reference is None:
+                return super().delete(name)
+            blob = MediaBlob.objects.select_for_update().get(pk=reference.blob_id)
+            reference.delete()
+            if blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            digest = blob.pk
+            blob.delete()
+            transaction.on_commit(lambda: self.remove_unreferenced_blob(digest))
+
+    def remove_unreferenced_blob(self, digest):
+        # A concurrent upload of the same body may have revived the blob
+        if not MediaBlob.objects.filter(pk=digest).exists():
+            super().delete(blob_name(digest))
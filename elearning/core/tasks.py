@@ -1,6 +1,7 @@
 from celery import shared_task
 from userauths.models import Notification
 from .models import Enrollment, CourseMaterial
+from . import file_cleanup, images, video_probe
 
 @shared_task
 def notify_teacher_enrollment(student_id, course_id):
@@ -23,4 +24,27 @@ def notify_students_material(material_id):
             notification_type='material',
             message=f"New material '{material.title}' added to {material.course.title}",
             related_id=material_id
-        )
\ No newline at end of file
+        )
+
+@shared_task
+def process_file_deletions():
+    """Run by celery beat (CELERY_BEAT_SCHEDULE) to drain the file deletion queue."""
+    return file_cleanup.process_queue()
+
+
+@shared_task
+def generate_image_derivatives(name):
+    """Queued after an image upload when IMAGE_DERIVATIVES_EAGER is set."""
+    return images.generate_all(name)
+
+@shared_task
+def probe_video(material_id):
+    """Fill in a video material's duration and resolution from its file's headers."""
+    material = CourseMaterial.objects.filter(pk=material_id, file_type='video').first()
+    if material is None or not material.file_path:
+        return None
+    try:
+        return video_probe.update_video_metadata(material)._asdict()
+    except (video_probe.ProbeError, OSError):
+        # Not a container we can read; the values stay as typed in
+        return None
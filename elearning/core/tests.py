@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -6,16 +6,62 @@ from django.utils import timezone
 from datetime import timedelta
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from io import BytesIO, StringIO
+from decimal import Decimal
+import csv
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+import re
+import json
+import os
+import shutil
+import struct
+import zipfile
+import tempfile
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
 
 from .models import (
     Course, Enrollment, CourseMaterial, Assignment, 
-    Submission, Grade, CourseFeedback, Announcement
+    Submission, Grade, CourseFeedback, Announcement, VideoResource, CourseStructure,
+    CourseStructureRevision, UploadSession, MediaBlob, MediaReference, PendingFileDeletion
 )
 from .serializers import (
     CourseSerializer, EnrollmentSerializer, CourseMaterialSerializer,
     AssignmentSerializer, SubmissionSerializer, GradeSerializer
 )
-from userauths.models import User
+from .pagination import OptInCursorPagination
+from .enrollment_import import import_enrollments
+from .stats import get_course_stats
+from .json_patch import JsonPatchError, apply_patch
+from . import catalog
+from . import images
+from . import uploads
+from . import video_probe
+from .storage import blob_name
+from rest_framework_simplejwt.tokens import AccessToken
+from .file_cleanup import collect_garbage, process_queue
+from PIL import Image
+from django.core.files.storage import default_storage
+from .views import (
+    CourseViewSet, CourseMaterialViewSet, AssignmentViewSet, SubmissionViewSet,
+    AnnouncementViewSet, CourseStructureViewSet
+)
+from .api_urls import router as core_api_router
+from .urls import router as core_router
+from addon.api_urls import router as addon_api_router
+from addon.urls import router as addon_router
+from addon.models import ChatRoom, ChatMessage, ChatParticipant
+from addon.views import ChatRoomViewSet, ChatMessageViewSet, ChatParticipantViewSet, get_unread_count
+from userauths.models import User, UserPermission, StatusUpdate, Notification
+from userauths.urls import router as userauths_router
+from userauths.views import NotificationViewSet
 
 
 # Model Tests
@@ -465,3 +511,3091 @@ class EnrollmentViewSetTest(TestCase):
         
         # Check response - should be bad request due to unique constraint
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EnrollmentCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        
+        self.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            for i in range(3)
+        ]
+        
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def test_counter_tracks_create_toggle_and_delete(self):
+        enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in self.students]
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, 3)
+        
+        # Deactivating an enrollment lowers the count
+        enrollments[0].is_active = False
+        enrollments[0].save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, 2)
+        
+        enrollments[1].delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, 1)
+    
+    def test_moving_enrollment_recounts_both_courses(self):
+        other = Course.objects.create(
+            title='Other Course',
+            description='Other Course Description',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        enrollment = Enrollment.objects.create(student=self.students[0], course=self.course)
+        
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.patch(f'/api/core/enrollments/{enrollment.id}/', {'course': other.id}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.course.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.course.active_enrollment_count, other.active_enrollment_count), (0, 1))
+    
+    def test_rebuild_command_repairs_drift(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        Course.objects.update(active_enrollment_count=0)
+        
+        call_command('rebuild_enrollment_counts', stdout=StringIO())
+        
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, 3)
+    
+    def test_course_list_counts_in_constant_queries(self):
+        for i in range(5):
+            course = Course.objects.create(
+                title=f'Course {i}',
+                description='Description',
+                teacher=self.teacher,
+                start_date=timezone.now().date(),
+                end_date=(timezone.now() + timedelta(days=30)).date()
+            )
+            for student in self.students:
+                Enrollment.objects.create(student=student, course=course)
+        
+        self.client.force_authenticate(user=self.students[0])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {item['id']: item['enrollment_count'] for item in response.data}
+        self.assertEqual(counts[self.course.id], 0)
+        self.assertEqual(sorted(counts.values()), [0, 3, 3, 3, 3, 3])
+        # No per-course COUNT queries
+        count_queries = [q for q in ctx.captured_queries if 'core_enrollment' in q['sql']]
+        self.assertLessEqual(len(count_queries), 1)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        
+        self.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        for i in range(7):
+            Announcement.objects.create(
+                course=self.course,
+                title=f'Announcement {i}',
+                content='Content',
+                posted_by=self.teacher
+            )
+        
+        self.client.force_authenticate(user=self.teacher)
+        self.list_url = '/api/core/announcements/'
+    
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.list_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+    
+    def test_walk_all_pages_with_cursor(self):
+        seen = []
+        url = f'{self.list_url}?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        
+        # Newest first, every row exactly once
+        expected = list(Announcement.objects.order_by('-posted_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+    
+    def test_page_size_is_capped(self):
+        with patch.object(OptInCursorPagination, 'max_page_size', 2):
+            response = self.client.get(f'{self.list_url}?page_size=100')
+        
+        self.assertEqual(len(response.data['results']), 2)
+
+
+
+class QueryPlanTest(TestCase):
+    """Hot viewset querysets must be answered from an index, never a full table scan."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+    
+    def get_queryset(self, viewset_class, user, **params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = viewset_class(request=request, format_kwarg=None, action='list')
+        return view.get_queryset()
+    
+    def assertUsesIndexes(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        full_scans = [step for step in plan if re.match(r'SCAN \w+$', step)]
+        self.assertEqual(full_scans, [], f"Full table scan in query plan: {plan}")
+    
+    def test_teacher_querysets(self):
+        for viewset_class in (CourseViewSet, AssignmentViewSet, SubmissionViewSet, CourseStructureViewSet):
+            with self.subTest(viewset=viewset_class.__name__):
+                self.assertUsesIndexes(self.get_queryset(viewset_class, self.teacher))
+    
+    def test_student_querysets(self):
+        for viewset_class in (AssignmentViewSet, SubmissionViewSet, CourseStructureViewSet,
+                              NotificationViewSet, ChatRoomViewSet):
+            with self.subTest(viewset=viewset_class.__name__):
+                self.assertUsesIndexes(self.get_queryset(viewset_class, self.student))
+        
+        self.assertUsesIndexes(self.get_queryset(NotificationViewSet, self.student, is_read='false'))
+    
+    def test_course_filtered_querysets(self):
+        for viewset_class, params in (
+            (CourseMaterialViewSet, {'course': self.course.id}),
+            (AnnouncementViewSet, {'course': self.course.id}),
+            (ChatMessageViewSet, {'room': 1}),
+            (ChatParticipantViewSet, {'room': 1}),
+        ):
+            with self.subTest(viewset=viewset_class.__name__):
+                self.assertUsesIndexes(self.get_queryset(viewset_class, self.student, **params))
+    
+    def test_enrollment_lookups(self):
+        self.assertUsesIndexes(Enrollment.objects.filter(student=self.student, is_active=True))
+        self.assertUsesIndexes(Enrollment.objects.filter(course=self.course, is_active=True))
+
+
+class VisibilityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.courses = [
+            Course.objects.create(
+                title=f'Course {i}',
+                description='Description',
+                teacher=cls.teacher,
+                start_date=timezone.now().date(),
+                end_date=(timezone.now() + timedelta(days=30)).date()
+            )
+            for i in range(3)
+        ]
+        
+        # Active in course 0, dropped out of course 1, never joined course 2
+        Enrollment.objects.create(student=cls.student, course=cls.courses[0])
+        Enrollment.objects.create(student=cls.student, course=cls.courses[1], is_active=False)
+        
+        for course in cls.courses:
+            for i in range(2):
+                Assignment.objects.create(
+                    course=course,
+                    title=f'Assignment {i}',
+                    description='Description',
+                    due_date=timezone.now() + timedelta(days=7),
+                    total_points=100
+                )
+    
+    def test_student_sees_only_active_enrollments(self):
+        visible = Assignment.objects.visible_to(self.student)
+        
+        self.assertEqual(set(visible.values_list('course_id', flat=True)), {self.courses[0].id})
+        self.assertEqual(visible.count(), 2)
+        self.assertEqual(list(Course.objects.visible_to(self.student)), [self.courses[0]])
+    
+    def test_teacher_sees_own_courses(self):
+        self.assertEqual(Assignment.objects.visible_to(self.teacher).count(), 6)
+    
+    def test_student_filter_uses_semi_join_without_distinct(self):
+        sql = str(Assignment.objects.visible_to(self.student).query).upper()
+        
+        self.assertIn(' IN (SELECT', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
+    
+    def test_assignment_endpoint_uses_visibility(self):
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        
+        response = client.get('/api/core/assignments/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({item['course'] for item in response.data}, {self.courses[0].id})
+
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every list endpoint must issue the same number of queries whether it
+    returns 1, 10 or 100 rows. A difference means a nested serializer is
+    querying per row and the viewset is missing a select_related/prefetch.
+    """
+    SIZES = (1, 10, 100)
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+    
+    def get_endpoints(self):
+        """Map endpoint name -> (view, full ?expand= value for its serializer)."""
+        endpoints = {}
+        for router in (core_api_router, core_router, addon_api_router, addon_router, userauths_router):
+            for prefix, viewset, basename in router.registry:
+                expand = ','.join(self.expand_paths(viewset.serializer_class))
+                endpoints.setdefault(viewset.__name__, (viewset.as_view({'get': 'list'}), expand))
+        endpoints['get_unread_count'] = (get_unread_count, '')
+        return endpoints
+    
+    def expand_paths(self, serializer_class, depth=2):
+        if depth == 0 or not hasattr(serializer_class, 'get_expandable_fields'):
+            return []
+        paths = []
+        for name, (nested_class, options) in serializer_class.get_expandable_fields().items():
+            paths.append(name)
+            paths.extend(f'{name}.{path}' for path in self.expand_paths(nested_class, depth - 1))
+        return paths
+    
+    def seed(self, start, stop):
+        """Create one row of every model per index, visible to both test users."""
+        for i in range(start, stop):
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='testpass123')
+            UserPermission.objects.create(user=self.student, permission=f'permission{i}')
+            StatusUpdate.objects.create(user=self.student, content=f'Status {i}')
+            for user in (self.teacher, self.student):
+                Notification.objects.create(user=user, related_id=i, notification_type='message', message='Hi')
+            
+            course = Course.objects.create(
+                title=f'Course {i}',
+                description='Description',
+                teacher=self.teacher,
+                start_date=timezone.now().date(),
+                end_date=(timezone.now() + timedelta(days=30)).date()
+            )
+            Enrollment.objects.create(student=self.student, course=course)
+            CourseStructure.objects.create(course=course, structure_data=[])
+            CourseFeedback.objects.create(course=course, student=self.student, rating=5)
+            Announcement.objects.create(course=course, title='News', content='Content', posted_by=self.teacher)
+            
+            material = CourseMaterial.objects.create(
+                course=course,
+                title=f'Video {i}',
+                description='Description',
+                file_path=f'course_materials/video{i}.mp4',
+                file_type='video'
+            )
+            VideoResource.objects.create(material=material, duration=60)
+            
+            assignment = Assignment.objects.create(
+                course=course,
+                title=f'Assignment {i}',
+                description='Description',
+                due_date=timezone.now() + timedelta(days=7),
+                total_points=100
+            )
+            submission = Submission.objects.create(
+                assignment=assignment,
+                student=self.student,
+                file_path=f'assignment_submissions/submission{i}.pdf'
+            )
+            Grade.objects.create(
+                submission=submission,
+                student=self.student,
+                course=course,
+                assignment=assignment,
+                score=90,
+                graded_by=self.teacher
+            )
+            
+            room = ChatRoom.objects.create(course=course, name=f'Room {i}', created_by=self.teacher)
+            for user in (self.teacher, self.student):
+                ChatParticipant.objects.create(room=room, user=user)
+            ChatMessage.objects.create(room=room, user=self.teacher, content='Hello')
+    
+    def count_queries(self, view, user, expand=''):
+        request = APIRequestFactory().get('/', {'expand': expand} if expand else {})
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+    
+    def test_query_count_is_independent_of_list_size(self):
+        endpoints = self.get_endpoints()
+        counts = {}
+        seeded = 0
+        for size in self.SIZES:
+            self.seed(seeded, size)
+            seeded = size
+            for name, (view, expand) in endpoints.items():
+                for user in (self.teacher, self.student):
+                    for expanded in {'', expand}:
+                        key = (name, user.user_type, expanded)
+                        counts.setdefault(key, []).append(self.count_queries(view, user, expanded))
+        
+        for (name, user_type, expand), per_size in counts.items():
+            with self.subTest(endpoint=name, user_type=user_type, expand=expand):
+                self.assertEqual(len(set(per_size)), 1, f"Queries grew with list size {self.SIZES}: {per_size}")
+
+
+class DynamicFieldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+    
+    def test_relations_default_to_primary_keys(self):
+        response = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(response.data[0]['teacher'], self.teacher.id)
+    
+    def test_expand_relation(self):
+        response = self.client.get('/api/core/courses/?expand=teacher')
+        
+        self.assertEqual(response.data[0]['teacher']['username'], 'teacher')
+        self.assertNotIn('password', response.data[0]['teacher'])
+    
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/core/courses/?fields=id,title')
+        
+        self.assertEqual(set(response.data[0]), {'id', 'title'})
+    
+    def test_nested_expand_and_fields(self):
+        response = self.client.get(
+            '/api/core/enrollments/?expand=course_detail.teacher'
+            '&fields=id,course_detail.title,course_detail.teacher.username'
+        )
+        
+        self.assertEqual(response.data[0], {
+            'id': response.data[0]['id'],
+            'course_detail': {'title': 'Test Course', 'teacher': {'username': 'teacher'}},
+        })
+    
+    def test_writes_accept_primary_keys_when_expanded(self):
+        other = Course.objects.create(
+            title='Other Course',
+            description='Description',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        response = self.client.post(
+            '/api/core/enrollments/?expand=course_detail',
+            {'student': self.student.id, 'course': other.id},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['course'], other.id)
+        self.assertEqual(response.data['course_detail']['id'], other.id)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        cls.announcement = Announcement.objects.create(
+            course=cls.course,
+            title='Welcome',
+            content='Hello',
+            posted_by=cls.teacher
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+    
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    
+    def test_malformed_pk_returns_404(self):
+        for url in ('/api/core/courses/abc/', '/api/core/materials/abc/', '/api/core/announcements/abc/',
+                    '/api/core/course-structure/abc/'):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND, url)
+    
+    def test_unchanged_list_returns_304(self):
+        response = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.revalidate('/api/core/courses/', response).status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_if_modified_since(self):
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.get('/api/core/announcements/')
+        
+        again = self.client.get('/api/core/announcements/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_update_changes_etag(self):
+        self.client.force_authenticate(user=self.teacher)
+        url = f'/api/core/announcements/{self.announcement.id}/'
+        response = self.client.get(url)
+        
+        self.announcement.content = 'Edited'
+        self.announcement.save()
+        
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+    
+    def test_delete_changes_etag(self):
+        self.client.force_authenticate(user=self.teacher)
+        extra = Announcement.objects.create(course=self.course, title='Extra', content='x', posted_by=self.teacher)
+        response = self.client.get('/api/core/announcements/')
+        
+        extra.delete()
+        
+        self.assertEqual(self.revalidate('/api/core/announcements/', response).status_code, status.HTTP_200_OK)
+    
+    def test_enrollment_changes_course_etag(self):
+        response = self.client.get('/api/core/courses/')
+        
+        Enrollment.objects.create(student=self.student, course=self.course)
+        
+        again = self.revalidate('/api/core/courses/', response)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data[0]['enrollment_count'], 1)
+    
+    def test_expanded_relation_changes_etag(self):
+        url = '/api/core/courses/?expand=teacher'
+        response = self.client.get(url)
+        
+        self.teacher.first_name = 'Renamed'
+        self.teacher.save()
+        
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+        # The unexpanded representation only holds the teacher's id
+        plain = self.client.get('/api/core/courses/')
+        self.teacher.save()
+        self.assertEqual(self.revalidate('/api/core/courses/', plain).status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_etag_is_per_user_and_query(self):
+        response = self.client.get('/api/core/courses/')
+        
+        self.assertNotEqual(self.client.get('/api/core/courses/?fields=id')['ETag'], response['ETag'])
+        self.client.force_authenticate(user=self.teacher)
+        self.assertEqual(self.revalidate('/api/core/courses/', response).status_code, status.HTTP_200_OK)
+    
+    def test_course_structure_uses_last_updated(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        structure = CourseStructure.objects.create(course=self.course, structure_data=[])
+        response = self.client.get('/api/core/course-structure/')
+        
+        structure.structure_data = [{'title': 'Week 1'}]
+        structure.save()
+        
+        self.assertEqual(self.revalidate('/api/core/course-structure/', response).status_code, status.HTTP_200_OK)
+
+
+class DashboardTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+        
+        cls.soon = Assignment.objects.create(
+            course=cls.course,
+            title='Due Soon',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=2),
+            total_points=100
+        )
+        cls.later = Assignment.objects.create(
+            course=cls.course,
+            title='Due Later',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=20),
+            total_points=100
+        )
+        submission = Submission.objects.create(
+            assignment=cls.soon,
+            student=cls.student,
+            file_path='assignment_submissions/dashboard.pdf'
+        )
+        Grade.objects.create(
+            submission=submission,
+            student=cls.student,
+            course=cls.course,
+            assignment=cls.soon,
+            score=88,
+            graded_by=cls.teacher
+        )
+        Announcement.objects.create(
+            course=cls.course, title='Pinned', content='Read me', posted_by=cls.teacher, is_pinned=True
+        )
+        Announcement.objects.create(course=cls.course, title='Plain', content='Skip me', posted_by=cls.teacher)
+        
+        room = ChatRoom.objects.create(course=cls.course, name='Room', created_by=cls.teacher)
+        ChatParticipant.objects.create(room=room, user=cls.student)
+        ChatMessage.objects.create(room=room, user=cls.teacher, content='Hello')
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+    
+    def get_dashboard(self, query=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/core/dashboard/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+    
+    def test_dashboard_contents(self):
+        response, _ = self.get_dashboard()
+        
+        self.assertEqual([row['course'] for row in response.data['enrollments']], [self.course.id])
+        self.assertEqual(response.data['enrollments'][0]['course_detail']['title'], 'Test Course')
+        self.assertEqual([row['title'] for row in response.data['upcoming_assignments']], ['Due Soon'])
+        self.assertTrue(response.data['upcoming_assignments'][0]['submission']['is_graded'])
+        self.assertEqual(response.data['recent_grades'][0]['assignment'], {
+            'id': self.soon.id, 'title': 'Due Soon', 'total_points': 100
+        })
+        self.assertEqual([row['title'] for row in response.data['pinned_announcements']], ['Pinned'])
+        self.assertEqual(response.data['unread_messages'], 1)
+    
+    def test_days_window(self):
+        response, _ = self.get_dashboard('?days=30')
+        
+        self.assertEqual(len(response.data['upcoming_assignments']), 2)
+        self.assertIsNone(response.data['upcoming_assignments'][1]['submission'])
+        self.assertEqual(self.client.get('/api/core/dashboard/?days=0').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/core/dashboard/?days=x').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_fixed_query_count_and_cache(self):
+        _, cold = self.get_dashboard()
+        _, warm = self.get_dashboard()
+        
+        self.assertEqual(cold, 5)
+        # Only the live unread count
+        self.assertEqual(warm, 1)
+    
+    def test_writes_invalidate(self):
+        self.get_dashboard()
+        
+        Announcement.objects.create(
+            course=self.course, title='Also Pinned', content='New', posted_by=self.teacher, is_pinned=True
+        )
+        response, queries = self.get_dashboard()
+        self.assertEqual(queries, 5)
+        self.assertEqual(len(response.data['pinned_announcements']), 2)
+        
+        Grade.objects.filter(student=self.student).get().delete()
+        response, _ = self.get_dashboard()
+        self.assertEqual(response.data['recent_grades'], [])
+    
+    def test_teachers_are_rejected(self):
+        self.client.force_authenticate(user=self.teacher)
+        
+        self.assertEqual(self.client.get('/api/core/dashboard/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class GradebookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.other_teacher = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        cls.first = Assignment.objects.create(
+            course=cls.course,
+            title='First',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=1),
+            total_points=50
+        )
+        cls.second = Assignment.objects.create(
+            course=cls.course,
+            title='Second',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=2),
+            total_points=50
+        )
+        
+        cls.students = []
+        for i in range(3):
+            student = User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            Enrollment.objects.create(student=student, course=cls.course)
+            cls.students.append(student)
+        
+        # student0 has both graded, student1 one ungraded late submission,
+        # student2 nothing
+        for assignment, score in ((cls.first, 40), (cls.second, 30)):
+            submission = Submission.objects.create(
+                assignment=assignment,
+                student=cls.students[0],
+                file_path='assignment_submissions/gradebook.pdf'
+            )
+            Grade.objects.create(
+                submission=submission,
+                student=cls.students[0],
+                course=cls.course,
+                assignment=assignment,
+                score=score,
+                graded_by=cls.teacher
+            )
+        Submission.objects.create(
+            assignment=cls.first,
+            student=cls.students[1],
+            file_path='assignment_submissions/gradebook.pdf',
+            is_late=True
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+        self.url = f'/api/core/courses/{self.course.id}/gradebook/'
+    
+    def test_matrix(self):
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['title'] for row in response.data['assignments']], ['First', 'Second'])
+        self.assertEqual(response.data['assignments'][0]['average'], 40)
+        
+        rows = {row['username']: row for row in response.data['students']}
+        self.assertEqual([cell['score'] for cell in rows['student0']['cells']], [40, 30])
+        self.assertEqual(rows['student0']['total'], 70)
+        self.assertEqual(rows['student0']['percentage'], 70)
+        self.assertEqual(rows['student1']['cells'], [{'score': None, 'is_late': True}, None])
+        self.assertEqual(rows['student1']['late'], 1)
+        self.assertEqual(rows['student2']['cells'], [None, None])
+        self.assertEqual(rows['student2']['total'], 0)
+    
+    def test_fixed_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        before = len(ctx.captured_queries)
+        
+        for i in range(3, 10):
+            student = User.objects.create_user(username=f'student{i}', password='testpass123')
+            Enrollment.objects.create(student=student, course=self.course)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        
+        self.assertEqual(len(ctx.captured_queries), before)
+    
+    def test_csv_export_streams(self):
+        response = self.client.get(self.url, {'export': 'csv'})
+        
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], [
+            'Student ID', 'Username', 'Name', 'First (/50)', 'Second (/50)',
+            'Total', 'Possible', 'Percentage', 'Late submissions'
+        ])
+        self.assertEqual(rows[1][:3], [str(self.students[0].id), 'student0', ''])
+        self.assertEqual([Decimal(value) for value in rows[1][3:]], [40, 30, 70, 100, 70, 0])
+        self.assertEqual(rows[2][3:5], ['', ''])
+        self.assertEqual(rows[2][-1], '1')
+        self.assertEqual(len(rows), 4)
+    
+    def test_only_the_course_teacher(self):
+        self.client.force_authenticate(user=self.other_teacher)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BulkGradingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.other_teacher = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        cls.assignment = Assignment.objects.create(
+            course=cls.course,
+            title='Essay',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=20
+        )
+        
+        cls.submissions = []
+        for i in range(5):
+            student = User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            cls.submissions.append(Submission.objects.create(
+                assignment=cls.assignment,
+                student=student,
+                file_path='assignment_submissions/bulk.pdf'
+            ))
+        
+        # Already graded, so the bulk call updates it
+        Grade.objects.create(
+            submission=cls.submissions[0],
+            student=cls.submissions[0].student,
+            course=cls.course,
+            assignment=cls.assignment,
+            score=5,
+            graded_by=cls.teacher
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+    
+    def test_bulk_upsert_with_row_errors(self):
+        payload = [
+            {'submission': self.submissions[0].id, 'score': 18, 'feedback': 'Regraded'},
+            {'submission': self.submissions[1].id, 'score': 15},
+            {'submission': self.submissions[2].id, 'score': 21},
+            {'submission': 999999, 'score': 10},
+            {'submission': self.submissions[3].id},
+            {'submission': self.submissions[1].id, 'score': 12},
+        ]
+        
+        response = self.client.post('/api/core/grades/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3, 4, 5])
+        
+        updated = Grade.objects.get(submission=self.submissions[0])
+        self.assertEqual(updated.score, 18)
+        self.assertEqual(updated.feedback, 'Regraded')
+        created = Grade.objects.get(submission=self.submissions[1])
+        self.assertEqual(created.student, self.submissions[1].student)
+        self.assertEqual(created.course, self.course)
+        self.assertEqual(created.graded_by, self.teacher)
+        self.assertFalse(Grade.objects.filter(submission=self.submissions[2]).exists())
+    
+    def test_query_count_is_fixed(self):
+        payload = [{'submission': submission.id, 'score': 10} for submission in self.submissions]
+        
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/core/grades/bulk/', payload, format='json')
+        
+        self.assertEqual(response.data['created'] + response.data['updated'], 5)
+        # Lookup, savepoints around the insert, update, one update per stats row, releases
+        self.assertLessEqual(len(ctx.captured_queries), 9)
+    
+    def test_other_teachers_submissions_are_rejected(self):
+        self.client.force_authenticate(user=self.other_teacher)
+        
+        response = self.client.post(
+            '/api/core/grades/bulk/', [{'submission': self.submissions[1].id, 'score': 10}], format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Grade.objects.filter(submission=self.submissions[1]).exists())
+    
+    def test_single_create_derives_relations(self):
+        response = self.client.post(
+            '/api/core/grades/', {'submission': self.submissions[4].id, 'score': 19}, format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['student'], self.submissions[4].student_id)
+        self.assertEqual(response.data['course'], self.course.id)
+        self.assertEqual(response.data['assignment'], self.assignment.id)
+        
+        too_high = self.client.post(
+            '/api/core/grades/', {'submission': self.submissions[3].id, 'score': 25}, format='json'
+        )
+        self.assertEqual(too_high.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_update_derives_relations_and_checks_ownership(self):
+        grade = Grade.objects.get(submission=self.submissions[0])
+        other_course = Course.objects.create(
+            title='Other Course',
+            description='Other Course Description',
+            teacher=self.other_teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        other_assignment = Assignment.objects.create(
+            course=other_course,
+            title='Other',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=20
+        )
+        other_submission = Submission.objects.create(
+            assignment=other_assignment,
+            student=self.submissions[1].student,
+            file_path='assignment_submissions/other.pdf'
+        )
+        
+        response = self.client.patch(
+            f'/api/core/grades/{grade.id}/', {'submission': other_submission.id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        response = self.client.patch(
+            f'/api/core/grades/{grade.id}/', {'submission': self.submissions[4].id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['student'], self.submissions[4].student_id)
+        
+        self.client.force_authenticate(user=self.other_teacher)
+        response = self.client.patch(f'/api/core/grades/{grade.id}/', {'score': 1}, format='json')
+        self.assertIn(response.status_code, (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND))
+        grade.refresh_from_db()
+        self.assertNotEqual(grade.score, 1)
+    
+    def test_concurrent_grade_is_reported(self):
+        bulk_create = Grade.objects.bulk_create
+        
+        def race(objs, *args, **kwargs):
+            # Another request grades submission 2 between the lookup and the insert
+            if not Grade.objects.filter(submission=self.submissions[2]).exists():
+                Grade.objects.create(
+                    submission=self.submissions[2],
+                    student=self.submissions[2].student,
+                    course=self.course,
+                    assignment=self.assignment,
+                    score=3,
+                    graded_by=self.other_teacher
+                )
+            return bulk_create(objs, *args, **kwargs)
+        
+        payload = [{'submission': submission.id, 'score': 10} for submission in self.submissions[1:4]]
+        with patch.object(Grade.objects, 'bulk_create', side_effect=race):
+            response = self.client.post('/api/core/grades/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(Grade.objects.get(submission=self.submissions[2]).score, 3)
+        self.assertEqual(Grade.objects.get(submission=self.submissions[3]).score, 10)
+
+
+class EnrollmentImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        cls.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            for i in range(4)
+        ]
+        
+        # student0 is already enrolled, student1 dropped the course
+        Enrollment.objects.create(student=cls.students[0], course=cls.course)
+        Enrollment.objects.create(student=cls.students[1], course=cls.course, is_active=False)
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+    
+    def upload(self, content):
+        return self.client.post('/api/core/enrollments/import/', {
+            'course': self.course.id,
+            'file': SimpleUploadedFile('roster.csv', content.encode(), content_type='text/csv'),
+        }, format='multipart')
+    
+    def test_import_summary(self):
+        response = self.upload(
+            'username\nstudent0\nstudent1\nstudent2\nstudent3@test.com\nstudent2\nteacher\nnobody\n\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows'], 7)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['reactivated'], 1)
+        self.assertEqual(response.data['already_enrolled'], 1)
+        self.assertEqual(response.data['duplicates'], 1)
+        self.assertEqual(response.data['not_found'], ['nobody'])
+        self.assertEqual(response.data['not_students'], ['teacher'])
+        
+        self.assertEqual(Enrollment.objects.filter(course=self.course, is_active=True).count(), 4)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrollment_count, 4)
+    
+    def test_reimport_is_idempotent(self):
+        self.upload('student2\nstudent3\n')
+        response = self.upload('student2\nstudent3\n')
+        
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['already_enrolled'], 2)
+    
+    def test_queries_per_chunk(self):
+        User.objects.bulk_create(
+            User(username=f'student{i}', email=f'student{i}@test.com', user_type='student') for i in range(4, 40)
+        )
+        
+        with CaptureQueriesContext(connection) as ctx:
+            import_enrollments(self.course, [f'student{i}' for i in range(40)], chunk_size=20)
+        
+        # Two chunks of lookup + lookup + insert in a savepoint + update, then
+        # the counter refresh
+        self.assertLessEqual(len(ctx.captured_queries), 2 * 6 + 3)
+        self.assertEqual(Enrollment.objects.filter(course=self.course, is_active=True).count(), 40)
+    
+    def test_concurrent_enrollment_not_counted_as_created(self):
+        bulk_create = Enrollment.objects.bulk_create
+        
+        def race(objs, *args, **kwargs):
+            # Another request enrolls student2 between the lookup and the insert
+            if not Enrollment.objects.filter(course=self.course, student=self.students[2]).exists():
+                bulk_create([Enrollment(course=self.course, student=self.students[2])])
+            return bulk_create(objs, *args, **kwargs)
+        
+        with patch.object(Enrollment.objects, 'bulk_create', side_effect=race):
+            summary = import_enrollments(self.course, ['student2', 'student3'])
+        
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['already_enrolled'], 1)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 4)
+    
+    def test_management_command(self):
+        out = StringIO()
+        with patch('sys.stdin', StringIO('student2\nstudent3\n')):
+            call_command('import_enrollments', self.course.id, '-', stdout=out)
+        
+        self.assertIn('2 enrolled', out.getvalue())
+        self.assertTrue(Enrollment.objects.filter(course=self.course, student=self.students[3]).exists())
+    
+    def test_only_the_course_teacher(self):
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.upload('student2\n').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CourseStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        cls.assignment = Assignment.objects.create(
+            course=cls.course,
+            title='Essay',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=20
+        )
+        
+        cls.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            for i in range(3)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, course=cls.course)
+    
+    def submit(self, student, score=None, is_late=False):
+        submission = Submission.objects.create(
+            assignment=self.assignment,
+            student=student,
+            file_path='assignment_submissions/stats.pdf',
+            is_late=is_late
+        )
+        if score is not None:
+            Grade.objects.create(
+                submission=submission,
+                student=student,
+                course=self.course,
+                assignment=self.assignment,
+                score=score,
+                graded_by=self.teacher
+            )
+        return submission
+    
+    def test_incremental_matches_rebuild(self):
+        # Build the rollup rows first so every later write goes through the deltas
+        get_course_stats(self.course)
+        
+        self.submit(self.students[0], score=19)
+        late = self.submit(self.students[1], score=15, is_late=True)
+        self.submit(self.students[2])
+        CourseFeedback.objects.create(course=self.course, student=self.students[0], rating=4)
+        feedback = CourseFeedback.objects.create(course=self.course, student=self.students[1], rating=2)
+        
+        grade = late.grade
+        grade.score = 11
+        grade.save()
+        feedback.rating = 5
+        feedback.save()
+        Submission.objects.filter(student=self.students[2]).get().delete()
+        
+        incremental = get_course_stats(self.course)
+        call_command('rebuild_course_stats', stdout=StringIO())
+        
+        self.assertEqual(incremental, get_course_stats(self.course))
+        self.assertEqual(incremental['average_rating'], Decimal('4.50'))
+        self.assertEqual(incremental['submission_count'], 2)
+        self.assertEqual(incremental['late_rate'], 0.5)
+        self.assertEqual(incremental['average_score'], Decimal('15.00'))
+        self.assertEqual(incremental['assignments'][0]['distribution'], {'A': 1, 'B': 0, 'C': 0, 'D': 0, 'F': 1})
+    
+    def test_total_points_change_rebands(self):
+        self.submit(self.students[0], score=15)
+        get_course_stats(self.course)
+        
+        self.assignment.total_points = 16
+        self.assignment.save()
+        
+        self.assertEqual(get_course_stats(self.course)['assignments'][0]['distribution']['A'], 1)
+    
+    def test_bulk_grading_updates_stats(self):
+        submission = self.submit(self.students[0], score=5)
+        get_course_stats(self.course)
+        
+        client = APIClient()
+        client.force_authenticate(user=self.teacher)
+        client.post('/api/core/grades/bulk/', [{'submission': submission.id, 'score': 20}], format='json')
+        
+        stats = get_course_stats(self.course)
+        self.assertEqual(stats['average_score'], Decimal('20.00'))
+        self.assertEqual(stats['assignments'][0]['distribution']['A'], 1)
+        self.assertEqual(stats['assignments'][0]['distribution']['F'], 0)
+    
+    def test_stats_endpoint_reads_rollup_rows(self):
+        self.submit(self.students[0], score=19)
+        client = APIClient()
+        client.force_authenticate(user=self.teacher)
+        client.get(f'/api/core/courses/{self.course.id}/stats/')
+        
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/api/core/courses/{self.course.id}/stats/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['active_enrollments'], 3)
+        self.assertEqual(response.data['submission_rate'], round(1 / 3, 4))
+        # Course, assignments with their stats, course stats
+        self.assertEqual(len(ctx.captured_queries), 3)
+        
+        client.force_authenticate(user=self.students[0])
+        self.assertEqual(client.get(f'/api/core/courses/{self.course.id}/stats/').status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_cascading_delete(self):
+        self.submit(self.students[0], score=19)
+        get_course_stats(self.course)
+        
+        self.assignment.delete()
+        
+        self.assertEqual(get_course_stats(self.course)['grade_count'], 0)
+        self.course.delete()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Algorithms',
+            description='Sorting, graphs and dynamic programming',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        cls.other_course = Course.objects.create(
+            title='Graph Theory',
+            description='Graphs without the algorithms',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+        
+        cls.material = CourseMaterial.objects.create(
+            course=cls.course,
+            title='Week 1 notes',
+            description='Introduction to graph traversal: breadth first search',
+            file_path='course_materials/notes.pdf',
+            file_type='document'
+        )
+        cls.hidden = CourseMaterial.objects.create(
+            course=cls.course,
+            title='Exam answers',
+            description='Graph exam solutions',
+            file_path='course_materials/answers.pdf',
+            file_type='document',
+            is_visible=False
+        )
+        Announcement.objects.create(
+            course=cls.course, title='Graph quiz', content='Quiz on graph colouring', posted_by=cls.teacher
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+    
+    def search(self, query, **params):
+        response = self.client.get('/api/core/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+    
+    def test_results_are_ranked_and_scoped(self):
+        results = self.search('graph')
+        
+        # The title match ranks first; the hidden material and the course the
+        # student isn't enrolled in are left out
+        self.assertEqual(results[0]['type'], 'announcement')
+        self.assertEqual({(row['type'], row['id']) for row in results}, {
+            ('announcement', Announcement.objects.get().id),
+            ('material', self.material.id),
+        })
+    
+    def test_teacher_sees_hidden_and_own_courses(self):
+        self.client.force_authenticate(user=self.teacher)
+        
+        results = self.search('graph*', type='material')
+        
+        self.assertEqual({row['id'] for row in results}, {self.material.id, self.hidden.id})
+        self.assertEqual(len(self.search('graph*', type='course')), 2)
+    
+    def test_prefix_query_and_snippet(self):
+        self.assertEqual(self.search('travers'), [])
+        
+        results = self.search('travers*')
+        
+        self.assertEqual(results[0]['id'], self.material.id)
+        self.assertIn('<mark>traversal</mark>', results[0]['snippet'])
+    
+    def test_index_follows_writes(self):
+        self.material.description = 'Now about heaps'
+        self.material.save()
+        self.assertEqual(self.search('traversal'), [])
+        self.assertEqual(self.search('heaps')[0]['id'], self.material.id)
+        
+        self.material.delete()
+        self.assertEqual(self.search('heaps'), [])
+    
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM core_search_index")
+        
+        call_command('rebuild_search_index', stdout=StringIO())
+        
+        self.assertEqual(len(self.search('graph')), 2)
+    
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search('graph OR NOT "'), [])
+        self.assertEqual(self.client.get('/api/core/search/').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class JsonPatchTest(TestCase):
+    def test_operations(self):
+        document = {'sections': [{'title': 'A', 'items': []}, {'title': 'B', 'items': [1]}]}
+        
+        patched = apply_patch(document, [
+            {'op': 'add', 'path': '/sections/0/items/-', 'value': 7},
+            {'op': 'replace', 'path': '/sections/1/title', 'value': 'B/2'},
+            {'op': 'move', 'from': '/sections/1', 'path': '/sections/0'},
+            {'op': 'copy', 'from': '/sections/0/title', 'path': '/first~1title'},
+            {'op': 'remove', 'path': '/sections/0/items/0'},
+            {'op': 'test', 'path': '/sections/1/items', 'value': [7]},
+        ])
+        
+        self.assertEqual(patched, {
+            'sections': [{'title': 'B/2', 'items': []}, {'title': 'A', 'items': [7]}],
+            'first/title': 'B/2',
+        })
+        # The input is never modified
+        self.assertEqual(document['sections'][0]['title'], 'A')
+    
+    def test_errors(self):
+        for operation in (
+            {'op': 'remove', 'path': '/missing'},
+            {'op': 'add', 'path': '/list/5', 'value': 1},
+            {'op': 'test', 'path': '/list', 'value': []},
+            {'op': 'move', 'from': '/list', 'path': '/list/0'},
+            {'op': 'frobnicate', 'path': '/list'},
+            {'op': 'replace', 'path': '/list'},
+        ):
+            with self.subTest(operation=operation), self.assertRaises(JsonPatchError):
+                apply_patch({'list': [1]}, [operation])
+
+
+class CourseStructureVersionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.post('/api/core/course-structure/save_structure/', {
+            'course_id': self.course.id,
+            'sections': [{'id': 's1', 'title': 'Week 1', 'items': []}],
+        }, format='json')
+        self.assertEqual(response.data['version'], 1)
+        self.structure = CourseStructure.objects.get(course=self.course)
+        self.url = f'/api/core/course-structure/{self.structure.id}/'
+    
+    def patch(self, operations, version):
+        headers = {} if version is None else {'HTTP_IF_MATCH': f'"{version}"'}
+        return self.client.post(
+            self.url + 'patch/', json.dumps(operations), content_type='application/json-patch+json', **headers
+        )
+    
+    def test_patch_bumps_version(self):
+        response = self.patch([{'op': 'add', 'path': '/0/items/-', 'value': {'id': '3', 'type': 'video'}}], 1)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(response['ETag'], '"2"')
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.structure_data[0]['items'], [{'id': '3', 'type': 'video'}])
+    
+    def test_stale_or_missing_if_match(self):
+        self.patch([{'op': 'replace', 'path': '/0/title', 'value': 'Intro'}], 1)
+        
+        stale = self.patch([{'op': 'replace', 'path': '/0/title', 'value': 'Lost'}], 1)
+        self.assertEqual(stale.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(stale['ETag'], '"2"')
+        self.assertEqual(self.patch([], None).status_code, 428)
+        
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.structure_data[0]['title'], 'Intro')
+    
+    def test_invalid_patch_is_rejected_atomically(self):
+        response = self.patch([
+            {'op': 'replace', 'path': '/0/title', 'value': 'Changed'},
+            {'op': 'remove', 'path': '/5'},
+        ], 1)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.version, 1)
+        self.assertEqual(self.structure.structure_data[0]['title'], 'Week 1')
+    
+    def test_changes_since(self):
+        self.patch([{'op': 'replace', 'path': '/0/title', 'value': 'Intro'}], 1)
+        self.patch([{'op': 'add', 'path': '/-', 'value': {'id': 's2', 'title': 'Week 2', 'items': []}}], 2)
+        
+        response = self.client.get(self.url + 'changes/', {'since': 1})
+        
+        self.assertEqual(response.data['version'], 3)
+        self.assertEqual([revision['version'] for revision in response.data['revisions']], [2, 3])
+        
+        # Replaying the operations over version 1 reproduces the current outline
+        replayed = [{'id': 's1', 'title': 'Week 1', 'items': []}]
+        for revision in response.data['revisions']:
+            replayed = apply_patch(replayed, revision['operations'])
+        self.structure.refresh_from_db()
+        self.assertEqual(replayed, self.structure.structure_data)
+        
+        self.assertEqual(self.client.get(self.url + 'changes/', {'since': 3}).data['revisions'], [])
+        self.assertEqual(self.client.get(self.url + 'changes/', {'since': 9}).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_changes_fall_back_to_snapshot(self):
+        self.patch([{'op': 'replace', 'path': '/0/title', 'value': 'Intro'}], 1)
+        CourseStructureRevision.objects.filter(version=2).delete()
+        
+        response = self.client.get(self.url + 'changes/', {'since': 1})
+        
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(response.data['structure_data'][0]['title'], 'Intro')
+    
+    def test_students_cannot_patch(self):
+        self.client.force_authenticate(user=self.student)
+        
+        response = self.patch([{'op': 'replace', 'path': '/0/title', 'value': 'Mine'}], 1)
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(self.url + 'changes/', {'since': 0}).status_code, status.HTTP_200_OK)
+
+
+class ResolvedOutlineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+        
+        cls.video = CourseMaterial.objects.create(
+            course=cls.course,
+            title='Lecture',
+            description='Description',
+            file_path='course_materials/lecture.mp4',
+            file_type='video'
+        )
+        VideoResource.objects.create(material=cls.video, duration=90)
+        cls.hidden = CourseMaterial.objects.create(
+            course=cls.course,
+            title='Draft',
+            description='Description',
+            file_path='course_materials/draft.pdf',
+            file_type='document',
+            is_visible=False
+        )
+        cls.assignment = Assignment.objects.create(
+            course=cls.course,
+            title='Essay',
+            description='Description',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=100
+        )
+        cls.structure = CourseStructure.objects.create(course=cls.course, structure_data=[
+            {'title': 'Week 1', 'items': [
+                {'id': str(cls.video.id), 'type': 'video'},
+                {'id': str(cls.hidden.id), 'type': 'document'},
+            ]},
+            {'title': 'Week 2', 'items': [
+                {'id': str(cls.assignment.id), 'type': 'assignment'},
+                {'id': '999999', 'type': 'document'},
+            ]},
+        ])
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = f'/api/core/course-structure/resolved/?course={self.course.id}'
+    
+    def details(self, response):
+        return [item['detail'] for section in response.data['sections'] for item in section['items']]
+    
+    def test_items_are_hydrated(self):
+        response = self.client.get(self.url)
+        
+        video, hidden, assignment, missing = self.details(response)
+        self.assertEqual(video['video_details']['duration'], 90)
+        self.assertIsNone(hidden)
+        self.assertEqual(assignment['title'], 'Essay')
+        self.assertIsNone(missing)
+        
+        self.client.force_authenticate(user=self.teacher)
+        self.assertEqual(self.details(self.client.get(self.url))[1]['title'], 'Draft')
+    
+    def test_batched_and_cached(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        # Structure, materials with video details, assignments
+        self.assertEqual(len(ctx.captured_queries), 3)
+        
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+    
+    def test_referenced_rows_invalidate(self):
+        self.client.get(self.url)
+        
+        self.video.video_details.duration = 120
+        self.video.video_details.save()
+        self.assertEqual(self.details(self.client.get(self.url))[0]['video_details']['duration'], 120)
+        
+        self.assignment.title = 'Report'
+        self.assignment.save()
+        self.assertEqual(self.details(self.client.get(self.url))[2]['title'], 'Report')
+        
+        self.structure.structure_data = [{'title': 'Only', 'items': []}]
+        self.structure.save()
+        self.assertEqual(self.client.get(self.url).data['sections'], [{'title': 'Only', 'items': []}])
+    
+    def test_malformed_structure_data(self):
+        teacher = APIClient()
+        teacher.force_authenticate(user=self.teacher)
+        for sections in (['foo'], [{'items': ['a']}], [{'title': 'Week', 'items': 'a'}, 3, None]):
+            response = teacher.post('/api/core/course-structure/save_structure/', {
+                'course_id': self.course.id,
+                'sections': sections,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(all(section['items'] == [] for section in response.data['sections']))
+        
+        # Older clients stored a JSON string, which may not parse
+        CourseStructure.objects.filter(pk=self.structure.pk).update(structure_data='{bad')
+        self.structure.refresh_from_db()
+        self.structure.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sections'], [])
+    
+    @override_settings(ALLOWED_HOSTS=['one.example.com', 'two.example.com'])
+    def test_cached_per_host(self):
+        self.client.get(self.url, HTTP_HOST='one.example.com')
+        
+        response = self.client.get(self.url, HTTP_HOST='two.example.com')
+        
+        self.assertTrue(self.details(response)[0]['file_path'].startswith('http://two.example.com/'))
+    
+    def test_requires_visible_course(self):
+        other = User.objects.create_user(username='other', password='testpass123', user_type='student')
+        self.client.force_authenticate(user=other)
+        
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get('/api/core/course-structure/resolved/').status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+    
+    def test_list_reuses_cached_fragments(self):
+        self.client.get('/api/core/courses/')
+        
+        with patch.object(CourseSerializer, 'get_enrollment_count', return_value=0) as rendered:
+            response = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['title'], 'Test Course')
+        rendered.assert_not_called()
+    
+    def test_save_invalidates_fragment(self):
+        self.client.get('/api/core/courses/')
+        
+        self.course.title = 'Renamed'
+        self.course.save()
+        
+        response = self.client.get(f'/api/core/courses/{self.course.id}/')
+        self.assertEqual(response.data['title'], 'Renamed')
+    
+    def test_enrollment_invalidates_course_count(self):
+        self.client.get('/api/core/courses/')
+        
+        Enrollment.objects.create(student=self.student, course=self.course)
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertEqual(response.data[0]['enrollment_count'], 1)
+    
+    def test_field_selection_is_cached_separately(self):
+        self.client.get('/api/core/courses/?fields=id,title')
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertIn('description', response.data[0])
+    
+    def test_expanded_relations_are_not_cached(self):
+        self.client.get('/api/core/courses/?expand=teacher')
+        
+        self.teacher.first_name = 'Ada'
+        self.teacher.save()
+        
+        response = self.client.get('/api/core/courses/?expand=teacher')
+        self.assertEqual(response.data[0]['teacher']['first_name'], 'Ada')
+    
+    def test_user_fragment_invalidated(self):
+        url = f'/userauths/api/users/{self.teacher.id}/'
+        self.client.get(url)
+        
+        self.teacher.bio = 'Updated bio'
+        self.teacher.save()
+        
+        self.assertEqual(self.client.get(url).data['bio'], 'Updated bio')
+    
+    def test_user_email_is_not_cached(self):
+        url = f'/userauths/api/users/{self.teacher.id}/'
+        response = self.client.get(url)
+        
+        self.assertEqual(response.data['email'], 'teacher@test.com')
+        
+        # update() skips the signals, so the fragment itself stays as cached
+        User.objects.filter(pk=self.teacher.pk).update(email='new@test.com', bio='Unseen')
+        
+        response = self.client.get(url)
+        self.assertEqual(response.data['email'], 'new@test.com')
+        self.assertEqual(response.data['bio'], '')
+        self.assertEqual(list(response.data)[:5], ['id', 'username', 'first_name', 'last_name', 'email'])
+    
+    def test_video_resource_invalidates_material(self):
+        material = CourseMaterial.objects.create(
+            course=self.course, title='Lecture', description='Week 1', file_path='course_materials/w1.mp4', file_type='video'
+        )
+        self.client.get('/api/core/materials/')
+        
+        video = VideoResource.objects.create(material=material, duration=300)
+        
+        response = self.client.get('/api/core/materials/')
+        self.assertEqual(response.data[0]['video_details'], video.id)
+
+
+class CatalogCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student'
+            )
+            for i in range(2)
+        ]
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.students[0])
+    
+    def test_students_share_one_copy(self):
+        first = self.client.get('/api/core/courses/')
+        self.assertEqual(first['X-Catalog-Cache'], 'miss')
+        
+        self.client.force_authenticate(user=self.students[1])
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(second['X-Catalog-Cache'], 'hit')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(catalog.get_counters(), {'hit': 1, 'miss': 1, 'stale': 0})
+    
+    def test_course_change_regenerates(self):
+        self.client.get('/api/core/courses/')
+        
+        self.course.title = 'Renamed'
+        self.course.save()
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+        self.assertEqual(response.data[0]['title'], 'Renamed')
+    
+    def test_enrollment_regenerates(self):
+        self.client.get('/api/core/courses/')
+        
+        Enrollment.objects.create(student=self.students[1], course=self.course)
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertEqual(response.data[0]['enrollment_count'], 1)
+    
+    def test_stale_copy_served_while_regenerating(self):
+        self.client.get('/api/core/courses/')
+        catalog.invalidate()
+        
+        # Another worker holds the regeneration lock for the new generation
+        with patch.object(catalog.cache, 'add', return_value=False):
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/core/courses/')
+        
+        self.assertEqual(response['X-Catalog-Cache'], 'stale')
+        self.assertEqual(response.data[0]['title'], 'Test Course')
+    
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/core/courses/')
+        
+        again = self.client.get('/api/core/courses/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_query_string_cached_separately(self):
+        self.client.get('/api/core/courses/?fields=id')
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+        self.assertIn('title', response.data[0])
+    
+    def test_teachers_bypass_the_catalog(self):
+        self.client.force_authenticate(user=self.teacher)
+        
+        response = self.client.get('/api/core/courses/')
+        self.assertNotIn('X-Catalog-Cache', response)
+
+
+class AnnouncementFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.courses = [
+            Course.objects.create(
+                title=f'Course {i}',
+                description='Test Course Description',
+                teacher=cls.teacher,
+                start_date=timezone.now().date(),
+                end_date=(timezone.now() + timedelta(days=30)).date()
+            )
+            for i in range(3)
+        ]
+        Enrollment.objects.create(student=cls.student, course=cls.courses[0])
+        Enrollment.objects.create(student=cls.student, course=cls.courses[1])
+        
+        now = timezone.now()
+        for i in range(6):
+            for course in cls.courses:
+                announcement = Announcement.objects.create(
+                    course=course,
+                    title=f'{course.title} #{i}',
+                    content='Hello',
+                    posted_by=cls.teacher,
+                    is_pinned=i == 0
+                )
+                Announcement.objects.filter(pk=announcement.pk).update(posted_at=now - timedelta(hours=i))
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+    
+    def test_merges_enrolled_courses_newest_first(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/core/announcements/feed/?page_size=5')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        posted = [row['posted_at'] for row in response.data['results']]
+        self.assertEqual(posted, sorted(posted, reverse=True))
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual({row['course'] for row in response.data['results']}, {self.courses[0].id, self.courses[1].id})
+        self.assertEqual(len(response.data['pinned']), 2)
+        self.assertFalse(any(row['is_pinned'] for row in response.data['results']))
+    
+    def test_cursor_walks_whole_timeline(self):
+        url = '/api/core/announcements/feed/?page_size=5'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            if seen[5:]:
+                self.assertNotIn('pinned', response.data)
+            url = response.data['next']
+        
+        # Pinned announcements are only listed under 'pinned'
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+    
+    def test_dropped_enrollment_leaves_feed(self):
+        Enrollment.objects.filter(student=self.student, course=self.courses[1]).update(is_active=False)
+        
+        response = self.client.get('/api/core/announcements/feed/')
+        self.assertEqual({row['course'] for row in response.data['results']}, {self.courses[0].id})
+    
+    def test_teacher_sees_teaching_courses(self):
+        self.client.force_authenticate(user=self.teacher)
+        
+        response = self.client.get('/api/core/announcements/feed/?page_size=100')
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(len(response.data['pinned']), 3)
+    
+    def test_list_is_scoped_to_visible_courses(self):
+        response = self.client.get('/api/core/announcements/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(rows), 12)
+        self.assertEqual({row['course'] for row in rows}, {self.courses[0].id, self.courses[1].id})
+        
+        hidden = Announcement.objects.filter(course=self.courses[2]).first()
+        self.assertEqual(self.client.get(f'/api/core/announcements/{hidden.id}/').status_code, 404)
+    
+    def test_feed_query_uses_course_index(self):
+        # A later page: the keyset bound becomes a range on the index
+        queryset = (
+            Announcement.objects.visible_to(self.student)
+            .filter(is_pinned=False, posted_at__lt=timezone.now() - timedelta(hours=2))
+            .order_by('-posted_at', '-id')[:20]
+        )
+        plan = queryset.explain()
+        self.assertIn('announcement_course_time_idx', plan)
+
+
+MEDIA_TEST_ROOT = os.path.join(tempfile.gettempdir(), 'elearning-media-tests')
+UPLOAD_TEST_DIR = os.path.join(tempfile.gettempdir(), 'elearning-upload-tests')
+
+
+@override_settings(CHUNKED_UPLOAD_DIR=UPLOAD_TEST_DIR, MEDIA_ROOT=MEDIA_TEST_ROOT)
+class ChunkedUploadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        
+        cls.assignment = Assignment.objects.create(
+            course=cls.course,
+            title='Essay',
+            description='Write an essay',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=100
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.content = os.urandom(uploads.MIN_CHUNK_SIZE * 2 + 1000)
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+        shutil.rmtree(UPLOAD_TEST_DIR, ignore_errors=True)
+    
+    def start(self, filename='essay.pdf', target='submission', **extra):
+        response = self.client.post('/api/core/uploads/', {
+            'target': target,
+            'filename': filename,
+            'total_size': len(self.content),
+            'chunk_size': uploads.MIN_CHUNK_SIZE,
+            'fields': {'assignment': self.assignment.id, 'comments': 'Done'},
+            **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+    
+    def put_chunk(self, upload_id, index, data=None):
+        if data is None:
+            size = uploads.MIN_CHUNK_SIZE
+            data = self.content[index * size:(index + 1) * size]
+        return self.client.put(
+            f'/api/core/uploads/{upload_id}/chunks/{index}/', data, content_type='application/octet-stream'
+        )
+    
+    def test_resume_and_complete(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 2)
+        response = self.put_chunk(upload_id, 0)
+        self.assertEqual(response.data['received'], [[0, 0], [2, 2]])
+        
+        incomplete = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        self.assertEqual(incomplete.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(incomplete.data['missing'], [1])
+        
+        self.put_chunk(upload_id, 1)
+        response = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        submission = Submission.objects.get(student=self.student)
+        self.assertEqual(submission.comments, 'Done')
+        with submission.file_path.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+    
+    def test_wrong_chunk_length_not_recorded(self):
+        upload_id = self.start()
+        
+        response = self.put_chunk(upload_id, 0, b'short')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        too_long = self.put_chunk(upload_id, 2, self.content[-1000:] + b'x')
+        self.assertEqual(too_long.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).received_chunks, [])
+    
+    def test_duplicate_submission_keeps_session(self):
+        upload_id = self.start()
+        for index in range(3):
+            self.put_chunk(upload_id, index)
+        existing = Submission.objects.create(
+            assignment=self.assignment, student=self.student, file_path='assignment_submissions/first.pdf'
+        )
+        
+        response = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertTrue(UploadSession.objects.filter(pk=upload_id).exists())
+        self.assertTrue(os.path.exists(os.path.join(UPLOAD_TEST_DIR, f'{upload_id}.part')))
+        
+        existing.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertFalse(os.path.exists(os.path.join(UPLOAD_TEST_DIR, f'{upload_id}.part')))
+        
+        again = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        self.assertEqual(again.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_chunk_count_is_bounded(self):
+        response = self.client.post('/api/core/uploads/', {
+            'target': 'submission',
+            'filename': 'essay.pdf',
+            'total_size': uploads.MIN_CHUNK_SIZE * uploads.MAX_CHUNKS + 1,
+            'chunk_size': uploads.MIN_CHUNK_SIZE,
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('chunk_size', response.data)
+        self.assertFalse(UploadSession.objects.exists())
+    
+    def test_serializer_rules_enforced_on_complete(self):
+        upload_id = self.start(filename='essay.exe')
+        for index in range(3):
+            self.put_chunk(upload_id, index)
+        
+        response = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file_path', response.data)
+        self.assertFalse(Submission.objects.exists())
+    
+    def test_students_cannot_upload_materials(self):
+        response = self.client.post('/api/core/uploads/', {
+            'target': 'material', 'filename': 'notes.pdf', 'total_size': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_teacher_material_upload(self):
+        self.client.force_authenticate(user=self.teacher)
+        upload_id = self.start(filename='lecture.mp4', target='material', fields={
+            'course': self.course.id, 'title': 'Lecture 1', 'description': 'Intro', 'file_type': 'video',
+        })
+        for index in range(3):
+            self.put_chunk(upload_id, index)
+        
+        response = self.client.post(f'/api/core/uploads/{upload_id}/complete/')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(CourseMaterial.objects.get().file_path.size, len(self.content))
+    
+    def test_sessions_are_private(self):
+        upload_id = self.start()
+        other = User.objects.create_user(username='other', password='testpass123', user_type='student')
+        self.client.force_authenticate(user=other)
+        
+        self.assertEqual(self.put_chunk(upload_id, 0).status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def create_material(self, filename, content=b'%PDF-1.4 notice'):
+        return CourseMaterial.objects.create(
+            course=self.course,
+            title=filename,
+            description='Notice',
+            file_path=SimpleUploadedFile(filename, content),
+            file_type='document'
+        )
+    
+    def test_identical_uploads_share_one_blob(self):
+        first = self.create_material('notice.pdf')
+        second = self.create_material('notice.pdf')
+        
+        self.assertNotEqual(first.file_path.name, second.file_path.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(b'%PDF-1.4 notice'))
+        self.assertEqual(os.listdir(os.path.dirname(default_storage.path(first.file_path.name))), [blob.sha256])
+        with second.file_path.open('rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 notice')
+    
+    def test_blob_survives_until_last_reference(self):
+        first = self.create_material('notice.pdf')
+        second = self.create_material('copy.pdf')
+        blob_path = default_storage.path(second.file_path.name)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(first.file_path.name)
+        self.assertTrue(os.path.exists(blob_path))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(second.file_path.name)
+        self.assertFalse(os.path.exists(blob_path))
+        self.assertFalse(MediaBlob.objects.exists())
+    
+    def test_different_content_gets_own_blob(self):
+        self.create_material('a.pdf', b'one')
+        self.create_material('b.pdf', b'two')
+        
+        self.assertEqual(MediaBlob.objects.count(), 2)
+    
+    def test_serves_by_logical_name(self):
+        material = self.create_material('notice.pdf')
+        self.client.force_login(self.teacher)
+        
+        response = self.client.get(material.file_path.url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 notice')
+        blob = MediaBlob.objects.get()
+        self.assertEqual(self.client.get(f'/media/{blob_name(blob.sha256)}').status_code, 404)
+    
+    def test_dedupe_media_adopts_legacy_files(self):
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'assignment_instructions'))
+        for name in ('notice.pdf', 'notice_a1b2c3.pdf', 'other.pdf'):
+            with open(os.path.join(MEDIA_TEST_ROOT, 'assignment_instructions', name), 'wb') as fh:
+                fh.write(b'other' if name == 'other.pdf' else b'duplicate body')
+        
+        out = StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertIn('Would reclaim 14 bytes from 1 duplicate(s) among 3 file(s)', out.getvalue())
+        self.assertFalse(MediaReference.objects.exists())
+        
+        call_command('dedupe_media', stdout=StringIO())
+        
+        self.assertEqual(MediaBlob.objects.count(), 2)
+        self.assertEqual(MediaReference.objects.count(), 3)
+        with default_storage.open('assignment_instructions/notice_a1b2c3.pdf') as fh:
+            self.assertEqual(fh.read(), b'duplicate body')
+    
+    def test_failed_adoption_keeps_source(self):
+        existing = self.create_material('notice.pdf', b'shared body')
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'course_covers'))
+        for name in ('dup.pdf', 'new.pdf'):
+            with open(os.path.join(MEDIA_TEST_ROOT, 'course_covers', name), 'wb') as fh:
+                fh.write(b'shared body' if name == 'dup.pdf' else b'new body')
+        
+        for name in ('dup.pdf', 'new.pdf'):
+            source = os.path.join(MEDIA_TEST_ROOT, 'course_covers', name)
+            with patch.object(MediaReference.objects, 'create', side_effect=IntegrityError('name taken')):
+                with self.assertRaises(IntegrityError), self.captureOnCommitCallbacks(execute=True):
+                    default_storage.adopt(f'course_covers/{name}')
+            self.assertTrue(os.path.exists(source))
+        
+        # Only the blob that existed before is left, with its refcount unchanged
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        blob_dir = os.path.dirname(os.path.dirname(os.path.dirname(default_storage.path(existing.file_path.name))))
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(blob_dir)), 1)
+    
+    def test_upload_on_disk_is_left_to_caller(self):
+        path = os.path.join(MEDIA_TEST_ROOT, 'incoming.pdf')
+        os.makedirs(MEDIA_TEST_ROOT, exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(b'%PDF-1.4 chunked')
+        
+        with open(path, 'rb') as fh:
+            name = default_storage.save('course_materials/chunked.pdf', uploads.AssembledFile(fh, name='chunked.pdf'))
+        
+        self.assertTrue(os.path.exists(path))
+        with default_storage.open(name) as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 chunked')
+    
+    def test_legacy_files_still_readable(self):
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'course_covers'))
+        with open(os.path.join(MEDIA_TEST_ROOT, 'course_covers', 'old.png'), 'wb') as fh:
+            fh.write(b'png')
+        
+        self.assertTrue(default_storage.exists('course_covers/old.png'))
+        with default_storage.open('course_covers/old.png') as fh:
+            self.assertEqual(fh.read(), b'png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class FileCleanupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def create_material(self, filename='notes.pdf', content=b'lecture notes'):
+        return CourseMaterial.objects.create(
+            course=self.course,
+            title=filename,
+            description='Notes',
+            file_path=SimpleUploadedFile(filename, content),
+            file_type='document'
+        )
+    
+    def write_legacy(self, name, content=b'legacy'):
+        path = os.path.join(MEDIA_TEST_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(content)
+        return path
+    
+    def test_destroy_queues_instead_of_deleting(self):
+        material = self.create_material()
+        path = default_storage.path(material.file_path.name)
+        
+        response = self.client.delete(f'/api/core/materials/{material.id}/')
+        
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(list(PendingFileDeletion.objects.values_list('name', flat=True)), [material.file_path.name])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_queue(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(PendingFileDeletion.objects.exists())
+    
+    def test_course_cascade_queues_every_file(self):
+        material = self.create_material()
+        assignment = Assignment.objects.create(
+            course=self.course,
+            title='Essay',
+            description='Write',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=100,
+            file_path=SimpleUploadedFile('brief.pdf', b'brief')
+        )
+        
+        self.course.delete()
+        
+        self.assertEqual(
+            set(PendingFileDeletion.objects.values_list('name', flat=True)),
+            {material.file_path.name, assignment.file_path.name}
+        )
+    
+    def test_queue_skips_names_still_in_use(self):
+        material = self.create_material()
+        PendingFileDeletion.objects.create(name=material.file_path.name)
+        
+        process_queue()
+        
+        self.assertTrue(default_storage.exists(material.file_path.name))
+        self.assertFalse(PendingFileDeletion.objects.exists())
+    
+    def test_failed_deletions_back_off(self):
+        PendingFileDeletion.objects.create(name='course_materials/stuck.pdf')
+        
+        with patch.object(default_storage, 'delete', side_effect=OSError('busy')) as delete:
+            self.assertEqual(process_queue(), 0)
+            self.assertEqual(process_queue(), 0)
+        
+        self.assertEqual(delete.call_count, 1)
+        entry = PendingFileDeletion.objects.get()
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.last_error, 'busy')
+        self.assertIsNotNone(entry.last_attempt_at)
+        
+        PendingFileDeletion.objects.update(last_attempt_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_queue(), 1)
+        self.assertFalse(PendingFileDeletion.objects.exists())
+    
+    def test_gc_media_reclaims_orphans(self):
+        kept = self.create_material('kept.pdf', b'kept body')
+        orphan = self.create_material('orphan.pdf', b'orphan body')
+        # Rows removed without signals, as a bulk delete or crash would
+        CourseMaterial.objects.filter(pk=orphan.pk)._raw_delete(CourseMaterial.objects.db)
+        self.write_legacy('course_covers/old.png', b'old cover')
+        self.write_legacy(f'{blob_name("f" * 64)}', b'interrupted')
+        
+        out = StringIO()
+        call_command('gc_media', '--dry-run', '--min-age=-60', stdout=out)
+        self.assertIn('Would reclaim 31 bytes in 3 file(s)', out.getvalue())
+        self.assertEqual(MediaReference.objects.count(), 2)
+        
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('gc_media', '--min-age=-60', stdout=out)
+        
+        self.assertIn('Reclaimed 31 bytes in 3 file(s)', out.getvalue())
+        self.assertEqual(list(MediaReference.objects.values_list('name', flat=True)), [kept.file_path.name])
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_TEST_ROOT, 'course_covers', 'old.png')))
+        with default_storage.open(kept.file_path.name) as fh:
+            self.assertEqual(fh.read(), b'kept body')
+    
+    def test_gc_media_spares_recent_files(self):
+        self.write_legacy('course_covers/new.png')
+        
+        out = StringIO()
+        call_command('gc_media', stdout=out)
+        
+        self.assertIn('Reclaimed 0 bytes in 0 file(s)', out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(MEDIA_TEST_ROOT, 'course_covers', 'new.png')))
+
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class MediaRangeTest(TestCase):
+    BODY = bytes(range(256)) * 4
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        cls.outsider = User.objects.create_user(
+            username='outsider',
+            email='outsider@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+    
+    def setUp(self):
+        self.material = CourseMaterial.objects.create(
+            course=self.course,
+            title='Lecture',
+            description='Lecture video',
+            file_path=SimpleUploadedFile('lecture.mp4', self.BODY),
+            file_type='video'
+        )
+        self.url = self.material.file_path.url
+        self.client.force_login(self.student)
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def test_full_download_advertises_ranges(self):
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{MediaBlob.objects.get().sha256}"')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY)
+    
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.BODY)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY[100:200])
+    
+    def test_open_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY[1000:])
+        
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response['Content-Range'], f'bytes 1014-1023/{len(self.BODY)}')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY[-10:])
+    
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9,500-509')
+        
+        self.assertEqual(response.status_code, 206)
+        boundary = response['Content-Type'].split('boundary=')[1]
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        parts = body.split(f'--{boundary}'.encode())[1:-1]
+        self.assertEqual(len(parts), 2)
+        self.assertIn(b'Content-Range: bytes 500-509/1024', parts[1])
+        self.assertTrue(parts[0].endswith(b'\r\n\r\n' + self.BODY[0:10] + b'\r\n'))
+        self.assertTrue(parts[1].endswith(b'\r\n\r\n' + self.BODY[500:510] + b'\r\n'))
+    
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-6000')
+        
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.BODY)}')
+    
+    def test_if_range_mismatch_sends_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+    
+    def test_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    
+    def test_access_follows_enrollment(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        
+        self.material.is_visible = False
+        self.material.save()
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+    
+    def test_jwt_header_and_cookie(self):
+        self.client.logout()
+        token = str(AccessToken.for_user(self.student))
+        
+        self.assertEqual(self.client.get(self.url, {'token': token}).status_code, 401)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 200)
+        self.client.cookies['media_token'] = token
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.cookies['media_token'] = 'garbage'
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+    
+    def test_course_covers_are_public(self):
+        self.course.cover_image_path = SimpleUploadedFile('cover.png', b'png')
+        self.course.save()
+        self.client.logout()
+        
+        self.assertEqual(self.client.get(self.course.cover_image_path.url).status_code, 200)
+    
+    def test_traversal_out_of_public_directories(self):
+        self.client.logout()
+        name = self.material.file_path.name
+        
+        for url in (
+            f'/media/course_covers/../{name}',
+            f'/media/profile_pictures/../{name}',
+            f'/media/course_covers/%2e%2e/{name}',
+            f'/media/course_covers/%2E%2E/{name}',
+            f'/media/course_covers/./../{name}',
+            f'/media/course_covers//../{name}',
+            f'/media/course_covers/..%5C{name}',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        self.assertEqual(self.client.get(f'/media/{name}').status_code, 401)
+    
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_offload_to_web_server(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        
+        digest = MediaBlob.objects.get().sha256
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{blob_name(digest)}')
+        self.assertEqual(response.content, b'')
+
+
+def png_upload(name, size=(800, 600), mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class ImageDerivativeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        cls.outsider = User.objects.create_user(
+            username='outsider',
+            email='outsider@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+    
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date(),
+            cover_image_path=png_upload('cover.png')
+        )
+        self.cover_url = self.course.cover_image_path.url
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def open_variant(self, url, variant):
+        response = self.client.get(url, {'variant': variant})
+        self.assertEqual(response.status_code, 200)
+        return response, Image.open(BytesIO(b''.join(response.streaming_content)))
+    
+    def test_serializers_expose_variant_urls(self):
+        client = APIClient()
+        client.force_authenticate(user=self.teacher)
+        
+        data = client.get(f'/api/core/courses/{self.course.id}/').json()
+        
+        self.assertEqual(set(data['cover_image_variants']), {'thumb', 'card', 'full'})
+        self.assertTrue(data['cover_image_variants']['card']['webp'].endswith(f'{self.cover_url}?variant=card.webp'))
+        self.assertIsNone(client.get(f'/userauths/api/users/{self.teacher.id}/').json()['profile_picture_variants'])
+    
+    def test_renders_sizes_and_formats(self):
+        response, image = self.open_variant(self.cover_url, 'card.webp')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual((image.format, image.size), ('WEBP', (480, 270)))
+        
+        _, image = self.open_variant(self.cover_url, 'full.jpeg')
+        self.assertEqual((image.format, image.size), ('JPEG', (800, 600)))
+        
+        _, image = self.open_variant(self.cover_url, 'thumb.jpeg')
+        self.assertEqual(image.size, (160, 160))
+    
+    def test_renders_once_per_content(self):
+        self.open_variant(self.cover_url, 'thumb.webp')
+        other = Course.objects.create(
+            title='Copy',
+            description='Same cover',
+            teacher=self.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date(),
+            cover_image_path=png_upload('copy.png')
+        )
+        
+        with patch('core.images.render') as render:
+            self.open_variant(self.cover_url, 'thumb.webp')
+            self.open_variant(other.cover_image_path.url, 'thumb.webp')
+        
+        render.assert_not_called()
+    
+    def test_legacy_source_hashed_once(self):
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'course_covers'), exist_ok=True)
+        with open(os.path.join(MEDIA_TEST_ROOT, 'course_covers', 'legacy.png'), 'wb') as fh:
+            fh.write(png_upload('legacy.png').read())
+        cache.clear()
+        
+        with patch('core.images.hash_file', wraps=images.hash_file) as hashed:
+            images.get_derivative('course_covers/legacy.png', 'thumb', 'webp')
+            images.get_derivative('course_covers/legacy.png', 'thumb', 'webp')
+        
+        self.assertEqual(hashed.call_count, 1)
+    
+    def test_transparent_images_flatten_for_jpeg(self):
+        self.course.cover_image_path = png_upload('alpha.png', mode='RGBA')
+        self.course.save()
+        
+        _, image = self.open_variant(self.course.cover_image_path.url, 'card.jpeg')
+        
+        self.assertEqual(image.mode, 'RGB')
+    
+    def test_unknown_variant_or_unreadable_image(self):
+        self.assertEqual(self.client.get(self.cover_url, {'variant': 'huge.webp'}).status_code, 404)
+        
+        material = CourseMaterial.objects.create(
+            course=self.course,
+            title='Notes',
+            description='Notes',
+            file_path=SimpleUploadedFile('notes.pdf', b'%PDF-1.4'),
+            file_type='document'
+        )
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(material.file_path.url, {'variant': 'card.webp'}).status_code, 404)
+    
+    def test_thumbnail_variants_follow_material_access(self):
+        material = CourseMaterial.objects.create(
+            course=self.course,
+            title='Lecture',
+            description='Lecture video',
+            file_path=SimpleUploadedFile('lecture.mp4', b'video'),
+            file_type='video'
+        )
+        video = VideoResource.objects.create(material=material, duration=60, thumbnail_path=png_upload('frame.png'))
+        
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(video.thumbnail_path.url, {'variant': 'thumb.webp'}).status_code, 403)
+        self.client.force_login(self.teacher)
+        self.open_variant(video.thumbnail_path.url, 'thumb.webp')
+    
+    def test_command_and_garbage_collection(self):
+        out = StringIO()
+        call_command('generate_image_derivatives', stdout=out)
+        self.assertIn('Rendered 6 derivative(s) for 1 image(s)', out.getvalue())
+        derivatives = os.path.join(MEDIA_TEST_ROOT, images.DERIVATIVE_DIR)
+        
+        self.assertEqual(collect_garbage(min_age=0), {'files': 0, 'bytes': 0})
+        self.assertTrue(os.path.isdir(derivatives))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+            process_queue()
+        summary = collect_garbage(min_age=0)
+        
+        self.assertEqual(summary['files'], 6)
+        self.assertEqual([files for _, _, files in os.walk(derivatives) if files], [])
+    
+    @override_settings(IMAGE_DERIVATIVES_EAGER=True)
+    def test_eager_generation_after_upload(self):
+        with patch('core.tasks.generate_image_derivatives.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.course.cover_image_path = png_upload('new.png')
+                self.course.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.course.save(update_fields=['title'])
+        
+        delay.assert_called_once_with(self.course.cover_image_path.name)
+
+
+def mp4_box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def mp4_file(duration=125500, timescale=1000, size=(1280, 720), rotated=False, mdat=b'\0' * 4096):
+    mvhd = mp4_box(b'mvhd', bytes(4) + struct.pack('>IIII', 0, 0, timescale, duration) + bytes(80))
+    matrix = (0, 1 << 16, 0, -(1 << 16), 0, 0, 0, 0, 1 << 30) if rotated else (1 << 16, 0, 0, 0, 1 << 16, 0, 0, 0, 1 << 30)
+    
+    def trak(width, height):
+        tkhd = bytes(4) + bytes(20) + bytes(16) + struct.pack('>9i', *matrix) + struct.pack('>II', width << 16, height << 16)
+        return mp4_box(b'trak', mp4_box(b'tkhd', tkhd) + mp4_box(b'mdia', bytes(16)))
+    
+    # Audio track first, and moov after the media data as many encoders write it
+    moov = mp4_box(b'moov', mvhd + trak(0, 0) + trak(*size))
+    return mp4_box(b'ftyp', b'isom' + bytes(4)) + mp4_box(b'mdat', mdat) + moov
+
+
+def ebml(element, data):
+    return element.to_bytes((element.bit_length() + 7) // 8, 'big') + b'\x01' + len(data).to_bytes(7, 'big') + data
+
+
+def webm_file(seek_head_first=False):
+    info = ebml(video_probe.INFO, ebml(video_probe.TIMECODE_SCALE, (1000000).to_bytes(3, 'big'))
+                + ebml(video_probe.DURATION, struct.pack('>d', 90400.0)))
+    tracks = ebml(video_probe.TRACKS, ebml(video_probe.TRACK_ENTRY, ebml(video_probe.TRACK_TYPE, b'\x02'))
+                  + ebml(video_probe.TRACK_ENTRY, ebml(video_probe.TRACK_TYPE, b'\x01') + ebml(
+                      video_probe.VIDEO, ebml(video_probe.PIXEL_WIDTH, (640).to_bytes(2, 'big'))
+                      + ebml(video_probe.PIXEL_HEIGHT, (360).to_bytes(2, 'big')))))
+    cluster = ebml(video_probe.CLUSTER, bytes(4096))
+    header = ebml(0x1A45DFA3, ebml(0x4282, b'webm'))
+    if not seek_head_first:
+        return header + ebml(video_probe.SEGMENT, info + tracks + cluster)
+    
+    def seek_head(info_at, tracks_at):
+        return ebml(video_probe.SEEK_HEAD, b''.join(
+            ebml(video_probe.SEEK, ebml(video_probe.SEEK_ID, element.to_bytes(4, 'big'))
+                 + ebml(video_probe.SEEK_POSITION, position.to_bytes(8, 'big')))
+            for element, position in ((video_probe.INFO, info_at), (video_probe.TRACKS, tracks_at))
+        ))
+    
+    # Info and Tracks after the first cluster, found through the SeekHead
+    length = len(seek_head(0, 0))
+    head = seek_head(length + len(cluster), length + len(cluster) + len(info))
+    return header + ebml(video_probe.SEGMENT, head + cluster + info + tracks)
+
+
+class CountingFile(BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+    
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class VideoProbeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def create_video(self, name, content):
+        return CourseMaterial.objects.create(
+            course=self.course,
+            title=name,
+            description='Lecture video',
+            file_path=SimpleUploadedFile(name, content),
+            file_type='video'
+        )
+    
+    def test_mp4_reads_headers_only(self):
+        fh = CountingFile(mp4_file(mdat=bytes(8 * 1024 * 1024)))
+        
+        info = video_probe.probe_mp4(fh)
+        
+        self.assertEqual(info, (125.5, 1280, 720))
+        self.assertEqual(info.resolution, '1280x720')
+        self.assertLess(fh.bytes_read, 1024)
+    
+    def test_rotated_mp4(self):
+        fh = BytesIO(mp4_file(rotated=True))
+        
+        self.assertEqual(video_probe.probe_mp4(fh).resolution, '720x1280')
+    
+    def test_webm(self):
+        info = video_probe.probe_ebml(BytesIO(webm_file()))
+        self.assertEqual(info, (90.4, 640, 360))
+        
+        fh = CountingFile(webm_file(seek_head_first=True))
+        self.assertEqual(video_probe.probe_ebml(fh), (90.4, 640, 360))
+        self.assertLess(fh.bytes_read, 512)
+    
+    def test_crafted_sizes_are_not_trusted(self):
+        # An mvhd claiming a huge 64-bit size is clamped to its parent and not parsed
+        data = mp4_file()
+        mvhd = data.index(b'mvhd') - 4
+        fh = CountingFile(data[:mvhd] + struct.pack('>I4sQ', 1, b'mvhd', 1 << 60) + data[mvhd + 8:])
+        self.assertEqual(video_probe.probe_mp4(fh), (None, None, None))
+        self.assertLess(fh.bytes_read, 256)
+        
+        # An EBML value claiming more bytes than its parent holds
+        header = ebml(0x1A45DFA3, ebml(0x4282, b'webm'))
+        info = ebml(video_probe.INFO, video_probe.DURATION.to_bytes(2, 'big') + b'\x01' + (1 << 40).to_bytes(7, 'big'))
+        fh = CountingFile(header + ebml(video_probe.SEGMENT, info))
+        with self.assertRaises(video_probe.ProbeError):
+            video_probe.probe_ebml(fh)
+        self.assertLess(fh.bytes_read, 256)
+        
+        # Endless tiny elements run into the read budget
+        tracks = ebml(video_probe.TRACKS, ebml(video_probe.TRACK_ENTRY, b'') * 20000)
+        fh = CountingFile(header + ebml(video_probe.SEGMENT, tracks))
+        with self.assertRaises(video_probe.ProbeError):
+            video_probe.probe_ebml(fh)
+        self.assertLessEqual(fh.bytes_read, video_probe.MAX_READ)
+    
+    def test_unknown_or_truncated_files(self):
+        path = os.path.join(MEDIA_TEST_ROOT, 'notes.pdf')
+        os.makedirs(MEDIA_TEST_ROOT, exist_ok=True)
+        for content in (b'%PDF-1.4 notes', mp4_file(mdat=b'')[:40]):
+            with open(path, 'wb') as fh:
+                fh.write(content)
+            with self.assertRaises(video_probe.ProbeError):
+                video_probe.probe(path)
+    
+    def test_upload_fills_in_video_details(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = self.create_video('lecture.mp4', mp4_file())
+        
+        video = VideoResource.objects.get(material=material)
+        self.assertEqual((video.duration, video.resolution), (126, '1280x720'))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            material.file_path = SimpleUploadedFile('recording.webm', webm_file())
+            material.save()
+        
+        video.refresh_from_db()
+        self.assertEqual((video.duration, video.resolution), (90, '640x360'))
+    
+    def test_edits_without_new_file_are_not_probed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = self.create_video('lecture.mp4', mp4_file())
+        
+        with patch('core.tasks.probe_video') as probe, self.captureOnCommitCallbacks(execute=True):
+            material.title = 'Renamed'
+            material.save()
+            CourseMaterial.objects.get(pk=material.pk).save()
+        
+        probe.assert_not_called()
+    
+    def test_unreadable_upload_keeps_typed_values(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = self.create_video('lecture.avi', b'RIFF....AVI ')
+        
+        self.assertFalse(VideoResource.objects.filter(material=material).exists())
+    
+    @override_settings(VIDEO_PROBE_ASYNC=True)
+    def test_probe_queued_in_background(self):
+        with patch('core.tasks.probe_video.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                material = self.create_video('lecture.mp4', mp4_file())
+        
+        delay.assert_called_once_with(material.pk)
+    
+    def test_probe_videos_command(self):
+        materials = [self.create_video(f'lecture{i}.mp4', mp4_file(duration=60000 * (i + 1))) for i in range(3)]
+        self.create_video('broken.mp4', b'not a video')
+        VideoResource.objects.create(material=materials[0], duration=60, resolution='1280x720')
+        
+        out, err = StringIO(), StringIO()
+        # Spawned workers (the macOS and Windows default) start without Django set up
+        spawn = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with patch('core.management.commands.probe_videos.ProcessPoolExecutor', spawn):
+            call_command('probe_videos', '--workers', '2', stdout=out, stderr=err)
+        
+        self.assertIn('Probed 2 video(s); 1 could not be read', out.getvalue())
+        self.assertIn('broken.mp4', err.getvalue())
+        self.assertEqual(
+            list(VideoResource.objects.order_by('material_id').values_list('duration', flat=True)), [60, 120, 180]
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class SubmissionArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        cls.other_teacher = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='testpass123',
+            user_type='teacher'
+        )
+        cls.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                user_type='student',
+                first_name='Student',
+                last_name=str(i)
+            )
+            for i in range(3)
+        ]
+        
+        cls.course = Course.objects.create(
+            title='Test Course',
+            description='Test Course Description',
+            teacher=cls.teacher,
+            start_date=timezone.now().date(),
+            end_date=(timezone.now() + timedelta(days=30)).date()
+        )
+        cls.assignment = Assignment.objects.create(
+            course=cls.course,
+            title='Essay',
+            description='Write an essay',
+            due_date=timezone.now() + timedelta(days=7),
+            total_points=100
+        )
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+        self.url = f'/api/core/assignments/{self.assignment.id}/download_submissions/'
+        uploads = [('essay.txt', b'plain text ' * 1000), ('essay.PDF', b'%PDF-1.4 essay'), ('scan.png', b'png')]
+        self.submissions = [
+            Submission.objects.create(
+                assignment=self.assignment,
+                student=student,
+                file_path=SimpleUploadedFile(name, content)
+            )
+            for student, (name, content) in zip(self.students, uploads)
+        ]
+        Submission.objects.filter(pk=self.submissions[1].pk).update(is_late=True)
+    
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+    
+    def download(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+    
+    def test_archive_contents(self):
+        archive = self.download()
+        
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['student0.txt', 'student1_late.pdf', 'student2.png', 'manifest.csv'])
+        self.assertEqual(archive.read('student0.txt'), b'plain text ' * 1000)
+        self.assertEqual(archive.getinfo('student0.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.getinfo('student2.png').compress_type, zipfile.ZIP_STORED)
+        
+        rows = list(csv.DictReader(archive.read('manifest.csv').decode().splitlines()))
+        self.assertEqual([row['File'] for row in rows], ['student0.txt', 'student1_late.pdf', 'student2.png'])
+        self.assertEqual([row['Late'] for row in rows], ['no', 'yes', 'no'])
+        self.assertEqual(rows[0]['Name'], 'Student 0')
+        self.assertEqual(rows[1]['Original name'], os.path.basename(self.submissions[1].file_path.name))
+    
+    def test_compression_modes(self):
+        archive = self.download(compression='stored')
+        self.assertEqual({info.compress_type for info in archive.infolist()[:-1]}, {zipfile.ZIP_STORED})
+        
+        archive = self.download(compression='deflate')
+        self.assertEqual(archive.getinfo('student2.png').compress_type, zipfile.ZIP_DEFLATED)
+        
+        self.assertEqual(self.client.get(self.url, {'compression': 'bzip2'}).status_code, 400)
+    
+    def test_missing_files_are_listed_in_manifest(self):
+        os.remove(default_storage.path(self.submissions[2].file_path.name))
+        
+        archive = self.download()
+        
+        self.assertNotIn('student2.png', archive.namelist())
+        rows = list(csv.DictReader(archive.read('manifest.csv').decode().splitlines()))
+        self.assertEqual((rows[2]['Username'], rows[2]['File']), ('student2', ''))
+    
+    def test_streams_block_by_block(self):
+        with patch('core.submission_archive.BLOCK_SIZE', 1024):
+            response = self.client.get(self.url, {'compression': 'stored'})
+            chunks = list(response.streaming_content)
+        
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 1024 + 100)
+        self.assertGreater(len(chunks), 10)
+    
+    def test_only_the_course_teacher(self):
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        
+        self.client.force_authenticate(user=self.other_teacher)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
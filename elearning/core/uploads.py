@@ -0,0 +1,103 @@
+"""
+Disk side of resumable uploads. Each UploadSession owns one preallocated
+temporary file; chunks are streamed into it at their offset, so memory use
+does not depend on the file size, and the finished file is moved rather than
+copied into storage.
+"""
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+BLOCK_SIZE = 64 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# Every chunk PUT rewrites the session's received list, so keep it short
+MAX_CHUNKS = 1024
+SESSION_TTL = timedelta(days=1)
+
+
+class ChunkError(ValueError):
+    pass
+
+
+def session_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.pk}.part')
+
+
+def allocate(session):
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    with open(session_path(session), 'wb') as fh:
+        # Sparse on most filesystems; chunks fill it in any order
+        fh.truncate(session.total_size)
+
+
+def discard(session):
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def write_chunk(session, index, stream):
+    """
+    Copy chunk ``index`` from ``stream`` into place a block at a time.
+    Raises ChunkError unless the body is exactly the chunk's length; the
+    chunk is then simply not counted as received and can be sent again.
+    """
+    if not 0 <= index < session.chunk_count:
+        raise ChunkError(f'Chunk index must be between 0 and {session.chunk_count - 1}')
+    expected = session.chunk_length(index)
+    if stream is None:
+        raise ChunkError(f'Chunk {index} must be {expected} bytes, got 0')
+    written = 0
+    with open(session_path(session), 'r+b') as fh:
+        fh.seek(index * session.chunk_size)
+        # Read one byte past the chunk to detect oversized bodies
+        while written <= expected:
+            block = stream.read(min(BLOCK_SIZE, expected + 1 - written))
+            if not block:
+                break
+            if written + len(block) > expected:
+                raise ChunkError(f'Chunk {index} must be {expected} bytes')
+            fh.write(block)
+            written += len(block)
+    if written != expected:
+        raise ChunkError(f'Chunk {index} must be {expected} bytes, got {written}')
+
+
+def received_ranges(chunks):
+    """Collapse chunk numbers into ``[first, last]`` runs: [0, 1, 2, 5] -> [[0, 2], [5, 5]]."""
+    ranges = []
+    for index in sorted(chunks):
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ranges
+
+
+def missing_chunks(session):
+    received = set(session.received_chunks)
+    return [index for index in range(session.chunk_count) if index not in received]
+
+
+class AssembledFile(File):
+    # FileSystemStorage moves files exposing temporary_file_path() into place
+    # instead of copying them
+    def temporary_file_path(self):
+        return self.file.name
+
+
+@contextmanager
+def assembled_file(session):
+    with open(session_path(session), 'rb') as fh:
+        yield AssembledFile(fh, name=session.filename)
+
+
+def expired_sessions(queryset):
+    return queryset.filter(updated_at__lt=timezone.now() - SESSION_TTL)
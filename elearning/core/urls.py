@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CourseViewSet, EnrollmentViewSet, CourseMaterialViewSet, AssignmentViewSet,
     SubmissionViewSet, GradeViewSet, CourseFeedbackViewSet, AnnouncementViewSet,
-    VideoResourceViewSet, CourseStructureViewSet
+    VideoResourceViewSet, CourseStructureViewSet, UploadSessionViewSet, dashboard, search
 )
 
 app_name = "core"
@@ -19,7 +19,10 @@ router.register(r'feedback', CourseFeedbackViewSet)
 router.register(r'announcements', AnnouncementViewSet)
 router.register(r'video-resources', VideoResourceViewSet)
 router.register(r'course-structure', CourseStructureViewSet)
+router.register(r'uploads', UploadSessionViewSet)
 
 urlpatterns = [
+    path('dashboard/', dashboard, name='dashboard'),
+    path('search/', search, name='search'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,376 @@
+"""
+Duration and frame size of uploaded videos, read from container headers.
+
+MP4/MOV files are walked box by box (moov > mvhd for the duration, trak >
+tkhd for the frame size) and Matroska/WebM files element by element (Info
+for the duration, Tracks for the frame size). Everything else, media data
+included, is skipped with seeks, so probing reads a few kilobytes however
+large the file is.
+"""
+import os
+import struct
+from typing import NamedTuple
+
+from django.core.files.storage import default_storage
+
+from .models import VideoResource
+
+
+class ProbeError(ValueError):
+    pass
+
+
+class VideoInfo(NamedTuple):
+    duration: float | None
+    width: int | None
+    height: int | None
+
+    @property
+    def resolution(self):
+        return f'{self.width}x{self.height}' if self.width and self.height else ''
+
+
+# Top-level MP4 box types a file may start with
+MP4_TYPES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'}
+EBML_MAGIC = b'\x1a\x45\xdf\xa3'
+# Stop walking after this many boxes or elements in one container
+MAX_ITEMS = 10000
+# Whole-probe budgets, so crafted sizes and nesting can't make it scan the file
+MAX_READ = 64 * 1024
+MAX_SEEKS = 20000
+# Largest mvhd/tkhd box and Info/Tracks/SeekHead element worth parsing
+MAX_BOX_SIZE = 256
+MAX_HEADER_SIZE = 1024 * 1024
+# EBML integers are at most 8 bytes
+MAX_VALUE_SIZE = 8
+
+
+class BoundedReader:
+    """Wrap a file so a probe raises ProbeError past MAX_READ bytes or MAX_SEEKS seeks."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.bytes_read = 0
+        self.seeks = 0
+
+    def read(self, size):
+        if self.bytes_read + size > MAX_READ:
+            raise ProbeError('Header too large')
+        data = self.fh.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.seeks += 1
+        if self.seeks > MAX_SEEKS:
+            raise ProbeError('Header too complex')
+        return self.fh.seek(offset, whence)
+
+    def tell(self):
+        return self.fh.tell()
+
+
+def probe(path):
+    """Return the VideoInfo of the file at ``path``, raising ProbeError when it isn't MP4, MOV or WebM."""
+    with open(path, 'rb') as fh:
+        head = fh.read(12)
+        fh.seek(0)
+        if head[4:8] in MP4_TYPES:
+            info = probe_mp4(fh)
+        elif head[:4] == EBML_MAGIC:
+            info = probe_ebml(fh)
+        else:
+            raise ProbeError('Not an MP4, MOV or WebM file')
+    if info == (None, None, None):
+        raise ProbeError('No usable video headers')
+    return info
+
+
+def read_exact(fh, size):
+    if size < 0:
+        raise ProbeError('Negative read')
+    data = fh.read(size)
+    if len(data) != size:
+        raise ProbeError('Unexpected end of file')
+    return data
+
+
+# MP4 / QuickTime
+
+def mp4_boxes(fh, end):
+    """Yield ``(type, payload start, payload end)`` for the boxes up to ``end``, seeking past each."""
+    position = fh.tell()
+    for _ in range(MAX_ITEMS):
+        if end - position < 8:
+            return
+        fh.seek(position)
+        size, kind = struct.unpack('>I4s', read_exact(fh, 8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', read_exact(fh, 8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            raise ProbeError(f'Bad {kind!r} box size')
+        box_end = min(position + size, end)
+        yield kind, position + header, box_end
+        position = box_end
+
+
+def parse_mvhd(fh):
+    version = read_exact(fh, 4)[0]
+    if version == 1:
+        _, _, timescale, duration = struct.unpack('>QQIQ', read_exact(fh, 28))
+    else:
+        _, _, timescale, duration = struct.unpack('>IIII', read_exact(fh, 16))
+    # An all-ones duration means unknown
+    if not timescale or duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return None
+    return duration / timescale
+
+
+def parse_tkhd(fh):
+    version = read_exact(fh, 4)[0]
+    # Times, track ID and duration, then reserved, layer, group and volume
+    fh.seek((32 if version == 1 else 20) + 16, os.SEEK_CUR)
+    matrix = struct.unpack('>9i', read_exact(fh, 36))
+    width, height = (value >> 16 for value in struct.unpack('>II', read_exact(fh, 8)))
+    # Rotated by 90 or 270 degrees: the picture is displayed on its side
+    if matrix[0] == 0 and abs(matrix[1]) == 1 << 16:
+        width, height = height, width
+    return width, height
+
+
+def probe_mp4(fh):
+    fh = BoundedReader(fh)
+    end = fh.seek(0, os.SEEK_END)
+    fh.seek(0)
+    for kind, start, box_end in mp4_boxes(fh, end):
+        if kind != b'moov':
+            continue
+        duration = width = height = None
+        fh.seek(start)
+        for child, child_start, child_end in mp4_boxes(fh, box_end):
+            fh.seek(child_start)
+            if child == b'mvhd':
+                # Version 1 is the longest at 108 bytes
+                duration = parse_mvhd(fh) if 20 <= child_end - child_start <= MAX_BOX_SIZE else None
+            elif child == b'trak' and not width:
+                for grandchild, grandchild_start, grandchild_end in mp4_boxes(fh, child_end):
+                    if grandchild == b'tkhd':
+                        if not 84 <= grandchild_end - grandchild_start <= MAX_BOX_SIZE:
+                            break
+                        fh.seek(grandchild_start)
+                        # Audio tracks have no frame size; keep looking
+                        width, height = (value or None for value in parse_tkhd(fh))
+                        break
+        return VideoInfo(duration, width, height)
+    raise ProbeError('No moov box')
+
+
+# Matroska / WebM
+
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+VIDEO_TRACK = 1
+
+
+def read_vint(fh, keep_marker):
+    """Read an EBML variable-length integer; None for an unknown (all ones) size."""
+    first = read_exact(fh, 1)[0]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ProbeError('Bad EBML integer')
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in read_exact(fh, length - 1):
+        value = value << 8 | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None
+    return value
+
+
+def ebml_elements(fh, end, allow_unknown=False):
+    """
+    Yield ``(id, data start, size)`` up to ``end``, seeking past each
+    element. Sizes running past ``end`` count as unknown. Only where
+    ``allow_unknown`` (the file and Segment levels) may the size be None,
+    which ends the walk.
+    """
+    position = fh.tell()
+    for _ in range(MAX_ITEMS):
+        if end is not None and position >= end:
+            return
+        fh.seek(position)
+        try:
+            element = read_vint(fh, keep_marker=True)
+        except ProbeError:
+            # End of file in a segment of unknown size
+            return
+        size = read_vint(fh, keep_marker=False)
+        start = fh.tell()
+        if size is not None and end is not None and size > end - start:
+            size = None
+        if size is None and not allow_unknown:
+            raise ProbeError('Unknown-size element inside a header')
+        yield element, start, size
+        if size is None:
+            return
+        position = start + size
+
+
+def read_uint(fh, size):
+    if size > MAX_VALUE_SIZE:
+        raise ProbeError('EBML integer too long')
+    return int.from_bytes(read_exact(fh, size), 'big')
+
+
+def read_float(fh, size):
+    if size not in (4, 8):
+        raise ProbeError('Bad EBML float')
+    return struct.unpack('>f' if size == 4 else '>d', read_exact(fh, size))[0]
+
+
+def parse_info(fh, start, size):
+    scale, duration = 1000000, None
+    fh.seek(start)
+    for element, data, length in ebml_elements(fh, start + size):
+        fh.seek(data)
+        if element == TIMECODE_SCALE:
+            scale = read_uint(fh, length)
+        elif element == DURATION:
+            duration = read_float(fh, length)
+    # Duration is counted in TimecodeScale nanoseconds
+    return duration * scale / 1e9 if duration else None
+
+
+def parse_tracks(fh, start, size):
+    fh.seek(start)
+    for element, data, length in ebml_elements(fh, start + size):
+        if element != TRACK_ENTRY:
+            continue
+        track_type = width = height = None
+        fh.seek(data)
+        for child, child_data, child_length in ebml_elements(fh, data + length):
+            fh.seek(child_data)
+            if child == TRACK_TYPE:
+                track_type = read_uint(fh, child_length)
+            elif child == VIDEO:
+                for field, field_data, field_length in ebml_elements(fh, child_data + child_length):
+                    fh.seek(field_data)
+                    if field == PIXEL_WIDTH:
+                        width = read_uint(fh, field_length)
+                    elif field == PIXEL_HEIGHT:
+                        height = read_uint(fh, field_length)
+        if track_type == VIDEO_TRACK:
+            return width, height
+        fh.seek(data + length)
+    return None, None
+
+
+def parse_seek_head(fh, start, size, segment_start):
+    """Map element IDs to their absolute offsets from a SeekHead."""
+    positions = {}
+    fh.seek(start)
+    for element, data, length in ebml_elements(fh, start + size):
+        if element != SEEK:
+            continue
+        target = offset = None
+        fh.seek(data)
+        for child, child_data, child_length in ebml_elements(fh, data + length):
+            fh.seek(child_data)
+            if child == SEEK_ID:
+                target = read_uint(fh, child_length)
+            elif child == SEEK_POSITION:
+                offset = read_uint(fh, child_length)
+        if target is not None and offset is not None:
+            positions[target] = segment_start + offset
+        fh.seek(data + length)
+    return positions
+
+
+def probe_ebml(fh):
+    fh = BoundedReader(fh)
+    end = fh.seek(0, os.SEEK_END)
+    fh.seek(0)
+    for element, start, size in ebml_elements(fh, end, allow_unknown=True):
+        if element == SEGMENT:
+            segment_end = end if size is None else min(start + size, end)
+            return parse_segment(fh, start, segment_end)
+    raise ProbeError('No Segment element')
+
+
+def parse_segment(fh, start, end):
+    found = {}
+    positions = {}
+
+    def parse(element, data, size):
+        if size > MAX_HEADER_SIZE:
+            # Not a plausible header; leave the value unknown
+            return
+        if element == INFO:
+            found[INFO] = parse_info(fh, data, size)
+        elif element == TRACKS:
+            found[TRACKS] = parse_tracks(fh, data, size)
+        elif element == SEEK_HEAD:
+            positions.update(parse_seek_head(fh, data, size, start))
+
+    fh.seek(start)
+    for element, data, size in ebml_elements(fh, end, allow_unknown=True):
+        if INFO in found and TRACKS in found:
+            break
+        if element == CLUSTER or size is None:
+            # Media data from here on: jump to what the SeekHead points at
+            break
+        parse(element, data, size)
+
+    for element in (INFO, TRACKS):
+        if element not in found and positions.get(element) is not None:
+            fh.seek(positions[element])
+            for found_element, data, size in ebml_elements(fh, end, allow_unknown=True):
+                if found_element == element and size is not None:
+                    parse(element, data, size)
+                break
+
+    width, height = found.get(TRACKS, (None, None))
+    return VideoInfo(found.get(INFO), width, height)
+
+
+def update_video_metadata(material, info=None, storage=None):
+    """
+    Store the duration and resolution of ``material``'s file (probed unless
+    ``info`` is given) on its VideoResource, creating one when the material
+    has none. Values the container doesn't carry are left as they are.
+    Returns the VideoInfo.
+    """
+    if info is None:
+        info = probe((storage or default_storage).path(material.file_path.name))
+    values = {}
+    if info.duration is not None:
+        values['duration'] = round(info.duration)
+    if info.resolution:
+        values['resolution'] = info.resolution
+
+    video = VideoResource.objects.filter(material=material).first()
+    if video is None:
+        VideoResource.objects.create(material=material, **{'duration': 0, **values})
+    elif any(getattr(video, field) != value for field, value in values.items()):
+        for field, value in values.items():
+            setattr(video, field, value)
+        video.save(update_fields=[*values, 'updated_at'])
+    return info
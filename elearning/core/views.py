@@ -1,42 +1,147 @@
-from rest_framework import viewsets, permissions
-from rest_framework.decorators import action
+from rest_framework import mixins, viewsets, permissions
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.conf import settings
-import os
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import JSONParser
+from rest_framework import serializers
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+import io
 from .models import (
     Course, Enrollment, CourseMaterial, Assignment, Submission, Grade,
-    CourseFeedback, Announcement, VideoResource, CourseStructure
+    CourseFeedback, Announcement, VideoResource, CourseStructure, UploadSession
 )
 from .serializers import (
     CourseSerializer, EnrollmentSerializer, CourseMaterialSerializer,
     AssignmentSerializer, SubmissionSerializer, GradeSerializer,
     CourseFeedbackSerializer, AnnouncementSerializer, VideoResourceSerializer,
-    CourseStructureSerializer
+    CourseStructureSerializer, BulkGradeEntrySerializer, UploadSessionSerializer, validate_score
 )
+from addon.models import ChatMessage
+from . import catalog as course_catalog
+from . import dashboard as dashboard_cache
+from . import gradebook as gradebook_rows
+from . import stats as course_stats
+from . import search as search_index
+from . import submission_archive
+from . import outline as course_outline
+from . import uploads as chunked_uploads
+from .enrollment_import import import_enrollments, read_identifiers
+from .json_patch import JsonPatchError, apply_patch
+from .caching import touch
+from .conditional import ConditionalGetMixin
+from .dynamic_fields import EagerLoadingMixin
+from .pagination import FeedCursorPagination
 from .tasks import notify_teacher_enrollment
 
 # REST API Viewsets
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_queryset(self):
+    def get_course_queryset(self):
         user = self.request.user
         if user.user_type == 'teacher':
             return Course.objects.filter(teacher=user)
-        else:
-            return Course.objects.filter(is_active=True)
+        return Course.objects.filter(is_active=True)
+    
+    def get_queryset(self):
+        return self.get_course_queryset().with_enrollment_count()
+    
+    def get_validator_queryset(self):
+        # Enrollment changes touch Course.updated_at, so the count join isn't needed here
+        return self.filter_queryset(self.get_course_queryset())
+    
+    def list(self, request, *args, **kwargs):
+        if request.user.user_type == 'teacher':
+            return super().list(request, *args, **kwargs)
+        
+        # Every student sees the same catalog, so serve one shared copy
+        def render():
+            _, last_modified = self.get_validators(self.get_validator_queryset())
+            return {
+                'data': mixins.ListModelMixin.list(self, request, *args, **kwargs).data,
+                'last_modified': last_modified,
+            }
+        
+        entry, outcome = course_catalog.get_catalog(request, render)
+        course_catalog.record(outcome)
+        response = get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified']
+        ) or Response(entry['data'])
+        response['ETag'] = entry['etag']
+        if entry['last_modified'] is not None:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        response['Cache-Control'] = 'private, no-cache'
+        response['X-Catalog-Cache'] = outcome
+        return response
     
     def perform_create(self, serializer):
         serializer.save(teacher=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        """
+        Students x assignments matrix of scores and late flags with per-student
+        totals. ``?export=csv`` streams the same matrix as a CSV download.
+        """
+        if request.user.user_type != 'teacher':
+            return Response({'error': 'Only teachers can view gradebooks'}, status=403)
+        course = self.get_object()
+        
+        if request.query_params.get('export') == 'csv':
+            response = StreamingHttpResponse(gradebook_rows.iter_csv(course), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="gradebook-course-{course.id}.csv"'
+            return response
+        
+        assignments = gradebook_rows.get_assignments(course)
+        return Response({
+            'course': {'id': course.id, 'title': course.title},
+            'assignments': assignments,
+            'students': list(gradebook_rows.iter_student_rows(course, assignments)),
+        })
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Course analytics read from the CourseStats/AssignmentStats rollups."""
+        if request.user.user_type != 'teacher':
+            return Response({'error': 'Only teachers can view course statistics'}, status=403)
+        course = self.get_object()
+        return Response(course_stats.get_course_stats(course))
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Enroll every student listed in an uploaded CSV (``file``, one
+        username or email per row) in ``course``. Re-imports are safe:
+        existing enrollments are left alone and dropped ones reactivated.
+        """
+        if request.user.user_type != 'teacher':
+            return Response({'error': 'Only teachers can import enrollments'}, status=403)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A CSV file is required'}, status=400)
+        try:
+            course = Course.objects.get(id=request.data.get('course'), teacher=request.user)
+        except (Course.DoesNotExist, ValueError):
+            return Response({'error': 'Course not found or you do not have permission'}, status=404)
+        
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            summary = import_enrollments(course, read_identifiers(lines))
+        except UnicodeDecodeError:
+            return Response({'error': 'The CSV file must be UTF-8 encoded'}, status=400)
+        return Response(summary)
 
-class CourseMaterialViewSet(viewsets.ModelViewSet):
+class CourseMaterialViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CourseMaterial.objects.all()
     serializer_class = CourseMaterialSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -47,17 +152,8 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
         if course_id is not None:
             queryset = queryset.filter(course_id=course_id)
         return queryset
-    
-    def perform_destroy(self, instance):
-        if instance.file_path and os.path.exists(os.path.join(settings.MEDIA_ROOT, str(instance.file_path))):
-            try:
-                os.remove(os.path.join(settings.MEDIA_ROOT, str(instance.file_path)))
-                print(f"Deleted file: {instance.file_path}")
-            except Exception as e:
-                print(f"Error deleting file: {e}")
-        instance.delete()
-        
-class AssignmentViewSet(viewsets.ModelViewSet):
+
+class AssignmentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -72,15 +168,7 @@ class AssignmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(course_id=course_id)
         
         # Apply user-specific filters
-        if user.user_type == 'teacher':
-            queryset = queryset.filter(course__teacher=user)
-        else:
-            queryset = queryset.filter(
-                course__enrollments__student=user,
-                course__enrollments__is_active=True
-            ).distinct()
-        
-        return queryset
+        return queryset.visible_to(user)
     
     def perform_create(self, serializer):
         print(f"Request data: {self.request.data}")  # Log incoming data
@@ -93,16 +181,27 @@ class AssignmentViewSet(viewsets.ModelViewSet):
             print(f"Error saving assignment: {e}")
             raise
     
-    def perform_destroy(self, instance):
-        if instance.file_path and os.path.exists(os.path.join(settings.MEDIA_ROOT, str(instance.file_path))):
-            try:
-                os.remove(os.path.join(settings.MEDIA_ROOT, str(instance.file_path)))
-                print(f"Deleted file: {instance.file_path}")
-            except Exception as e:
-                print(f"Error deleting file: {e}")
-        instance.delete()
+    @action(detail=True, methods=['get'])
+    def download_submissions(self, request, pk=None):
+        """
+        Stream a ZIP of every submission with a manifest CSV. ``?compression=``
+        is ``auto`` (deflate unless the format is already compressed),
+        ``stored`` or ``deflate``.
+        """
+        if request.user.user_type != 'teacher':
+            return Response({'error': 'Only teachers can download submissions'}, status=403)
+        assignment = self.get_object()
+        mode = request.query_params.get('compression', 'auto')
+        if mode not in submission_archive.COMPRESSION_MODES:
+            return Response({'error': f"compression must be one of {', '.join(submission_archive.COMPRESSION_MODES)}"},
+                            status=400)
+        
+        response = StreamingHttpResponse(submission_archive.iter_zip(assignment, mode), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="assignment-{assignment.id}-submissions.zip"'
+        return response
+    
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+class SubmissionViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -132,33 +231,168 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             serializer.save(student=self.request.user)
         except Assignment.DoesNotExist:
             return Response({'error': 'Assignment not found'}, status=404)
-    
-    def perform_destroy(self, instance):
-        # Delete the submission file from storage if it exists
-        if instance.file_path and os.path.exists(os.path.join(settings.MEDIA_ROOT, str(instance.file_path))):
-            try:
-                os.remove(os.path.join(settings.MEDIA_ROOT, str(instance.file_path)))
-                print(f"Deleted file: {instance.file_path}")
-            except Exception as e:
-                print(f"Error deleting file: {e}")
-        instance.delete()
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        self.save_for_submission(serializer, serializer.validated_data['submission'])
+    
+    def perform_update(self, serializer):
+        if serializer.instance.course.teacher_id != self.request.user.id:
+            raise PermissionDenied('You can only grade submissions for your own courses')
+        self.save_for_submission(serializer, serializer.validated_data.get('submission', serializer.instance.submission))
+    
+    def save_for_submission(self, serializer, submission):
+        if submission.assignment.course.teacher_id != self.request.user.id:
+            raise PermissionDenied('You can only grade submissions for your own courses')
+        serializer.save(
+            student_id=submission.student_id,
+            course_id=submission.assignment.course_id,
+            assignment_id=submission.assignment_id,
+            graded_by=self.request.user
+        )
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create or update many grades at once from a list of
+        ``{submission, score, feedback}`` entries. Valid rows are saved in one
+        transaction; invalid ones are reported by index and skipped.
+        """
+        if request.user.user_type != 'teacher':
+            return Response({'error': 'Only teachers can grade submissions'}, status=403)
+        entries = request.data
+        if not isinstance(entries, list):
+            return Response({'error': 'Expected a list of grades'}, status=400)
+        
+        errors, rows = [], {}
+        for index, entry in enumerate(entries):
+            entry_serializer = BulkGradeEntrySerializer(data=entry)
+            if entry_serializer.is_valid():
+                rows[index] = entry_serializer.validated_data
+            else:
+                errors.append({'index': index, 'errors': entry_serializer.errors})
+        
+        # One query for every submission, its assignment and any existing grade
+        submissions = Submission.objects.filter(
+            pk__in={row['submission'] for row in rows.values()},
+            assignment__course__teacher=request.user
+        ).select_related('assignment', 'grade').in_bulk()
+        
+        to_create, to_update, seen = [], [], set()
+        removed, added, created_added = [], [], {}
+        for index, row in rows.items():
+            submission = submissions.get(row['submission'])
+            if submission is None:
+                errors.append({'index': index, 'errors': {'submission': ['Submission not found or you do not have permission']}})
+                continue
+            if submission.pk in seen:
+                errors.append({'index': index, 'errors': {'submission': ['Submission appears more than once']}})
+                continue
+            try:
+                validate_score(row['score'], submission.assignment.total_points)
+            except serializers.ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+                continue
+            seen.add(submission.pk)
+            
+            grade = getattr(submission, 'grade', None)
+            total_points = submission.assignment.total_points
+            if grade is None:
+                grade = Grade(
+                    submission=submission,
+                    student_id=submission.student_id,
+                    course_id=submission.assignment.course_id,
+                    assignment_id=submission.assignment_id
+                )
+                to_create.append((index, grade))
+            else:
+                to_update.append(grade)
+                removed.append(course_stats.grade_contribution(grade, total_points))
+            grade.score = row['score']
+            grade.feedback = row['feedback']
+            grade.graded_by = request.user
+            contribution = course_stats.grade_contribution(grade, total_points)
+            if grade.pk is None:
+                created_added[index] = contribution
+            else:
+                added.append(contribution)
+        
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Grade.objects.bulk_create([grade for _, grade in to_create], batch_size=500)
+            except IntegrityError:
+                # Another request graded some of these submissions meanwhile:
+                # create row by row and report the ones that lost the race
+                created = []
+                for index, grade in to_create:
+                    try:
+                        with transaction.atomic():
+                            Grade.objects.bulk_create([grade])
+                    except IntegrityError:
+                        grade.pk = None
+                        del created_added[index]
+                        errors.append({'index': index, 'errors': {'submission': ['Submission was graded concurrently']}})
+                    else:
+                        created.append((index, grade))
+                to_create = created
+            Grade.objects.bulk_update(to_update, ['score', 'feedback', 'graded_by'], batch_size=500)
+            course_stats.apply_changes(removed, added + list(created_added.values()))
+        to_create = [grade for _, grade in to_create]
+        # Bulk writes skip post_save, so invalidate the students' dashboards here
+        if to_create or to_update:
+            touch(*{
+                dashboard_cache.user_key(grade.student_id) for grade in to_create + to_update
+            })
+        
+        errors.sort(key=lambda error: error['index'])
+        return Response({
+            'created': len(to_create),
+            'updated': len(to_update),
+            'errors': errors,
+        }, status=400 if errors and not (to_create or to_update) else 200)
 
-class CourseFeedbackViewSet(viewsets.ModelViewSet):
+class CourseFeedbackViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CourseFeedback.objects.all()
     serializer_class = CourseFeedbackSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-posted_at', '-id')
+    feed_pinned_limit = 10
+    
+    def get_queryset(self):
+        queryset = Announcement.objects.visible_to(self.request.user)
+        course_id = self.request.query_params.get('course', None)
+        if course_id is not None:
+            queryset = queryset.filter(course_id=course_id)
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        One timeline of the announcements from every course the caller
+        teaches or is actively enrolled in, newest first and keyset-paginated
+        (``?cursor=``, ``?page_size=``). Pinned announcements are left out of
+        the timeline and listed separately under ``pinned`` on the first page.
+        """
+        visible = self.filter_queryset(Announcement.objects.visible_to(request.user))
+        paginator = FeedCursorPagination()
+        page = paginator.paginate_queryset(visible.filter(is_pinned=False), request, view=self)
+        response = paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        if paginator.cursor_query_param not in request.query_params:
+            pinned = visible.filter(is_pinned=True).order_by('-posted_at', '-id')[:self.feed_pinned_limit]
+            response.data['pinned'] = self.get_serializer(pinned, many=True).data
+        return response
 
-class VideoResourceViewSet(viewsets.ModelViewSet):
+class VideoResourceViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = VideoResource.objects.all()
     serializer_class = VideoResourceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -170,19 +404,115 @@ class VideoResourceViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(material_id=material_id)
         return queryset
     
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads. Create a session with the file's name, size and the
+    target's form fields, PUT each chunk's raw bytes to
+    ``<id>/chunks/<n>/`` in any order (retrying failed ones), check
+    ``received`` on the session to resume, then POST ``<id>/complete/``.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    target_serializers = {
+        'material': CourseMaterialSerializer,
+        'assignment': AssignmentSerializer,
+        'submission': SubmissionSerializer,
+    }
+    
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        session = serializer.save(user=self.request.user)
+        chunked_uploads.allocate(session)
+    
     def perform_destroy(self, instance):
-        if instance.thumbnail_path and os.path.exists(os.path.join(settings.MEDIA_ROOT, str(instance.thumbnail_path))):
-            try:
-                os.remove(os.path.join(settings.MEDIA_ROOT, str(instance.thumbnail_path)))
-                print(f"Deleted thumbnail: {instance.thumbnail_path}")
-            except Exception as e:
-                print(f"Error deleting thumbnail: {e}")
+        chunked_uploads.discard(instance)
         instance.delete()
+    
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        session = self.get_object()
+        try:
+            # request.stream is the raw body; request.data would buffer it
+            chunked_uploads.write_chunk(session, int(index), request.stream)
+        except chunked_uploads.ChunkError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if int(index) not in session.received_chunks:
+                session.received_chunks = sorted([*session.received_chunks, int(index)])
+                session.save(update_fields=['received_chunks', 'updated_at'])
+        return Response(self.get_serializer(session).data)
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """
+        Validate the assembled file with the target's serializer, so its
+        extension and size rules apply, and create the target object. Form
+        fields in the body override those stored on the session. The
+        session file is kept until the new row has committed, so a failed
+        attempt can be retried.
+        """
+        session = self.get_object()
+        serializer_class = self.target_serializers[session.target]
+        overrides = request.data.dict() if hasattr(request.data, 'dict') else request.data
+        
+        with transaction.atomic():
+            # Claim the session; a concurrent complete finds it gone
+            session = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+            if session is None:
+                return Response({'error': 'Upload session not found'}, status=404)
+            missing = chunked_uploads.missing_chunks(session)
+            if missing:
+                return Response({'error': 'Upload is incomplete', 'missing': missing}, status=409)
+            
+            with chunked_uploads.assembled_file(session) as upload:
+                serializer = serializer_class(
+                    data={**session.fields, **overrides, 'file_path': upload},
+                    context=self.get_serializer_context()
+                )
+                serializer.is_valid(raise_exception=True)
+                kwargs = self.get_target_kwargs(session.target, serializer.validated_data)
+                if session.target == 'submission' and Submission.objects.filter(
+                    assignment=serializer.validated_data['assignment'], student=request.user
+                ).exists():
+                    return Response({'error': 'You have already submitted this assignment'}, status=409)
+                try:
+                    with transaction.atomic():
+                        serializer.save(**kwargs)
+                except IntegrityError:
+                    return Response({'error': 'The upload conflicts with an existing record'}, status=409)
+            
+            # Not session.delete(), which would clear the pk discard() needs
+            UploadSession.objects.filter(pk=session.pk).delete()
+            transaction.on_commit(lambda: chunked_uploads.discard(session))
+        return Response(serializer.data, status=201)
+    
+    def get_target_kwargs(self, target, data):
+        """Apply the target viewset's ownership rules; returns extra save() kwargs."""
+        user = self.request.user
+        if target == 'submission':
+            course = data['assignment'].course
+            if not Enrollment.objects.filter(student=user, course=course, is_active=True).exists():
+                raise PermissionDenied('You are not enrolled in this course')
+            return {'student': user}
+        if data['course'].teacher_id != user.id:
+            raise PermissionDenied('You can only upload files to your own courses')
+        return {}
 
-class CourseStructureViewSet(viewsets.ModelViewSet):
+class JSONPatchParser(JSONParser):
+    media_type = 'application/json-patch+json'
+
+class CourseStructureViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CourseStructure.objects.all()
     serializer_class = CourseStructureSerializer
     permission_classes = [permissions.IsAuthenticated]
+    timestamp_field = 'last_updated'
     
     def get_queryset(self):
         user = self.request.user
@@ -190,14 +520,17 @@ class CourseStructureViewSet(viewsets.ModelViewSet):
         queryset = CourseStructure.objects.all()
         if course_id:
             queryset = queryset.filter(course_id=course_id)
-        if user.user_type == 'teacher':
-            queryset = queryset.filter(course__teacher=user)
-        else:
-            queryset = queryset.filter(
-                course__enrollments__student=user,
-                course__enrollments__is_active=True
-            ).distinct()
-        return queryset
+        return queryset.visible_to(user)
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            structure = serializer.save()
+            structure.save_revision(replace_operations(structure.structure_data), author=self.request.user)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            structure = serializer.save()
+            structure.save_revision(replace_operations(structure.structure_data), author=self.request.user)
     
     @action(detail=False, methods=['post'])
     def save_structure(self, request):
@@ -207,8 +540,161 @@ class CourseStructureViewSet(viewsets.ModelViewSet):
             course = Course.objects.get(id=course_id, teacher=request.user)
         except Course.DoesNotExist:
             return Response({'error': 'Course not found or you do not have permission'}, status=404)
-        structure, created = CourseStructure.objects.update_or_create(
-            course=course,
-            defaults={'structure_data': sections}
+        
+        expected = if_match_version(request)
+        try:
+            with transaction.atomic():
+                structure, created = CourseStructure.objects.select_for_update().get_or_create(course=course)
+                if expected not in (None, '*') and expected != structure.version:
+                    return version_response({'error': 'Course structure has changed'}, structure.version, 412)
+                structure.structure_data = sections
+                structure.save_revision(replace_operations(sections), author=request.user)
+        except IntegrityError:
+            return Response({'error': 'Course structure was changed concurrently'}, status=412)
+        return version_response(
+            {'status': 'success', 'message': 'Course structure saved', 'version': structure.version},
+            structure.version
         )
-        return Response({'status': 'success', 'message': 'Course structure saved'})
\ No newline at end of file
+    
+    @action(detail=False, methods=['get'])
+    def resolved(self, request):
+        """
+        The outline of ``?course=`` with every referenced material (with its
+        video details) and assignment inlined under ``detail``.
+        """
+        course_id = request.query_params.get('course', '')
+        if not course_id.isdigit():
+            return Response({'error': 'course must be a course id'}, status=400)
+        structure = self.get_queryset().select_related('course').first()
+        if structure is None:
+            return Response({'error': 'Course structure not found'}, status=404)
+        
+        audience = 'teacher' if structure.course.teacher_id == request.user.id else 'student'
+        return Response(course_outline.get_outline(structure, {'request': request}, audience))
+    
+    @action(detail=True, methods=['post'], url_path='patch', parser_classes=[JSONParser, JSONPatchParser])
+    def patch_structure(self, request, pk=None):
+        """
+        Apply a JSON Patch (RFC 6902) to ``structure_data``. ``If-Match`` must
+        carry the version the patch was written against.
+        """
+        structure = self.get_object()
+        if structure.course.teacher_id != request.user.id:
+            return Response({'error': 'Only the course teacher can edit its structure'}, status=403)
+        expected = if_match_version(request)
+        if expected is None:
+            return Response({'error': 'If-Match with the current version is required'}, status=428)
+        
+        try:
+            with transaction.atomic():
+                structure = CourseStructure.objects.select_for_update().get(pk=structure.pk)
+                if expected not in ('*', structure.version):
+                    return version_response({'error': 'Course structure has changed'}, structure.version, 412)
+                structure.structure_data = apply_patch(structure.structure_data, request.data)
+                structure.save_revision(request.data, author=request.user)
+        except JsonPatchError as exc:
+            return Response({'error': str(exc)}, status=400)
+        except IntegrityError:
+            return Response({'error': 'Course structure was changed concurrently'}, status=412)
+        return version_response({'version': structure.version}, structure.version)
+    
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """
+        Operations applied after ``?since=<version>``, oldest first, so a
+        client holding that version can replay them instead of refetching.
+        """
+        structure = self.get_object()
+        try:
+            since = int(request.query_params.get('since', ''))
+        except ValueError:
+            return Response({'error': 'since must be an integer version'}, status=400)
+        if not 0 <= since <= structure.version:
+            return Response({'error': f'since must be between 0 and {structure.version}'}, status=400)
+        
+        revisions = list(
+            structure.revisions.filter(version__gt=since).order_by('version').values('version', 'operations')
+        )
+        if len(revisions) != structure.version - since:
+            # History is incomplete, so send the whole outline instead
+            return version_response({
+                'version': structure.version,
+                'reset': True,
+                'structure_data': structure.structure_data,
+            }, structure.version)
+        return version_response({'version': structure.version, 'revisions': revisions}, structure.version)
+
+
+def replace_operations(structure_data):
+    """Patch recorded for a full rewrite of the outline."""
+    return [{'op': 'replace', 'path': '', 'value': structure_data}]
+
+
+def if_match_version(request):
+    """
+    The structure version named by ``If-Match`` (``"3"`` or ``W/"3"``),
+    ``'*'`` for whatever is current, ``None`` without the header and -1 when
+    it names no version.
+    """
+    header = request.headers.get('If-Match')
+    if header is None:
+        return None
+    value = header.strip()
+    if value == '*':
+        return value
+    value = value.removeprefix('W/').strip('"')
+    return int(value) if value.isdigit() else -1
+
+
+def version_response(data, version, status=200):
+    response = Response(data, status=status)
+    response['ETag'] = f'"{version}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def dashboard(request):
+    """
+    Everything the student landing page needs in one call: active
+    enrollments, assignments due in the next ``?days=`` days with submission
+    status, recent grades, pinned announcements and the unread chat count.
+    """
+    if request.user.user_type != 'student':
+        return Response({'error': 'Only students have a dashboard'}, status=403)
+    
+    try:
+        days = int(request.query_params.get('days', dashboard_cache.DEFAULT_DAYS))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=400)
+    if not 1 <= days <= dashboard_cache.MAX_DAYS:
+        return Response({'error': f'days must be between 1 and {dashboard_cache.MAX_DAYS}'}, status=400)
+    
+    data = dict(dashboard_cache.get_dashboard(request.user, days, {'request': request}))
+    # Chat traffic is too frequent to invalidate on, so the unread count is
+    # always read live
+    data['unread_messages'] = ChatMessage.objects.unread_by(request.user).count()
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search(request):
+    """
+    Ranked full-text search over the courses, materials and announcements
+    the caller can see. Words ending in ``*`` match as prefixes; ``?type=``
+    narrows to course, material or announcement.
+    """
+    if not search_index.is_available():
+        return Response({'error': 'Search is not available on this database'}, status=501)
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=400)
+    
+    kinds = [kind for kind in request.query_params.getlist('type') if kind in search_index.KIND_CODES]
+    try:
+        limit = max(1, int(request.query_params.get('limit', 20)))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    
+    return Response({'results': search_index.search(request.user, query, kinds, limit)})
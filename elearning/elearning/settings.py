@@ -45,8 +45,14 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    # Opt-in keyset pagination: send ?page_size= or ?cursor= to get pages
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.OptInCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Upper bound for ?page_size= on cursor-paginated endpoints
+CURSOR_PAGINATION_MAX_PAGE_SIZE = 500
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -101,6 +107,33 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory is per process, so signal-driven invalidations only reach the
+# process that made the write. Multi-process deployments should share a
+# cache: DJANGO_CACHE_BACKEND=file (DJANGO_CACHE_LOCATION sets the directory)
+# or DJANGO_CACHE_BACKEND=db (run `manage.py createcachetable` first).
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'elearning',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')],
+        # Serialized fragments add one entry per cached object
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -119,6 +152,12 @@ LOGOUT_REDIRECT_URL = '/accounts/logout/'
 # CELERY_ACCEPT_CONTENT = ['json']
 # CELERY_TASK_SERIALIZER = 'json'
 # CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'process-file-deletions': {
+        'task': 'core.tasks.process_file_deletions',
+        'schedule': 60.0,
+    },
+}
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -136,6 +175,31 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per distinct content; see core.storage
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Resumable uploads are assembled here, outside MEDIA_ROOT, before being
+# moved into storage; keep it on the same filesystem so the move is a rename
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+CHUNKED_UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+
+# Let the web server send media bodies once access is checked:
+# 'x-accel-redirect' (nginx, with an internal location at MEDIA_OFFLOAD_PREFIX
+# aliased to MEDIA_ROOT) or 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+MEDIA_OFFLOAD = os.environ.get('DJANGO_MEDIA_OFFLOAD') or None
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+
+# Render image derivatives (see core.images) in a celery task right after
+# upload instead of on their first request; needs a broker
+IMAGE_DERIVATIVES_EAGER = bool(os.environ.get('DJANGO_IMAGE_DERIVATIVES_EAGER'))
+
+# Read uploaded videos' duration and resolution (see core.video_probe) in a
+# celery task rather than right after the upload commits; needs a broker
+VIDEO_PROBE_ASYNC = bool(os.environ.get('DJANGO_VIDEO_PROBE_ASYNC'))
+
 # CORS settings (for frontend API access)
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
@@ -1,5 +1,5 @@
 // app.js - Main entry point for the application
-import { fetchUserData } from './modules/auth.js';
+import { fetchUserData, setMediaToken } from './modules/auth.js';
 
 // Initialize application state
 window.appState = {
@@ -21,6 +21,9 @@ function initApp() {
     // Initialize app components
     console.log('Initializing app with state:', window.appState);
     
+    // Restore the cookie protected media is read with
+    setMediaToken(window.appState.token);
+
     // Setup toast container
     setupToastContainer();
     
@@ -218,6 +218,19 @@ export async function saveUserInfo(modal, state) {
 export function updateState(state, key, value) {
     state[key] = value;
     localStorage.setItem(key, value);
+    if (key === 'token') {
+        setMediaToken(value);
+    }
+}
+
+// <img>, <video> and download links can't send the Authorization header,
+// so protected /media/ files read the access token from a cookie instead
+export function setMediaToken(token) {
+    if (token) {
+        document.cookie = `media_token=${token}; path=/media/; SameSite=Strict`;
+    } else {
+        document.cookie = 'media_token=; path=/media/; max-age=0; SameSite=Strict';
+    }
 }
 
 export function clearState(state) {
@@ -229,6 +242,7 @@ export function clearState(state) {
     localStorage.removeItem('userId');
     localStorage.removeItem('firstName');
     localStorage.removeItem('profilePic');
+    setMediaToken(null);
 }
 
 // Import the getCsrfToken for signup
@@ -23,7 +23,7 @@ async function fetchCourseStructure(courseId, state) {
         
         // Fallback to default structure if no saved structure or it's empty
         console.log('No valid saved structure found, creating default from materials');
-        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}`, {}, state.token);
+        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}&expand=video_details`, {}, state.token);
         console.log('Materials fetched for default structure:', materials);
         
         if (materials && materials.length > 0) {
@@ -91,7 +91,7 @@ async function fetchMaterialDetails(materialId, materialType, state) {
         if (materialType === 'assignment') {
             endpoint = `http://127.0.0.1:8000/api/core/assignments/${materialId}/`;
         } else {
-            endpoint = `http://127.0.0.1:8000/api/core/materials/${materialId}/`;
+            endpoint = `http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`;
         }
         
         const material = await apiFetch(endpoint, {}, state.token);
@@ -111,6 +111,20 @@ async function fetchMaterialDetails(materialId, materialType, state) {
     }
 }
 
+// Fetch the details of every item in the outline
+async function fetchResolvedMaterials(courseId, structure, state) {
+    try {
+        const resolved = await apiFetch(`http://127.0.0.1:8000/api/core/course-structure/resolved/?course=${courseId}`, {}, state.token);
+        return resolved.sections.flatMap(section => section.items.map(item => item.detail));
+    } catch (error) {
+        // No saved outline (the default one is built from materials) or an older server
+        console.warn('Resolved outline unavailable, fetching items one by one:', error);
+        return Promise.all(structure.flatMap(section =>
+            section.items.map(item => fetchMaterialDetails(item.id, item.type, state))
+        ));
+    }
+}
+
 // Format duration 
 function formatDuration(seconds) {
     if (!seconds) return "0:00";
@@ -132,7 +146,7 @@ export async function renderCourseContentPage(courseId, state) {
 
     try {
         // Fetch course and structure
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         console.log('Course details:', course);
         const structure = await fetchCourseStructure(courseId, state);
 
@@ -164,11 +178,8 @@ export async function renderCourseContentPage(courseId, state) {
             return;
         }
 
-        // Fetch all materials in parallel
-        const materialPromises = structure.flatMap(section => 
-            section.items.map(item => fetchMaterialDetails(item.id, item.type, state))
-        );
-        const materials = await Promise.all(materialPromises);
+        // Fetch all materials in one request, falling back to one per item
+        const materials = await fetchResolvedMaterials(courseId, structure, state);
         const materialMap = new Map(materials.filter(m => m).map(m => [m.id, m]));
 
         // Render the course content page
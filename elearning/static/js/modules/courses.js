@@ -6,8 +6,8 @@ import { getCsrfToken } from './api.js';
 
 export async function fetchCourses(state) {
     try {
-        const courses = await apiFetch('http://127.0.0.1:8000/api/core/courses/', {}, state.token);
-        const enrollments = await apiFetch('http://127.0.0.1:8000/api/core/enrollments/', {}, state.token);
+        const courses = await apiFetch('http://127.0.0.1:8000/api/core/courses/?expand=teacher', {}, state.token);
+        const enrollments = await apiFetch('http://127.0.0.1:8000/api/core/enrollments/?expand=student_detail,course_detail', {}, state.token);
         console.log('All enrollments:', enrollments);
 
         const userEnrollments = enrollments.filter(e => 
@@ -197,7 +197,7 @@ export async function enroll(courseId, state) {
     console.log('Attempting to enroll:', { courseId, studentId });
 
     try {
-        const enrollments = await apiFetch('http://127.0.0.1:8000/api/core/enrollments/', {}, state.token);
+        const enrollments = await apiFetch('http://127.0.0.1:8000/api/core/enrollments/?expand=student_detail,course_detail', {}, state.token);
         console.log('Existing enrollments:', JSON.stringify(enrollments));
         const existingEnrollment = enrollments.find(e => 
             e.student_detail.id === studentId && 
@@ -331,7 +331,7 @@ export async function startChat(userId, username, state) {
             for (const room of existingRooms) {
                 if (room.is_private) {
                     // Check if both users are participants
-                    const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}`, {}, state.token);
+                    const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}&expand=user`, {}, state.token);
                     const participantIds = participants.map(p => p.user.id);
                     
                     if (participantIds.includes(parseInt(state.user.id)) && participantIds.includes(parseInt(userId))) {
@@ -601,7 +601,7 @@ async function loadChatMessages(roomId, state) {
         statusElement.textContent = 'Loading messages...';
         
         // Fetch messages for this room
-        const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}`, {}, state.token);
+        const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}&expand=user,room`, {}, state.token);
         console.log(`Loaded ${messages.length} messages`);
         
         if (messages.length === 0) {
@@ -777,7 +777,7 @@ async function sendChatMessage(roomId, content, state, messagesContainerId) {
         }
         
         // Send the message to the server
-        const message = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/`, {
+        const message = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?expand=user,room`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -861,7 +861,7 @@ async function pollForNewMessages(roomId, state) {
         }
         
         // Fetch the latest messages
-        const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}`, {}, state.token);
+        const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}&expand=user,room`, {}, state.token);
         
         // If there are no messages, do nothing
         if (messages.length === 0) return;
@@ -1155,7 +1155,7 @@ async function loadChatRooms(state) {
         
         for (const room of chatRooms) {
             // Fetch participants for this room
-            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}`, {}, state.token);
+            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}&expand=user`, {}, state.token);
             
             // Check if current user is a participant
             const isParticipant = participants.some(p => p.user && p.user.id === parseInt(state.user.id));
@@ -1168,7 +1168,7 @@ async function loadChatRooms(state) {
                 }
                 
                 // Get the last message in this room
-                const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&limit=1`, {}, state.token);
+                const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&expand=user,room&limit=1`, {}, state.token);
                 const lastMessage = messages.length > 0 ? messages[0] : null;
                 
                 // Add room with additional info
@@ -1333,7 +1333,7 @@ async function checkForNewMessages(state) {
             try {
                 // Get messages newer than the last check time
                 const messages = await apiFetch(
-                    `http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&after=${lastChecked}`, 
+                    `http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&expand=user,room&after=${lastChecked}`, 
                     {}, 
                     state.token
                 );
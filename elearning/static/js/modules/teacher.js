@@ -77,7 +77,7 @@ export function renderTeacherDashboard(state) {
 
 export async function fetchTeacherCourses(state) {
     try {
-        const courses = await apiFetch('http://127.0.0.1:8000/api/core/courses/', {}, state.token);
+        const courses = await apiFetch('http://127.0.0.1:8000/api/core/courses/?expand=teacher', {}, state.token);
         const teacherCourses = courses.filter(course => course.teacher.id === parseInt(state.userId));
         
         renderTeacherCourses(teacherCourses, state);
@@ -106,7 +106,7 @@ export function renderTeacherCourses(courses, state) {
                 <div class="col-md-4 mb-4">
                     <div class="card h-100">
                         ${course.cover_image_path ? 
-                            `<img src="${course.cover_image_path}" class="card-img-top" alt="${course.title}" style="height: 180px; object-fit: cover;">` : 
+                            `<img src="${course.cover_image_variants ? course.cover_image_variants.card.webp : course.cover_image_path}" class="card-img-top" alt="${course.title}" style="height: 180px; object-fit: cover;">` : 
                             `<div class="card-img-top bg-light d-flex align-items-center justify-content-center" style="height: 180px;">
                                 <i class="bi bi-image text-secondary" style="font-size: 3rem;"></i>
                             </div>`
@@ -326,7 +326,7 @@ export async function createCourse(modal, state) {
 export async function viewCourseDetails(courseId, state) {
     try {
         // Fetch course details
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         
         // Create modal HTML
         const modalHtml = `
@@ -785,7 +785,7 @@ export async function uploadVideo(courseId, modal, state) {
 
 export async function previewVideo(materialId, state) {
     try {
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         const videoResource = await apiFetch(`http://127.0.0.1:8000/api/core/video-resources/?material=${materialId}`, {}, state.token);
         
         if (videoResource.length === 0) {
@@ -851,7 +851,7 @@ export function formatDuration(seconds) {
 export async function editCourse(courseId, state) {
     try {
         // Fetch the course details
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         
         // Format dates for the form
         const startDate = new Date(course.start_date).toISOString().split('T')[0];
@@ -972,10 +972,10 @@ export async function updateCourse(courseId, modal, state) {
 export async function viewCourseStudents(courseId, state) {
     try {
         // Fetch course details
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         
         // Fetch enrollments for this course
-        const enrollments = await apiFetch(`http://127.0.0.1:8000/api/core/enrollments/`, {}, state.token);
+        const enrollments = await apiFetch(`http://127.0.0.1:8000/api/core/enrollments/?expand=student_detail,course_detail`, {}, state.token);
         const courseEnrollments = enrollments.filter(enrollment => 
             enrollment.course_detail.id === parseInt(courseId) && 
             enrollment.is_active === true
@@ -1073,7 +1073,7 @@ export async function removeStudentFromCourse(enrollmentId, courseId, state) {
 // Manage Assignments functionality
 export async function manageCourseAssignments(courseId, state) {
     try {
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         const assignments = await apiFetch(`http://127.0.0.1:8000/api/core/assignments/?course=${courseId}`, {}, state.token);
 
         const assignmentsContainer = document.getElementById('teacher-assignments-container');
@@ -1291,7 +1291,7 @@ export async function toggleCourseStatus(courseId, currentStatus, state) {
 export async function editVideoMaterial(materialId, courseId, state) {
     try {
         // Fetch the material details
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         
         // Try to fetch video details, but don't fail if they don't exist
         let videoDetails = null;
@@ -1462,7 +1462,7 @@ export async function editVideoMaterial(materialId, courseId, state) {
 async function editMaterial(materialId, courseId, state) {
     try {
         // Fetch the material details
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         
         // Get the material type label
         const materialTypeLabels = {
@@ -1576,7 +1576,7 @@ async function editMaterial(materialId, courseId, state) {
 async function deleteMaterial(materialId, courseId, state) {
     try {
         // Fetch the material details to get its type
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         
         // Get the material type label
         const materialTypeLabels = {
@@ -1627,10 +1627,10 @@ async function deleteMaterial(materialId, courseId, state) {
 export async function manageCourseContent(courseId, state) {
     try {
         // Fetch course details
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         
         // Fetch course materials
-        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}`, {}, state.token);
+        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}&expand=video_details`, {}, state.token);
         
         // Separate materials by type
         const videoMaterials = materials.filter(material => material.file_type === 'video');
@@ -1712,7 +1712,7 @@ export function renderCourseContentManager(course, materials, state) {
                                             <div class="card h-100">
                                                 <div class="card-img-top bg-dark d-flex justify-content-center align-items-center" style="height: 160px;">
                                                     ${video.video_details && video.video_details.thumbnail_path ? 
-                                                        `<img src="${video.video_details.thumbnail_path}" class="img-fluid" style="max-height: 160px;" alt="${video.title}">` :
+                                                        `<img src="${video.video_details.thumbnail_variants ? video.video_details.thumbnail_variants.card.webp : video.video_details.thumbnail_path}" class="img-fluid" style="max-height: 160px;" alt="${video.title}">` :
                                                         `<i class="bi bi-film text-light" style="font-size: 3rem;"></i>`
                                                     }
                                                 </div>
@@ -2007,7 +2007,7 @@ export function renderCourseContentManager(course, materials, state) {
 async function deleteVideo(materialId, courseId, state) {
     try {
         // Fetch the material details
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         
         // Show confirmation dialog
         if (!confirm(`Are you sure you want to delete this video? This action cannot be undone.`)) {
@@ -2146,7 +2146,7 @@ export async function uploadDocument(courseId, modal, state) {
 export async function editDocumentMaterial(materialId, courseId, state) {
     try {
         // Fetch the material details
-        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/`, {}, state.token);
+        const material = await apiFetch(`http://127.0.0.1:8000/api/core/materials/${materialId}/?expand=video_details`, {}, state.token);
         
         // Create modal HTML
         const modalHtml = `
@@ -2548,10 +2548,10 @@ export async function uploadOtherMaterial(courseId, modal, state) {
 export async function organizeContentView(courseId, state) {
     try {
         // Fetch course details
-        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/`, {}, state.token);
+        const course = await apiFetch(`http://127.0.0.1:8000/api/core/courses/${courseId}/?expand=teacher`, {}, state.token);
         
         // Fetch all materials for the course
-        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}`, {}, state.token);
+        const materials = await apiFetch(`http://127.0.0.1:8000/api/core/materials/?course=${courseId}&expand=video_details`, {}, state.token);
         
         // Fetch all assignments for the course
         const assignments = await apiFetch(`http://127.0.0.1:8000/api/core/assignments/?course=${courseId}`, {}, state.token);
@@ -3660,7 +3660,7 @@ async function startChat(userId, state) {
             for (const room of existingRooms) {
                 if (room.is_private) {
                     // Check if both users are participants
-                    const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}`, {}, state.token);
+                    const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}&expand=user`, {}, state.token);
                     const participantIds = participants.map(p => p.user.id);
                     
                     if (participantIds.includes(parseInt(state.user.id)) && participantIds.includes(parseInt(userId))) {
@@ -3930,7 +3930,7 @@ function makeChatWindowDraggable(element) {
 function loadChatMessages(roomId, state, messagesContainerId = 'chat-messages', statusElementId = 'chat-status') {
     console.log(`Loading messages for room ID: ${roomId}`);
     
-    return apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}`, {}, state.token)
+    return apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${roomId}&expand=user,room`, {}, state.token)
         .then(messages => {
             console.log(`Loaded ${messages.length} messages for room ${roomId}`);
             
@@ -4024,7 +4024,7 @@ async function sendChatMessage(roomId, content, state, messagesContainerId = 'ch
         console.log(`Sending message to room ${roomId}: ${content}`);
         
         // Create the message
-        const message = await apiFetch('http://127.0.0.1:8000/api/addon/messages/', {
+        const message = await apiFetch('http://127.0.0.1:8000/api/addon/messages/?expand=user,room', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -4355,7 +4355,7 @@ async function loadChatRooms(state) {
         
         for (const room of chatRooms) {
             // Fetch participants for this room
-            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}`, {}, state.token);
+            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}&expand=user`, {}, state.token);
             
             // Check if current user is a participant
             const isParticipant = participants.some(p => p.user && p.user.id === parseInt(state.user.id));
@@ -4368,7 +4368,7 @@ async function loadChatRooms(state) {
                 }
                 
                 // Get the last message in this room
-                const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&limit=1`, {}, state.token);
+                const messages = await apiFetch(`http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&expand=user,room&limit=1`, {}, state.token);
                 const lastMessage = messages.length > 0 ? messages[0] : null;
                 
                 // Add room with additional info
@@ -4537,7 +4537,7 @@ async function checkForNewMessages(state) {
         
         for (const room of chatRooms) {
             // Fetch participants for this room
-            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}`, {}, state.token);
+            const participants = await apiFetch(`http://127.0.0.1:8000/api/addon/participants/?room=${room.id}&expand=user`, {}, state.token);
             
             // Check if current user is a participant
             const isParticipant = participants.some(p => p.user && p.user.id === parseInt(state.user.id));
@@ -4545,7 +4545,7 @@ async function checkForNewMessages(state) {
             if (isParticipant) {
                 // Get messages newer than the last check time
                 const messages = await apiFetch(
-                    `http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&after=${lastChecked}`, 
+                    `http://127.0.0.1:8000/api/addon/messages/?room=${room.id}&expand=user,room&after=${lastChecked}`, 
                     {}, 
                     state.token
                 );
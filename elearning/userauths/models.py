@@ -13,6 +13,7 @@ class User(AbstractUser):
     is_blocked = models.BooleanField(default=False)
     first_name = models.CharField(max_length=50, blank=True)
     last_name = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.username
@@ -58,6 +59,12 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_read_idx'),
+            # Unread notifications are a small, hot subset of the table
+            models.Index(fields=['user', 'created_at'], condition=models.Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.notification_type} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
@@ -2,13 +2,21 @@ from rest_framework import serializers
 from .models import User, UserPermission, StatusUpdate, Notification
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from core.caching import FragmentCacheMixin, FragmentListSerializer
+from core.dynamic_fields import DynamicFieldsMixin
+from core.images import ImageVariantsField
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
+    profile_picture_variants = ImageVariantsField(source='profile_picture_path')
+    # Kept out of the shared fragment cache
+    uncached_fields = ('email',)
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'password', 'user_type', 'bio', 'profile_picture_path']
+        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'password', 'user_type', 'bio', 'profile_picture_path',
+                  'profile_picture_variants']
+        list_serializer_class = FragmentListSerializer
         extra_kwargs = {
             'first_name': {'required': False},
             'last_name': {'required': False},
@@ -62,19 +70,28 @@ class UserSerializer(serializers.ModelSerializer):
         
         return user
 
-class UserPermissionSerializer(serializers.ModelSerializer):
+class UserPermissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserPermission
         fields = ['id', 'user', 'permission']
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+        }
 
-class StatusUpdateSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class StatusUpdateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StatusUpdate
         fields = ['id', 'user', 'content', 'posted_at', 'is_visible']
+        read_only_fields = ['user']
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+        }
 
-class NotificationSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'notification_type', 'message', 'is_read', 'created_at', 'related_id']
\ No newline at end of file
+        fields = ['id', 'user', 'notification_type', 'message', 'is_read', 'created_at', 'related_id']
+        read_only_fields = ['user']
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+        }
\ No newline at end of file
@@ -7,6 +7,7 @@ from .serializers import UserSerializer, UserPermissionSerializer, StatusUpdateS
 from .forms import UserSignupForm
 from django.contrib.auth.views import LoginView
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from core.dynamic_fields import EagerLoadingMixin
 
 def custom_login(request):
     if request.method == 'POST':
@@ -34,7 +35,7 @@ def signup(request):
     return render(request, 'userauths/signup.html', {'form': form})
 
 # REST API Viewsets
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     
@@ -45,20 +46,30 @@ class UserViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-class UserPermissionViewSet(viewsets.ModelViewSet):
+class UserPermissionViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = UserPermission.objects.all()
     serializer_class = UserPermissionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class StatusUpdateViewSet(viewsets.ModelViewSet):
+class StatusUpdateViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = StatusUpdate.objects.all()
     serializer_class = StatusUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-posted_at', '-id')
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        # Users only ever see their own notifications
+        queryset = Notification.objects.filter(user=self.request.user)
+        is_read = self.request.query_params.get('is_read')
+        if is_read is not None:
+            queryset = queryset.filter(is_read=is_read.lower() in ('1', 'true'))
+        return queryset
 
 class CustomLoginView(LoginView):
     def get_success_url(self):